@@ -8,6 +8,7 @@ from kontainer.srv import app # ! Importing from 'srv' module not 'app' module !
 # Make sure all tasks are imported, so that Celery can find them
 from kontainer.admin.tasks import *
 from kontainer.docker.tasks import *
+from kontainer.environments.tasks import *
 from kontainer.stacks.tasks import *
 
 
@@ -6,6 +6,7 @@ from kontainer.docker.dkr import get_docker_manager_cached
 from kontainer.settings import DEFAULT_CONTAINER_REGISTRIES
 from kontainer.util.aws_util import aws_ecr_login
 from kontainer.util.dockercli_utils import dockercli_login_ecr_with_awscli
+from kontainer.util.metastore import use_metastore, get_metastore
 
 CONFIG_DIR = os.path.join(settings.KONTAINER_DATA_DIR, 'config')
 CONTAINER_REGISTRIES_FILE = os.path.join(CONFIG_DIR, 'registries.json')
@@ -42,6 +43,10 @@ def read_container_registries() -> list:
 
     :return: List of container registries
     """
+    if use_metastore():
+        registries = get_metastore().list_registries()
+        return DEFAULT_CONTAINER_REGISTRIES if registries is None else registries
+
     if not os.path.exists(CONTAINER_REGISTRIES_FILE):
         return DEFAULT_CONTAINER_REGISTRIES
 
@@ -55,6 +60,10 @@ def write_container_registries(registries: list) -> None:
 
     :param registries: List of container registries
     """
+    if use_metastore():
+        get_metastore().replace_registries(registries)
+        return
+
     os.makedirs(CONFIG_DIR, exist_ok=True)
     with open(CONTAINER_REGISTRIES_FILE, 'w') as f:
         json.dump(registries, f, indent=4)
@@ -86,21 +95,25 @@ def update_container_registry(registry_name: str, data: dict) -> list:
     :param data: Data to update the container registry with
     :return: Updated list of container registries
     """
-    registries = read_container_registries()
-
     # Ensure the registry name is set
     data["name"] = registry_name
 
-    exists = False
-    for r in registries:
-        if r["name"] == registry_name:
-            exists = True
-            r.update(data)
-            break
+    def _update(registries):
+        exists = False
+        for r in registries:
+            if r["name"] == registry_name:
+                exists = True
+                r.update(data)
+                break
+
+        if not exists:
+            registries.append(data)
+        return registries
 
-    if not exists:
-        registries.append(data)
+    if use_metastore():
+        return get_metastore().update_registries(_update, default=DEFAULT_CONTAINER_REGISTRIES)
 
+    registries = _update(read_container_registries())
     write_container_registries(registries)
     return registries
 
@@ -112,8 +125,13 @@ def delete_container_registry(registry_name: str) -> list:
     :param registry_name: Name of the container registry
     :return: Updated list of container registries
     """
-    registries = read_container_registries()
-    new_registries = [r for r in registries if r["name"] != registry_name]
+    def _delete(registries):
+        return [r for r in registries if r["name"] != registry_name]
+
+    if use_metastore():
+        return get_metastore().update_registries(_delete, default=DEFAULT_CONTAINER_REGISTRIES)
+
+    new_registries = _delete(read_container_registries())
     write_container_registries(new_registries)
     return new_registries
 
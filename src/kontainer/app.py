@@ -62,6 +62,7 @@ CORS(app,
          "x-api-key", "x-csrf-token",
          "content-type", "authorization",
          "x-docker-context", "x-docker-host"],
+     expose_headers=["x-total-count", "x-next-cursor", "x-cache-age"],
      methods=["OPTIONS", "GET", "POST", "DELETE"],
      origins=["*"])
 
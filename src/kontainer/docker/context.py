@@ -1,7 +1,12 @@
+import getpass
 import json
 import os
+from urllib.parse import urlparse
+
+import paramiko
 
 from kontainer import settings
+from kontainer.util.metastore import use_metastore, get_metastore
 
 contexts_cache = None
 
@@ -31,18 +36,27 @@ def get_docker_contexts():
         # read the contexts.json file
         _contexts = read_docker_contexts_json()
 
-        # if no contexts are found, check the environment variables
-        if not _contexts or len(_contexts) == 0:
-            _contexts = read_docker_contexts_from_environment_variables()
-
-        # if no contexts are found, add the default context
+        # if no contexts are found, check the environment variables or add the default context
         if not _contexts or len(_contexts) == 0:
-            _contexts = [{"id": "local", "host": "unix://var/run/docker.sock"}]
+            _contexts = get_default_docker_contexts()
 
         contexts_cache = _contexts
     return contexts_cache
 
 
+def get_default_docker_contexts():
+    """
+    Get the environments used, if no environments are stored.
+    These are the environments of the environment variables or the default context.
+
+    :return: list of environments
+    """
+    _contexts = read_docker_contexts_from_environment_variables()
+    if not _contexts or len(_contexts) == 0:
+        _contexts = [{"id": "local", "host": "unix://var/run/docker.sock"}]
+    return _contexts
+
+
 def get_dockerhost_for_ctx_id(ctx_id):
     """
     Get the docker host for the given context id.
@@ -83,12 +97,55 @@ def get_ssh_config_for_ctx_id(ctx_id):
     ssh_config = None
     for context in contexts:
         if context["id"] == ctx_id:
-            ssh_config = context.get("ssh_config")
+            ssh_config = get_context_ssh_config(context)
             break
 
     return ssh_config
 
 
+def get_context_ssh_config(context: dict) -> dict | None:
+    """
+    Get the SSH config of a context.
+    Uses the 'ssh_config' of the context or derives it from an ssh:// docker host.
+
+    For ssh:// hosts, the hostname, port, user and identity file are looked up in the
+    OpenSSH client config (KONTAINER_SSH_CONFIG_FILE). Without an identity file,
+    the default keys in ~/.ssh are used. If there is no key either, the keys of the SSH agent are used.
+
+    :param context: context dict
+    :return: dict of `ssh_connect_sock` arguments or None, if the context is not reachable via SSH
+    :raises ValueError: if no SSH credentials were found for an ssh:// host
+    """
+    if context.get("ssh_config"):
+        return dict(context["ssh_config"])
+
+    host = context.get("host") or ""
+    if not host.startswith("ssh://"):
+        return None
+
+    url = urlparse(host)
+    host_config = {}
+    if os.path.isfile(settings.KONTAINER_SSH_CONFIG_FILE):
+        host_config = paramiko.SSHConfig.from_path(settings.KONTAINER_SSH_CONFIG_FILE).lookup(url.hostname)
+
+    identity_files = host_config.get("identityfile") or \
+        [os.path.join("~", ".ssh", name) for name in ("id_ed25519", "id_ecdsa", "id_rsa")]
+    private_key_file = next((os.path.expanduser(f) for f in identity_files
+                             if os.path.isfile(os.path.expanduser(f))), None)
+    if private_key_file is None and not os.environ.get("SSH_AUTH_SOCK"):
+        raise ValueError(f"No SSH key or SSH agent found for context {context.get('id')}. "
+                         f"Configure 'ssh_config' for context {context.get('id')}")
+
+    ssh_config = {
+        "hostname": host_config.get("hostname", url.hostname),
+        "port": url.port or int(host_config.get("port", 22)),
+        "username": url.username or host_config.get("user") or getpass.getuser(),
+    }
+    if private_key_file is not None:
+        ssh_config["private_key_file"] = private_key_file
+    return ssh_config
+
+
 def add_docker_context(ctx_id, host, write=False):
     """
     Add a new environment to the list of environments
@@ -96,17 +153,14 @@ def add_docker_context(ctx_id, host, write=False):
     :param host: host name
     :param write: if True, write the context to disk
     """
-    contexts = get_docker_contexts()
-    # check if the context already exists
-    for context in contexts:
-        if context["id"] == ctx_id:
-            raise Exception(f"Context id {ctx_id} already exists")
+    def _add(contexts):
+        # check if the context already exists
+        for context in contexts:
+            if context["id"] == ctx_id:
+                raise Exception(f"Context id {ctx_id} already exists")
+        return contexts + [{"id": ctx_id, "host": host}]
 
-    contexts.append({"id": ctx_id, "host": host})
-    global contexts_cache
-    contexts_cache = contexts
-    if write:
-        write_docker_contexts_json(contexts)
+    update_docker_contexts(_add, write=write)
 
 
 def remove_docker_context(ctx_id, write=False):
@@ -115,12 +169,30 @@ def remove_docker_context(ctx_id, write=False):
     :param ctx_id: context id
     :param write: if True, write the context to disk
     """
-    contexts = get_docker_contexts()
-    contexts = [context for context in contexts if context["id"] != ctx_id]
+    update_docker_contexts(lambda contexts: [context for context in contexts if context["id"] != ctx_id],
+                           write=write)
+
+
+def update_docker_contexts(fn, write=False):
+    """
+    Update the list of environments.
+    With the metastore, the update is an atomic read-modify-write of the stored environments,
+    so concurrent updates of other processes are not lost.
+
+    :param fn: Callable, which receives the current list of environments and returns the new list
+    :param write: if True, write the environments to disk
+    :return: new list of environments
+    """
     global contexts_cache
+    if write and use_metastore():
+        contexts_cache = get_metastore().update_contexts(fn, default=get_default_docker_contexts())
+        return contexts_cache
+
+    contexts = fn(list(get_docker_contexts()))
     contexts_cache = contexts
     if write:
         write_docker_contexts_json(contexts)
+    return contexts
 
 
 def read_docker_contexts_from_environment_variables():
@@ -153,6 +225,9 @@ def read_docker_contexts_json():
     Read the contexts.json file and return the list of environments
     :return: list of environments
     """
+    if use_metastore():
+        return get_metastore().list_contexts()
+
     contexts = []
     context_file = get_docker_contexts_file()
     if os.path.exists(context_file):
@@ -165,7 +240,12 @@ def write_docker_contexts_json(contexts):
     """
     Write the contexts.json file with the list of environments
     :param contexts: list of environments
+    :return: path to the context file or the metastore
     """
+    if use_metastore():
+        get_metastore().replace_contexts(contexts)
+        return settings.KONTAINER_METASTORE_FILE
+
     context_file = get_docker_contexts_file()
     try:
         with open(context_file, "w") as f:
@@ -0,0 +1,324 @@
+import collections
+import os
+import threading
+import time
+import uuid
+
+from kontainer import settings
+from kontainer.docker.pool import get_docker_manager
+
+
+class DockerEventsBuffer:
+    """
+    A shared docker events subscription of a docker context.
+
+    A single background thread reads the docker events stream into a bounded ring buffer.
+    Each event gets a sequence number. Readers wait for new events with a cursor,
+    so any number of clients share one upstream connection.
+
+    Cursors have the format '<epoch>-<seq>'. The epoch is unique per buffer instance,
+    so cursors of another process or of a previous buffer are detected and the reader
+    starts over from the oldest buffered event.
+
+    If the stream is lost, the thread reconnects with `since` set to the time of the
+    last received event, so no events are missed. Reset listeners are called after a reconnect,
+    because events might still have been lost, e.g. if the docker daemon was restarted.
+
+    A stopped buffer is closed for good: it is not restarted by readers,
+    which receive the remaining buffered events and then see `closed`.
+    """
+
+    def __init__(self, ctx_id: str, capacity=None):
+        self.ctx_id = ctx_id
+        self.capacity = settings.KONTAINER_EVENTS_BUFFER_SIZE if capacity is None else capacity
+        self.epoch = uuid.uuid4().hex[:8]
+
+        self._cond = threading.Condition()
+        self._events = collections.deque(maxlen=self.capacity)
+        self._seq = 0
+        self._listeners = []
+        self._reset_listeners = []
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stream = None
+        self._stopped = threading.Event()
+        self._closed = False
+        self._connected = threading.Event()
+        self._connected_since = None
+        self._last_event_time = None
+
+
+    @property
+    def client(self):
+        return get_docker_manager(self.ctx_id).client
+
+
+    @property
+    def closed(self) -> bool:
+        """
+        :return: True, if the buffer has been stopped and will not receive any more events
+        """
+        return self._closed
+
+
+    @property
+    def cursor(self) -> str:
+        """
+        :return: cursor pointing to the newest event
+        """
+        with self._cond:
+            return f"{self.epoch}-{self._seq}"
+
+
+    def add_listener(self, listener, on_reset=None) -> None:
+        """
+        Register an event listener. The listener is called from the buffer thread.
+
+        :param listener: Callable, which receives the decoded docker event dict
+        :param on_reset: Optional callable, which is called after the stream has been reconnected
+        """
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+            if on_reset is not None and on_reset not in self._reset_listeners:
+                self._reset_listeners.append(on_reset)
+
+
+    def remove_listener(self, listener, on_reset=None) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+            if on_reset in self._reset_listeners:
+                self._reset_listeners.remove(on_reset)
+
+
+    def ensure_started(self) -> None:
+        """
+        Start the events thread, if not already running and the buffer is not closed.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._watch, name=f"events-{self.ctx_id}", daemon=True)
+            self._thread.start()
+
+
+    def wait_connected(self, timeout=None) -> bool:
+        """
+        Wait until the upstream events stream is connected.
+
+        :param timeout: seconds
+        :return: True, if connected
+        """
+        return self._connected.wait(timeout)
+
+
+    def stop(self) -> None:
+        """
+        Stop the events thread and close the upstream stream.
+        The buffer is closed and can not be restarted.
+        """
+        with self._lock:
+            self._closed = True
+        self._stopped.set()
+        stream = self._stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+        with self._cond:
+            self._cond.notify_all()
+
+
+    def read(self, cursor: str | None = None, timeout=None, limit=None) -> tuple[list[dict], str, bool]:
+        """
+        Read the events after the cursor. Waits up to `timeout` seconds, if there are no new events.
+        Returns immediately, if the buffer is closed. Check `closed` to detect the end of the events.
+
+        :param cursor: cursor of the last read event. None to start with new events.
+        :param timeout: seconds to wait for new events
+        :param limit: max. number of events to return
+        :return: tuple of events, next cursor and a flag, which is True
+            if events were lost between the cursor and the returned events
+        """
+        self.ensure_started()
+        with self._cond:
+            seq = self._parse_cursor(cursor)
+            gap = False
+            if seq is None:
+                seq = self._seq
+            elif seq < 0 or seq > self._seq:
+                # Cursor of another buffer: Start with the oldest buffered event
+                gap = True
+                seq = 0
+
+            if timeout and self._seq <= seq and not self._stopped.is_set():
+                self._cond.wait_for(lambda: self._seq > seq or self._stopped.is_set(), timeout=timeout)
+
+            if len(self._events) > 0 and self._events[0][0] > seq + 1:
+                gap = True
+            items = [(event_seq, event) for event_seq, event in self._events if event_seq > seq]
+            if limit is not None:
+                items = items[:limit]
+            next_seq = items[-1][0] if len(items) > 0 else seq
+            return [event for _, event in items], f"{self.epoch}-{next_seq}", gap
+
+
+    def read_since(self, since: float) -> tuple[list[dict], str]:
+        """
+        Read the buffered events since the given time.
+
+        :param since: unix timestamp
+        :return: tuple of events and the cursor pointing to the newest event
+        """
+        self.ensure_started()
+        with self._cond:
+            events = [event for _, event in self._events if event.get('time', 0) >= since]
+            return events, f"{self.epoch}-{self._seq}"
+
+
+    def covers(self, since: float) -> bool:
+        """
+        Check if the buffer holds all events since the given time.
+
+        :param since: unix timestamp
+        :return: bool
+        """
+        with self._cond:
+            if self._connected_since is None or since < self._connected_since:
+                return False
+            if len(self._events) == self.capacity and since < self._events[0][1].get('time', 0):
+                return False
+            return True
+
+
+    def _parse_cursor(self, cursor: str | None) -> int | None:
+        if not cursor:
+            return None
+        epoch, _, seq = cursor.partition("-")
+        if epoch != self.epoch:
+            return -1
+        try:
+            return int(seq)
+        except ValueError:
+            return -1
+
+
+    def _watch(self) -> None:
+        backoff = 1
+        connected_before = False
+        while not self._stopped.is_set():
+            try:
+                since = self._last_event_time
+                self._stream = self.client.events(decode=True, since=since)
+                self._connected.set()
+                if self._connected_since is None:
+                    self._connected_since = time.time()
+                if connected_before:
+                    self._notify_reset()
+                connected_before = True
+                backoff = 1
+                for event in self._stream:
+                    self._append(event)
+                    if self._stopped.is_set():
+                        break
+            except Exception as e:
+                print(f"Docker events stream for context {self.ctx_id} lost: {e}")
+
+            self._stream = None
+            self._connected.clear()
+            if self._stopped.is_set():
+                break
+            self._stopped.wait(backoff)
+            backoff = min(backoff * 2, 30)
+
+
+    def _append(self, event: dict) -> None:
+        if event.get('timeNano'):
+            # Resume with the next nanosecond after a reconnect
+            seconds, nanos = divmod(event['timeNano'] + 1, 1_000_000_000)
+            self._last_event_time = f"{seconds}.{nanos:09d}"
+        elif event.get('time'):
+            self._last_event_time = event['time']
+
+        with self._cond:
+            self._seq += 1
+            self._events.append((self._seq, event))
+            self._cond.notify_all()
+
+        for listener in list(self._listeners):
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"Docker events listener failed: {e}")
+
+
+    def _notify_reset(self) -> None:
+        for listener in list(self._reset_listeners):
+            try:
+                listener()
+            except Exception as e:
+                print(f"Docker events reset listener failed: {e}")
+
+
+def match_event(event: dict, filters: dict) -> bool:
+    """
+    Match a docker event against event filters.
+
+    :param event: Decoded docker event
+    :param filters: dict of filter name ('type', 'container') to list of values
+    :return: bool
+    """
+    if "type" in filters and event.get('Type') not in filters["type"]:
+        return False
+
+    if "container" in filters:
+        if event.get('Type') != "container":
+            return False
+        actor = event.get('Actor') or {}
+        name = (actor.get('Attributes') or {}).get('name')
+        if not any(actor.get('ID', '').startswith(c) or name == c for c in filters["container"]):
+            return False
+
+    return True
+
+
+events_buffers = {}
+events_buffers_lock = threading.Lock()
+events_buffers_pid = os.getpid()
+
+
+def get_docker_events_buffer(ctx_id: str) -> DockerEventsBuffer:
+    """
+    Get the shared events buffer for the given context id.
+
+    :param ctx_id: context id
+    :return: DockerEventsBuffer
+    """
+    global events_buffers, events_buffers_pid
+    with events_buffers_lock:
+        # Buffer threads do not survive a fork
+        if events_buffers_pid != os.getpid():
+            events_buffers = {}
+            events_buffers_pid = os.getpid()
+
+        if ctx_id not in events_buffers:
+            events_buffers[ctx_id] = DockerEventsBuffer(ctx_id)
+        return events_buffers[ctx_id]
+
+
+def discard_docker_events_buffer(ctx_id: str) -> None:
+    """
+    Stop and remove the events buffer for the given context id.
+
+    :param ctx_id: context id
+    """
+    with events_buffers_lock:
+        events_buffer = events_buffers.pop(ctx_id, None)
+    if events_buffer is not None:
+        events_buffer.stop()
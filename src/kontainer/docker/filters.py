@@ -0,0 +1,165 @@
+import re
+
+from kontainer.docker.util import get_container_labels, get_container_state
+
+
+# Supported docker filters per resource type
+CONTAINER_FILTERS = ("label", "status", "name", "ancestor", "id")
+IMAGE_FILTERS = ("label", "dangling", "reference")
+VOLUME_FILTERS = ("label", "name", "dangling")
+NETWORK_FILTERS = ("label", "name", "driver", "id")
+
+
+def match_labels(labels: dict | None, label_filters: list) -> bool:
+    """
+    Match labels against docker label filters.
+    Each filter is either 'key' or 'key=value'. All filters must match.
+
+    :param labels: dict of labels
+    :param label_filters: list of label filters
+    :return: bool
+    """
+    labels = labels or {}
+    for label_filter in label_filters:
+        key, sep, value = label_filter.partition("=")
+        if key not in labels:
+            return False
+        if sep and labels[key] != value:
+            return False
+    return True
+
+
+def match_name(name: str | None, patterns: list) -> bool:
+    """
+    Match a name against docker name filters.
+    Like docker, a name matches, if any of the patterns matches any part of the name.
+
+    :param name: the name to match
+    :param patterns: list of regular expressions
+    :return: bool
+    """
+    if name is None:
+        return False
+    for pattern in patterns:
+        try:
+            if re.search(pattern, name):
+                return True
+        except re.error:
+            if pattern in name:
+                return True
+    return False
+
+
+def _as_bool(value: str) -> bool:
+    return str(value).lower() in ("1", "true")
+
+
+def match_container(attrs: dict, filters: dict) -> bool:
+    """
+    Match a container (summary or inspect data) against docker container filters.
+
+    :param attrs: container attrs
+    :param filters: dict of filter name to list of values
+    :return: bool
+    """
+    if "label" in filters and not match_labels(get_container_labels(attrs), filters["label"]):
+        return False
+
+    if "status" in filters and get_container_state(attrs) not in filters["status"]:
+        return False
+
+    if "name" in filters:
+        names = attrs.get('Names') or [attrs.get('Name')]
+        if not any(match_name((n or "").lstrip("/"), filters["name"]) for n in names):
+            return False
+
+    if "id" in filters and not any(attrs.get('Id', '').startswith(v) for v in filters["id"]):
+        return False
+
+    if "ancestor" in filters:
+        image = attrs.get('Config', {}).get('Image') if 'Config' in attrs else attrs.get('Image')
+        image_id = attrs.get('ImageID') or attrs.get('Image')
+        matched = False
+        for v in filters["ancestor"]:
+            if image == v or (image or "").startswith(f"{v}:") \
+                    or image_id == v or (image_id or "").startswith(f"sha256:{v}"):
+                matched = True
+                break
+        if not matched:
+            return False
+
+    return True
+
+
+def match_image(attrs: dict, filters: dict) -> bool:
+    """
+    Match an image against docker image filters.
+
+    :param attrs: image attrs
+    :param filters: dict of filter name to list of values
+    :return: bool
+    """
+    if "label" in filters:
+        labels = attrs.get('Labels') if 'Labels' in attrs else attrs.get('Config', {}).get('Labels')
+        if not match_labels(labels, filters["label"]):
+            return False
+
+    repo_tags = [t for t in attrs.get('RepoTags') or [] if t != "<none>:<none>"]
+    if "dangling" in filters:
+        dangling = len(repo_tags) == 0
+        if dangling != _as_bool(filters["dangling"][0]):
+            return False
+
+    if "reference" in filters:
+        if not any(match_name(tag, [re.escape(ref).replace(r"\*", ".*")]) for tag in repo_tags
+                   for ref in filters["reference"]):
+            return False
+
+    return True
+
+
+def match_volume(attrs: dict, filters: dict, used_volumes: set | None = None) -> bool:
+    """
+    Match a volume against docker volume filters.
+
+    :param attrs: volume attrs
+    :param filters: dict of filter name to list of values
+    :param used_volumes: set of volume names mounted by any container. Required for the 'dangling' filter.
+    :return: bool
+    """
+    if "label" in filters and not match_labels(attrs.get('Labels'), filters["label"]):
+        return False
+
+    if "name" in filters and not match_name(attrs.get('Name'), filters["name"]):
+        return False
+
+    if "dangling" in filters and used_volumes is not None:
+        dangling = attrs.get('Name') not in used_volumes
+        if dangling != _as_bool(filters["dangling"][0]):
+            return False
+
+    return True
+
+
+def match_network(attrs: dict, filters: dict) -> bool:
+    """
+    Match a network against docker network filters.
+
+    :param attrs: network attrs
+    :param filters: dict of filter name to list of values
+    :return: bool
+    """
+    if "label" in filters and not match_labels(attrs.get('Labels'), filters["label"]):
+        return False
+
+    if "name" in filters and not match_name(attrs.get('Name'), filters["name"]):
+        return False
+
+    if "driver" in filters and attrs.get('Driver') not in filters["driver"]:
+        return False
+
+    if "id" in filters and not any(attrs.get('Id', '').startswith(v) for v in filters["id"]):
+        return False
+
+    return True
+
@@ -0,0 +1,247 @@
+import collections
+import os
+import threading
+import time
+
+from kontainer import settings
+from kontainer.docker.context import get_docker_contexts
+from kontainer.docker.pool import get_docker_manager
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker for the requests to a single docker host.
+
+    - closed: Requests pass. After `failure_threshold` consecutive failures the circuit opens.
+    - open: Requests fail fast. After `reset_timeout` seconds the circuit becomes half-open.
+    - half_open: A single request is let through as probe. It closes the circuit on success
+      and opens it again on failure. Other requests fail fast while the probe is running.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=None, reset_timeout=None):
+        self.failure_threshold = settings.KONTAINER_CIRCUIT_FAILURE_THRESHOLD \
+            if failure_threshold is None else failure_threshold
+        self.reset_timeout = settings.KONTAINER_CIRCUIT_RESET_TIMEOUT \
+            if reset_timeout is None else reset_timeout
+
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self._probing = False
+
+
+    def before_request(self) -> bool | None:
+        """
+        Check if a request may pass.
+
+        :return: None, if the request must fail fast.
+            True, if the request is the half-open probe. False otherwise.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return False
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return None
+                self.state = self.HALF_OPEN
+            if self._probing:
+                return None
+            self._probing = True
+            return True
+
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self.last_error = None
+            self._probing = False
+
+
+    def record_failure(self, error=None) -> None:
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error) if error is not None else None
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+    def retry_after(self) -> int:
+        """
+        :return: seconds until the next probe may pass
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return 0
+            return max(0, int(self.reset_timeout - (time.monotonic() - self.opened_at)) + 1)
+
+
+class ContextHealthMonitor:
+    """
+    Pings all docker contexts in a background thread and records the ping latency history.
+
+    Each ping runs in its own worker thread and counts as failed, if the host does not
+    answer within `timeout` seconds, so a single hung host does not delay the checks of
+    the other hosts. The results feed the circuit breaker of each context.
+    """
+
+    def __init__(self, interval=None, timeout=None, history_size=None):
+        self.interval = settings.KONTAINER_HEALTH_CHECK_INTERVAL if interval is None else interval
+        self.timeout = settings.KONTAINER_HEALTH_CHECK_TIMEOUT if timeout is None else timeout
+        self.history_size = settings.KONTAINER_HEALTH_HISTORY_SIZE if history_size is None else history_size
+
+        self._lock = threading.Lock()
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._history: dict[str, collections.deque] = {}
+        self._pending: dict[str, threading.Thread] = {}
+        self._thread = None
+        self._stopped = threading.Event()
+
+
+    def get_breaker(self, ctx_id: str) -> CircuitBreaker:
+        with self._lock:
+            if ctx_id not in self._breakers:
+                self._breakers[ctx_id] = CircuitBreaker()
+            return self._breakers[ctx_id]
+
+
+    def ensure_started(self) -> None:
+        """
+        Start the monitor thread, if not already running. An interval of 0 disables the monitor.
+        """
+        if self.interval <= 0:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="context-health", daemon=True)
+            self._thread.start()
+
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+    def discard(self, ctx_id: str) -> None:
+        """
+        Remove the breaker and the history of a removed context.
+
+        :param ctx_id: context id
+        """
+        with self._lock:
+            self._breakers.pop(ctx_id, None)
+            self._history.pop(ctx_id, None)
+
+
+    def check(self, ctx_id: str) -> float | None:
+        """
+        Ping a docker context and record the result.
+
+        :param ctx_id: context id
+        :return: latency in milliseconds or None, if the ping failed
+        """
+        with self._lock:
+            pending = self._pending.get(ctx_id)
+            if pending is not None and pending.is_alive():
+                # The previous ping is still hanging
+                latency, error = None, f"No response within {self.timeout} seconds"
+                pending = None
+            else:
+                result = {}
+                pending = threading.Thread(target=self._ping, args=(ctx_id, result),
+                                           name=f"ping-{ctx_id}", daemon=True)
+                self._pending[ctx_id] = pending
+
+        if pending is not None:
+            pending.start()
+            pending.join(self.timeout)
+            latency = result.get("latency")
+            error = result.get("error")
+            if pending.is_alive():
+                error = f"No response within {self.timeout} seconds"
+
+        breaker = self.get_breaker(ctx_id)
+        if error is None:
+            breaker.record_success()
+        else:
+            breaker.record_failure(error)
+
+        with self._lock:
+            history = self._history.setdefault(ctx_id, collections.deque(maxlen=self.history_size))
+            history.append((time.time(), latency if error is None else None))
+        return latency if error is None else None
+
+
+    def status(self) -> list[dict]:
+        """
+        :return: list of dicts with the breaker state and latency history of each context
+        """
+        with self._lock:
+            ctx_ids = list(dict.fromkeys(list(self._breakers.keys()) + list(self._history.keys())))
+            history = {ctx_id: list(self._history.get(ctx_id, [])) for ctx_id in ctx_ids}
+
+        result = []
+        for ctx_id in ctx_ids:
+            breaker = self.get_breaker(ctx_id)
+            latencies = [latency for _, latency in history[ctx_id] if latency is not None]
+            result.append({
+                "id": ctx_id,
+                "state": breaker.state,
+                "failures": breaker.failures,
+                "error": breaker.last_error,
+                "retry_after": breaker.retry_after() if breaker.state != CircuitBreaker.CLOSED else None,
+                "latency_ms": history[ctx_id][-1][1] if history[ctx_id] else None,
+                "latency_avg_ms": round(sum(latencies) / len(latencies), 1) if latencies else None,
+                "history": [{"time": ts, "latency_ms": latency} for ts, latency in history[ctx_id]],
+            })
+        return result
+
+
+    def _ping(self, ctx_id: str, result: dict) -> None:
+        try:
+            start = time.monotonic()
+            get_docker_manager(ctx_id).ping()
+            result["latency"] = round((time.monotonic() - start) * 1000, 1)
+        except Exception as e:
+            result["error"] = str(e)
+
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            ctx_ids = [ctx["id"] for ctx in get_docker_contexts()]
+            checks = [threading.Thread(target=self.check, args=(ctx_id,), daemon=True) for ctx_id in ctx_ids]
+            for check in checks:
+                check.start()
+            for check in checks:
+                check.join()
+            self._stopped.wait(self.interval)
+
+
+health_monitor = None
+health_monitor_lock = threading.Lock()
+health_monitor_pid = os.getpid()
+
+
+def get_context_health_monitor() -> ContextHealthMonitor:
+    """
+    Get the context health monitor of this process.
+
+    :return: ContextHealthMonitor
+    """
+    global health_monitor, health_monitor_pid
+    with health_monitor_lock:
+        # The monitor thread does not survive a fork
+        if health_monitor is None or health_monitor_pid != os.getpid():
+            health_monitor = ContextHealthMonitor()
+            health_monitor_pid = os.getpid()
+        return health_monitor
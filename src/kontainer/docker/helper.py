@@ -1,40 +1,30 @@
-import os
-import subprocess
-
 import docker
 
 from docker import DockerClient
 
+from kontainer.docker.util import index_volume_mounts
+from kontainer.docker.volumesize import scan_directory_size
 
-def get_docker_volume_size(client: DockerClient, volume_name: str):
-    """
-    Get Docker Volume Size.
-    Uses the 'du' command to calculate the size of the directory.
-    This is a Unix-based solution and may not work on Windows.
-    -> Has bad performance for large volumes.
 
+def get_docker_volume_size(client: DockerClient, volume_name: str, mount_point: str = None):
+    """
+    Get Docker Volume Size in KB.
+    Scans the volume's mount point on the host, like 'du -s'.
+    Requires access to the docker host's file system.
 
     :param client: DockerClient
     :param volume_name: str
+    :param mount_point: The volume's mount point. Looked up, if not set.
     """
-
-    # Get the volume details
-    volume = client.volumes.get(volume_name)
-
-    # Path to the volume's mount point on the host
-    mount_point = volume.attrs['Mountpoint']
-
-    # Use the 'du' command to calculate the size of the directory
-    # This works on Unix-based systems (Linux/MacOS)
-    size_command = f"du -s {mount_point} | cut -f1"
+    if mount_point is None:
+        # Get the volume details
+        volume = client.volumes.get(volume_name)
+        mount_point = volume.attrs['Mountpoint']
 
     volume_size = 0
     try:
-        # volume_size = subprocess.check_output(size_command, shell=True).decode().strip()
-        output = os.popen(size_command).read().strip()
-        if output:
-            volume_size = int(output)
-    except subprocess.CalledProcessError as e:
+        volume_size = scan_directory_size(mount_point)
+    except OSError as e:
         print(f"Failed to get_volume_size for volume {volume_name}: {e}")
         volume_size = -1
 
@@ -49,19 +39,7 @@ def get_containers_using_volume(client: DockerClient, volume_name: str):
     :param volume_name: str
     :return: list
     """
-    containers_using_volume = []
-
-    # Iterate through all running containers
-    for container in client.containers.list(all=True):  # 'all=True' includes stopped containers
-        container_info = container.attrs
-        mounts = container_info.get("Mounts", [])
-
-        # Check if the volume is in the container's mounts
-        for mount in mounts:
-            if mount.get("Name") == volume_name:
-                containers_using_volume.append(container.name)
-
-    return containers_using_volume
+    return map_volumes_to_containers(client).get(volume_name, [])
 
 
 def get_volumes_attached_to_container(client: DockerClient, container_name: str):
@@ -88,18 +66,6 @@ def map_volumes_to_containers(client: DockerClient):
 
     Returns: dict
     """
-    volume_usage = {}
-
-    # Iterate through all containers
-    for container in client.containers.list(all=True):
-        container_name = container.name
-        mounts = container.attrs.get("Mounts", [])
-
-        for mount in mounts:
-            if "Name" in mount:
-                volume_name = mount["Name"]
-                if volume_name not in volume_usage:
-                    volume_usage[volume_name] = []
-                volume_usage[volume_name].append(container_name)
-
-    return volume_usage
\ No newline at end of file
+    # 'all=True' includes stopped containers
+    containers = client.containers.list(all=True, sparse=True)
+    return index_volume_mounts([c.attrs for c in containers])
@@ -0,0 +1,412 @@
+import os
+import threading
+import time
+
+import docker.errors
+
+from kontainer import settings
+from kontainer.docker.events import get_docker_events_buffer
+from kontainer.docker.pool import get_docker_manager
+from kontainer.docker.util import get_container_volume_names, get_container_name
+
+
+# Container event actions which do not change the container's inspect data
+IGNORED_CONTAINER_ACTIONS = ("exec_create", "exec_start", "exec_die", "exec_detach",
+                             "attach", "detach", "resize", "top", "export", "commit",
+                             "copy", "archive-path", "extract-to-dir")
+
+
+class DockerInventory:
+    """
+    In-memory inventory of containers, images, volumes and networks of a docker context.
+
+    The inventory is loaded once and then kept up to date by incremental updates
+    from the shared docker events buffer of the context (see DockerEventsBuffer).
+    If the event stream is reconnected, the inventory falls back to a full resync.
+
+    Each event only refreshes the object it refers to,
+    e.g. a container 'start' event reloads the summary of that single container.
+
+    Containers are stored as summaries from the container list endpoint,
+    so loading the inventory takes a single round trip.
+    Full inspect data is fetched lazily per container and kept until the next event
+    for that container.
+
+    An inverted index of volume name to the ids of the containers mounting the volume
+    is built with each resync and updated with each container event.
+
+    Listeners registered with `add_listener` are called with each event
+    after it has been applied to the inventory.
+    """
+
+    def __init__(self, ctx_id: str):
+        self.ctx_id = ctx_id
+        self.loaded_at = None
+
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._containers: dict[str, dict] = {}
+        self._container_details: dict[str, dict] = {}
+        self._images: dict[str, dict] = {}
+        self._volumes: dict[str, dict] = {}
+        self._networks: dict[str, dict] = {}
+        self._volume_index: dict[str, set[str]] = {}
+        self._listeners = []
+
+
+    @property
+    def client(self):
+        return get_docker_manager(self.ctx_id).client
+
+
+    def add_listener(self, listener) -> None:
+        """
+        Register an event listener.
+
+        :param listener: Callable, which receives the decoded docker event dict
+        """
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+
+    def remove_listener(self, listener) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+
+    def ensure_started(self) -> None:
+        """
+        Subscribe to the docker events and load the inventory, if not already loaded.
+        """
+        if self.loaded_at is not None:
+            return
+
+        with self._load_lock:
+            if self.loaded_at is not None:
+                return
+
+            events_buffer = get_docker_events_buffer(self.ctx_id)
+            events_buffer.add_listener(self.apply_event, on_reset=self.invalidate)
+            events_buffer.ensure_started()
+            events_buffer.wait_connected(timeout=5)
+
+            cursor = events_buffer.cursor
+            self.resync()
+            # Events received while loading might not be reflected in the loaded state
+            events, _, _ = events_buffer.read(cursor)
+            for event in events:
+                self._apply(event)
+
+
+    def invalidate(self) -> None:
+        """
+        Force a full resync with the next read.
+        """
+        self.loaded_at = None
+
+
+    def stop(self) -> None:
+        """
+        Unsubscribe from the docker events.
+        """
+        get_docker_events_buffer(self.ctx_id).remove_listener(self.apply_event, on_reset=self.invalidate)
+        self.loaded_at = None
+
+
+    def resync(self) -> None:
+        """
+        Reload the full inventory from the docker daemon.
+        """
+        client = self.client
+        containers = {c['Id']: c for c in client.api.containers(all=True)}
+        images = {i.id: i.attrs for i in client.images.list(all=True)}
+        volumes = {v.attrs['Name']: v.attrs for v in client.volumes.list()}
+        networks = {n.id: n.attrs for n in client.networks.list()}
+
+        volume_index = dict()
+        for container_id, summary in containers.items():
+            for volume_name in get_container_volume_names(summary):
+                volume_index.setdefault(volume_name, set()).add(container_id)
+
+        with self._lock:
+            self._containers = containers
+            self._container_details = {}
+            self._volume_index = volume_index
+            self._images = images
+            self._volumes = volumes
+            self._networks = networks
+            self.loaded_at = time.time()
+
+
+    # READ
+
+    def list_containers(self, inspect=False) -> list[dict]:
+        """
+        List all containers.
+
+        :param inspect: If True, return the full inspect data instead of the summaries
+        :return: list of container summaries or container inspect data
+        """
+        self.ensure_started()
+        with self._lock:
+            containers = list(self._containers.values())
+
+        if inspect:
+            containers = [self._inspect_container(c['Id']) for c in containers]
+            return [c for c in containers if c is not None]
+        return containers
+
+
+    def find_container_id(self, key) -> str | None:
+        """
+        Lookup a container id by id, id prefix or name.
+
+        :param key: Container id, id prefix or name
+        :return: Container id or None
+        """
+        self.ensure_started()
+        with self._lock:
+            if key in self._containers:
+                return key
+
+            name = key if key.startswith("/") else f"/{key}"
+            for container_id, summary in self._containers.items():
+                if name in (summary.get('Names') or []) or container_id.startswith(key):
+                    return container_id
+        return None
+
+
+    def get_container(self, key) -> dict | None:
+        """
+        Get the inspect data of a container by id, id prefix or name.
+
+        :param key: Container id, id prefix or name
+        :return: Container inspect data or None
+        """
+        container_id = self.find_container_id(key)
+        if container_id is None:
+            return None
+        return self._inspect_container(container_id)
+
+
+    def list_images(self) -> list[dict]:
+        self.ensure_started()
+        with self._lock:
+            return list(self._images.values())
+
+
+    def list_volumes(self) -> list[dict]:
+        self.ensure_started()
+        with self._lock:
+            return list(self._volumes.values())
+
+
+    def get_volume(self, name) -> dict | None:
+        self.ensure_started()
+        with self._lock:
+            return self._volumes.get(name)
+
+
+    def get_volume_usage(self) -> dict[str, list[str]]:
+        """
+        Get the map of volume names to the names of the containers using the volume.
+        Only volumes in use are included.
+
+        :return: dict of volume name to list of container names
+        """
+        self.ensure_started()
+        with self._lock:
+            return {volume_name: [get_container_name(self._containers[cid]) for cid in container_ids]
+                    for volume_name, container_ids in self._volume_index.items()}
+
+
+    def get_volume_containers(self, volume_name) -> list[str]:
+        """
+        Get the names of the containers using a volume.
+
+        :param volume_name: Volume name
+        :return: list of container names
+        """
+        self.ensure_started()
+        with self._lock:
+            return [get_container_name(self._containers[cid])
+                    for cid in self._volume_index.get(volume_name, ())]
+
+
+    def list_networks(self) -> list[dict]:
+        self.ensure_started()
+        with self._lock:
+            return list(self._networks.values())
+
+
+    # EVENTS
+
+    def apply_event(self, event: dict) -> None:
+        """
+        Apply a single docker event to the inventory.
+
+        :param event: Decoded docker event
+        """
+        self._apply(event)
+
+        for listener in list(self._listeners):
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"Inventory listener failed: {e}")
+
+
+    def _apply(self, event: dict) -> None:
+        event_type = event.get('Type')
+        action = event.get('Action', '')
+        actor_id = event.get('Actor', {}).get('ID') or event.get('id')
+
+        try:
+            if event_type == "container":
+                self._apply_container_event(action, actor_id)
+            elif event_type == "image":
+                self._apply_image_event(action, actor_id)
+            elif event_type == "volume":
+                self._apply_volume_event(action, actor_id)
+            elif event_type == "network":
+                self._apply_network_event(action, actor_id)
+        except Exception as e:
+            print(f"Inventory failed to apply {event_type} {action} event for {actor_id}: {e}")
+
+
+    def _inspect_container(self, container_id: str) -> dict | None:
+        with self._lock:
+            details = self._container_details.get(container_id)
+        if details is not None:
+            return details
+
+        try:
+            details = self.client.api.inspect_container(container_id)
+        except docker.errors.NotFound:
+            return None
+
+        with self._lock:
+            # Only cache the details, if the container was not removed in the meantime
+            if container_id in self._containers:
+                self._container_details[container_id] = details
+        return details
+
+
+    def _apply_container_event(self, action: str, container_id: str) -> None:
+        if action.startswith(IGNORED_CONTAINER_ACTIONS):
+            return
+
+        with self._lock:
+            self._container_details.pop(container_id, None)
+            if action == "destroy":
+                self._set_container(container_id, None)
+                return
+
+        result = self.client.api.containers(all=True, filters={'id': container_id})
+        summary = None
+        for item in result:
+            if item['Id'] == container_id:
+                summary = item
+        with self._lock:
+            self._set_container(container_id, summary)
+
+
+    def _set_container(self, container_id: str, summary: dict | None) -> None:
+        # Caller must hold self._lock
+        previous = self._containers.pop(container_id, None)
+        if previous is not None:
+            for volume_name in get_container_volume_names(previous):
+                container_ids = self._volume_index.get(volume_name)
+                if container_ids is not None:
+                    container_ids.discard(container_id)
+                    if len(container_ids) == 0:
+                        del self._volume_index[volume_name]
+
+        if summary is not None:
+            self._containers[container_id] = summary
+            for volume_name in get_container_volume_names(summary):
+                self._volume_index.setdefault(volume_name, set()).add(container_id)
+
+
+    def _apply_volume_event(self, action: str, volume_name: str) -> None:
+        if action == "destroy":
+            with self._lock:
+                self._volumes.pop(volume_name, None)
+        elif action == "create":
+            result = self.client.api.volumes(filters={'name': volume_name})
+            for attrs in result.get('Volumes') or []:
+                if attrs['Name'] == volume_name:
+                    with self._lock:
+                        self._volumes[volume_name] = attrs
+
+
+    def _apply_network_event(self, action: str, network_id: str) -> None:
+        if action == "destroy":
+            with self._lock:
+                self._networks.pop(network_id, None)
+            return
+
+        result = self.client.api.networks(ids=[network_id])
+        with self._lock:
+            for attrs in result:
+                if attrs['Id'] == network_id:
+                    self._networks[network_id] = attrs
+
+
+    def _apply_image_event(self, action: str, image_ref: str) -> None:
+        if action == "delete":
+            with self._lock:
+                self._images.pop(image_ref, None)
+            return
+
+        # For 'pull' events the actor id is the image reference, not the image id
+        try:
+            attrs = self.client.api.inspect_image(image_ref)
+        except docker.errors.NotFound:
+            with self._lock:
+                self._images.pop(image_ref, None)
+            return
+
+        with self._lock:
+            self._images[attrs['Id']] = attrs
+
+
+inventory_cache = {}
+inventory_cache_lock = threading.Lock()
+inventory_cache_pid = os.getpid()
+
+
+def get_docker_inventory(ctx_id: str) -> DockerInventory | None:
+    """
+    Get the inventory for the given context id.
+
+    :param ctx_id: context id
+    :return: DockerInventory or None, if the inventory cache is disabled
+    """
+    if not settings.KONTAINER_ENABLE_INVENTORY_CACHE:
+        return None
+
+    global inventory_cache, inventory_cache_pid
+    with inventory_cache_lock:
+        # Watcher threads do not survive a fork
+        if inventory_cache_pid != os.getpid():
+            inventory_cache = {}
+            inventory_cache_pid = os.getpid()
+
+        if ctx_id not in inventory_cache:
+            inventory_cache[ctx_id] = DockerInventory(ctx_id)
+        return inventory_cache[ctx_id]
+
+
+def discard_docker_inventory(ctx_id: str) -> None:
+    """
+    Stop and remove the inventory for the given context id.
+
+    :param ctx_id: context id
+    """
+    with inventory_cache_lock:
+        inventory = inventory_cache.pop(ctx_id, None)
+    if inventory is not None:
+        inventory.stop()
@@ -0,0 +1,322 @@
+import heapq
+import queue
+import re
+import threading
+import time
+
+from kontainer import settings
+from kontainer.docker.util import get_container_labels, get_container_name
+
+
+def iter_log_lines(chunks, max_line_length=None):
+    """
+    Split a stream of byte chunks into lines.
+    Lines longer than max_line_length are split, so memory use stays bounded.
+
+    :param chunks: iterable of bytes
+    :param max_line_length: max. line length in bytes
+    :return: generator of lines (bytes, without the trailing newline)
+    """
+    if max_line_length is None:
+        max_line_length = settings.KONTAINER_LOGS_MAX_LINE_LENGTH
+
+    buf = bytearray()
+    for chunk in chunks:
+        buf += chunk
+        start = 0
+        while True:
+            idx = buf.find(b"\n", start)
+            if idx < 0:
+                break
+            yield bytes(buf[start:idx]).rstrip(b"\r")
+            start = idx + 1
+        del buf[:start]
+
+        while len(buf) > max_line_length:
+            yield bytes(buf[:max_line_length])
+            del buf[:max_line_length]
+
+    if len(buf) > 0:
+        yield bytes(buf).rstrip(b"\r")
+
+
+class LogStreamReader:
+    """
+    Reads the lines of a docker log stream in a background thread into a bounded queue.
+
+    The bounded queue applies backpressure to the docker stream, so the memory use
+    does not depend on the log size or on how fast the client consumes the lines.
+    Reading with a timeout allows the consumer to send keep-alive messages
+    and to notice a client disconnect while a followed log is idle.
+    """
+
+    _EOF = object()
+
+    def __init__(self, stream, max_lines=None, max_line_length=None, on_ready=None):
+        """
+        :param stream: docker log stream (CancellableStream)
+            or a callable, which opens the stream in the reader thread
+        :param max_lines: max. number of buffered lines
+        :param max_line_length: max. line length in bytes
+        :param on_ready: optional callable, which is called when a line or the end of the stream is available
+        """
+        if max_lines is None:
+            max_lines = settings.KONTAINER_LOGS_STREAM_BUFFER_LINES
+
+        self.stream = stream
+        self.max_line_length = max_line_length
+        self.error = None
+        self.on_ready = on_ready
+        self._queue = queue.Queue(maxsize=max_lines)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="log-stream-reader", daemon=True)
+        self._thread.start()
+
+
+    def _put(self, item) -> bool:
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                if self.on_ready is not None:
+                    self.on_ready()
+                return True
+            except queue.Full:
+                continue
+        return False
+
+
+    def _run(self) -> None:
+        try:
+            if callable(self.stream):
+                self.stream = self.stream()
+                if self._closed.is_set():
+                    self.stream.close()
+                    return
+
+            for line in iter_log_lines(self.stream, self.max_line_length):
+                if not self._put(line):
+                    return
+        except Exception as e:
+            # Closing the stream from the consumer side raises here as well
+            if not self._closed.is_set():
+                self.error = e
+        finally:
+            self._put(self._EOF)
+
+
+    def read(self, timeout=None) -> bytes | None:
+        """
+        Read the next line.
+
+        :param timeout: seconds to wait for a line
+        :return: the line, or None if no line arrived within the timeout
+        :raises EOFError: if the stream has ended
+        """
+        try:
+            item = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+        if item is self._EOF:
+            # Put the EOF marker back, so subsequent reads raise EOFError as well.
+            # The producer has finished, so the queue has room for it.
+            self._queue.put_nowait(self._EOF)
+            self._closed.set()
+            raise EOFError()
+        return item
+
+
+    def iter_lines(self, idle_timeout=None):
+        """
+        Iterate over the lines until the stream ends.
+        Yields None, if no line arrived within the idle timeout.
+
+        :param idle_timeout: seconds
+        :return: generator of lines or None
+        """
+        while True:
+            try:
+                yield self.read(timeout=idle_timeout)
+            except EOFError:
+                return
+
+
+    def close(self) -> None:
+        """
+        Close the docker stream and stop the reader thread.
+        """
+        self._closed.set()
+        if callable(self.stream):
+            # Not opened yet. The reader thread closes the stream after opening it.
+            return
+        try:
+            self.stream.close()
+        except Exception:
+            pass
+
+
+_LOG_TIMESTAMP_RE = re.compile(rb"^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(\.\d+)?(Z|[+-]\d{2}:\d{2}) ")
+
+
+def split_log_timestamp(line: bytes) -> tuple[str | None, bytes]:
+    """
+    Split a docker log line with timestamp into a sortable timestamp key and the message.
+
+    Docker uses RFC3339Nano timestamps, which omit trailing zeros of the fraction,
+    so the fraction is padded to 9 digits to make the keys comparable as strings.
+
+    :param line: log line, e.g. b'2024-01-01T00:00:00.1Z message'
+    :return: tuple of timestamp key (None, if the line has no timestamp) and message
+    """
+    match = _LOG_TIMESTAMP_RE.match(line)
+    if match is None:
+        return None, line
+
+    seconds, fraction, tz = match.groups()
+    fraction = (fraction or b".")[1:10].ljust(9, b"0")
+    key = (seconds + b"." + fraction + tz).decode()
+    return key, line[match.end():]
+
+
+def get_log_source_names(containers: list[dict]) -> dict[str, str]:
+    """
+    Get the log prefix names for the containers of a stack.
+    The prefix is the compose service name, followed by the container number,
+    if the service has multiple containers.
+
+    :param containers: list of container attrs
+    :return: dict of container id to name
+    """
+    services = dict()
+    for attrs in containers:
+        labels = get_container_labels(attrs)
+        service = labels.get('com.docker.compose.service') or get_container_name(attrs) or attrs['Id'][:12]
+        services.setdefault(service, []).append(attrs)
+
+    names = dict()
+    for service, service_containers in services.items():
+        for attrs in service_containers:
+            number = get_container_labels(attrs).get('com.docker.compose.container-number')
+            if len(service_containers) > 1:
+                names[attrs['Id']] = f"{service}-{number}" if number else get_container_name(attrs)
+            else:
+                names[attrs['Id']] = service
+    return names
+
+
+class MergedLogReader:
+    """
+    Merges the log streams of multiple containers into a single time-ordered stream.
+
+    Each stream is read by its own LogStreamReader with a bounded buffer.
+    The merge keeps the current head line of each stream in a heap ordered by timestamp.
+    A line is emitted when every open stream has a line buffered, so the order is exact.
+    In follow mode an idle stream would block the merge, so a buffered line is emitted
+    after it has waited for `reorder_window` seconds.
+
+    Each line is prefixed with its source name, e.g. 'web-1 | message'.
+    """
+
+    def __init__(self, sources: dict, timestamps=True, follow=False, max_lines=None, reorder_window=None):
+        """
+        :param sources: dict of source name to docker log stream (or callable, which opens the stream).
+            The streams must be opened with timestamps.
+        :param timestamps: Include the timestamps in the merged lines
+        :param follow: True, if the streams are followed
+        :param max_lines: max. number of buffered lines per stream
+        :param reorder_window: seconds to wait for idle streams in follow mode
+        """
+        if reorder_window is None:
+            reorder_window = settings.KONTAINER_LOGS_REORDER_WINDOW
+
+        self.timestamps = timestamps
+        self.reorder_window = reorder_window if follow else None
+        self.error = None
+        self._ready = threading.Event()
+
+        width = max([len(name) for name in sources.keys()] + [0])
+        self._prefixes = {name: f"{name:<{width}} | ".encode() for name in sources.keys()}
+        self._readers = {name: LogStreamReader(stream, max_lines=max_lines, on_ready=self._ready.set)
+                         for name, stream in sources.items()}
+
+
+    def _format(self, name: str, key: str | None, message: bytes) -> bytes:
+        if self.timestamps and key:
+            return self._prefixes[name] + key.encode() + b" " + message
+        return self._prefixes[name] + message
+
+
+    def iter_lines(self, idle_timeout=None):
+        """
+        Iterate over the merged lines until all streams have ended.
+        Yields None, if no line was emitted within the idle timeout.
+
+        :param idle_timeout: seconds
+        :return: generator of lines or None
+        """
+        heap = []
+        seq = 0
+        last_keys = {}
+        ended = set()
+        pending = set(self._readers.keys())
+        idle_since = time.monotonic()
+
+        while True:
+            self._ready.clear()
+
+            # Fetch the next line of each stream, which has no line in the heap
+            for name in list(pending):
+                reader = self._readers[name]
+                try:
+                    line = reader.read(timeout=0)
+                except EOFError:
+                    pending.discard(name)
+                    ended.add(name)
+                    if reader.error is not None and self.error is None:
+                        self.error = reader.error
+                    continue
+                if line is None:
+                    continue
+
+                key, message = split_log_timestamp(line)
+                if key is None:
+                    # Lines without timestamp keep the position of the previous line
+                    sort_key = last_keys.get(name, "")
+                else:
+                    sort_key = last_keys[name] = key
+                heapq.heappush(heap, (sort_key, seq, name, key, message, time.monotonic()))
+                seq += 1
+                pending.discard(name)
+
+            if len(heap) == 0 and len(pending) == 0:
+                return
+
+            now = time.monotonic()
+            if len(heap) > 0:
+                waited = now - heap[0][5]
+                if len(pending) == 0 or (self.reorder_window is not None and waited >= self.reorder_window):
+                    _, _, name, key, message, _ = heapq.heappop(heap)
+                    if name not in ended:
+                        pending.add(name)
+                    idle_since = now
+                    yield self._format(name, key, message)
+                    continue
+
+            timeouts = []
+            if len(heap) > 0 and self.reorder_window is not None:
+                timeouts.append(self.reorder_window - (now - heap[0][5]))
+            if idle_timeout is not None:
+                if now - idle_since >= idle_timeout:
+                    idle_since = now
+                    yield None
+                    continue
+                timeouts.append(idle_timeout - (now - idle_since))
+            self._ready.wait(max(min(timeouts), 0) if len(timeouts) > 0 else None)
+
+
+    def close(self) -> None:
+        """
+        Close all streams.
+        """
+        for reader in self._readers.values():
+            reader.close()
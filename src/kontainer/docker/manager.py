@@ -1,4 +1,6 @@
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from sys import api_version
 
 import docker
@@ -9,39 +11,91 @@ from docker.models.volumes import Volume
 
 from kontainer import settings
 from kontainer.docker.helper import get_docker_volume_size
+from kontainer.docker.util import get_container_labels, get_container_name, index_volume_mounts, \
+    order_containers_by_dependencies
+from kontainer.docker.volumesize import scan_volume_sizes
 from kontainer.error import ContainerNotFoundError
 
 
+# Container actions supported by bulk_container_action
+CONTAINER_ACTIONS = ("start", "stop", "restart", "pause", "remove")
+
+
 class DockerManager:
     """
     A Class to manage Docker resources via Python Docker SDK
     """
 
-    def __init__(self, base_url: str = None, use_ssh_client: bool = False):
+    def __init__(self, base_url: str = None, use_ssh_client: bool = False, max_pool_size: int = None,
+                 timeout=None):
         """
         Initialize Python Docker Client
+
+        :param base_url: Docker host URL. Uses the environment, if None.
+        :param use_ssh_client: If True, shell out to the ssh client for ssh:// hosts
+        :param max_pool_size: Max. number of keep-alive connections held by the client
+        :param timeout: Max. seconds to wait for the docker host while connecting and negotiating
+            the API version. The API calls use the default timeout of the client.
         """
+        client_kwargs = dict()
+        if max_pool_size is not None:
+            client_kwargs['max_pool_size'] = max_pool_size
+        if timeout is not None:
+            client_kwargs['timeout'] = timeout
+
         if base_url is None:
-            self.client = docker.from_env(use_ssh_client=use_ssh_client)
+            self.client = docker.from_env(use_ssh_client=use_ssh_client, **client_kwargs)
         else:
-            self.client = docker.DockerClient(base_url=base_url, use_ssh_client=use_ssh_client)
+            self.client = docker.DockerClient(base_url=base_url, use_ssh_client=use_ssh_client, **client_kwargs)
+        self.client.api.timeout = docker.constants.DEFAULT_TIMEOUT_SECONDS
+
+    def close(self) -> None:
+        """
+        Close the Docker Client and release its pooled connections
+        """
+        self.client.close()
 
-    def ping(self) -> bool:
+    def ping(self, timeout=None) -> bool:
         """
         Ping Docker Engine
 
+        :param timeout: Max. seconds to wait for the response. Uses the client timeout, if None.
         :return: bool
         """
-        return self.client.ping()
+        if timeout is None:
+            return self.client.ping()
+        return self.api_get("/_ping", timeout, versioned=False).text == "OK"
 
 
-    def version(self) -> str:
+    def version(self, timeout=None) -> str:
         """
         Get Docker Version Info
 
+        :param timeout: Max. seconds to wait for the response. Uses the client timeout, if None.
         :return: dict
         """
-        return self.client.version(api_version=True)
+        if timeout is None:
+            return self.client.version(api_version=True)
+        return self.api_get("/version", timeout).json()
+
+
+    def api_get(self, path: str, timeout, params=None, versioned=True):
+        """
+        Send a GET request to the docker API with a timeout for this request only.
+        The pooled client is shared, so its default timeout is not changed.
+
+        :param path: API path, e.g. '/containers/json'
+        :param timeout: Max. seconds to wait for the response
+        :param params: query parameters
+        :param versioned: If True, prefix the path with the negotiated API version
+        :return: requests Response
+        :raises requests.HTTPError: if the docker API returned an error
+        """
+        api = self.client.api
+        url = f"{api.base_url}/v{api.api_version}{path}" if versioned else f"{api.base_url}{path}"
+        response = api.get(url, params=params, timeout=timeout)
+        response.raise_for_status()
+        return response
 
 
     def info(self) -> dict:
@@ -78,10 +132,7 @@ class DockerManager:
         :param key: id from Container on Docker
         :return: Container Object
         """
-        if not self.container_exists(key):
-            raise ContainerNotFoundError(key)
-
-        container = self.client.containers.get(key)
+        container = self._get_container(key)
 
         # Unpause if paused
         if container.status == 'paused':
@@ -100,10 +151,7 @@ class DockerManager:
         :param key: id from Container on Docker
         :return: Container Object
         """
-        if not self.container_exists(key):
-            raise ContainerNotFoundError(key)
-
-        container = self.client.containers.get(key)
+        container = self._get_container(key)
         container.pause()
         return container
 
@@ -114,10 +162,7 @@ class DockerManager:
         :param key: id from Container on Docker
         :return: Container Object
         """
-        if not self.container_exists(key):
-            raise ContainerNotFoundError(key)
-
-        container = self.client.containers.get(key)
+        container = self._get_container(key)
         container.stop()
         container.remove()
         return container
@@ -130,10 +175,7 @@ class DockerManager:
         :param key: id from Container on Docker
         :return: Container Object
         """
-        if not self.container_exists(key):
-            raise ContainerNotFoundError(key)
-
-        container = self.client.containers.get(key)
+        container = self._get_container(key)
         container.stop()
         return container
 
@@ -145,20 +187,24 @@ class DockerManager:
         :param key: id from Container on Docker
         :return: Container Object
         """
-        if not self.container_exists(key):
-            raise ContainerNotFoundError(key)
-
-        container = self.client.containers.get(key)
+        container = self._get_container(key)
         return container
 
 
-    def list_containers(self) -> list[Container]:
+    def list_containers(self, sparse=False, filters=None) -> list[Container]:
         """
         Get All Containers
 
+        With sparse=False, docker-py inspects every container (N+1 requests).
+        With sparse=True, only the container summaries from the list endpoint
+        are returned (1 request). See `kontainer.docker.util` for accessors
+        that work with both formats.
+
+        :param sparse: If True, skip the per-container inspect
+        :param filters: Docker container filters
         :return: list
         """
-        all_containers = self.client.containers.list(all=True)
+        all_containers = self.client.containers.list(all=True, sparse=sparse, filters=filters)
         return all_containers
 
 
@@ -169,24 +215,147 @@ class DockerManager:
         :param key: id from Container on Docker
         :return: Container Object
         """
-        if not self.container_exists(key):
-            raise ContainerNotFoundError(key)
-
-        container = self.client.containers.get(key)
+        container = self._get_container(key)
         container.restart()
         return container
 
 
-    def restart_all_containers(self) -> list[Container]:
+    def restart_all_containers(self, parallelism=None, ordered=False, wait_healthy=False,
+                               timeout=None, health_timeout=None) -> list[dict]:
         """
-        Restart All Containers
+        Restart All running Containers
 
-        :return: list
+        The containers are restarted concurrently, with at most `parallelism` restarts at a time.
+        If `ordered` is set, the containers are restarted in batches ordered by their
+        compose `depends_on` dependencies. If `wait_healthy` is set, each batch waits
+        for its containers to become healthy, before the next batch is started.
+
+        :param parallelism: Max. number of concurrent restarts
+        :param ordered: Restart in batches ordered by compose dependencies
+        :param wait_healthy: Wait for each batch to become healthy
+        :param timeout: Seconds to wait for each container to stop before killing it
+        :param health_timeout: Max. seconds to wait for a batch to become healthy
+        :return: list of per-container results
         """
-        all_containers = self.client.containers.list(filters={'status': 'running'})
-        for container in all_containers:
-            container.restart()
-        return all_containers
+        all_containers = self.client.containers.list(filters={'status': 'running'}, sparse=True)
+        containers = [c.attrs for c in all_containers]
+        return self.restart_containers(containers, parallelism=parallelism, ordered=ordered,
+                                       wait_healthy=wait_healthy, timeout=timeout, health_timeout=health_timeout)
+
+
+    def restart_containers(self, containers, parallelism=None, ordered=False, wait_healthy=False,
+                           timeout=None, health_timeout=None) -> list[dict]:
+        """
+        Restart Containers concurrently. See restart_all_containers.
+
+        :param containers: list of container attrs
+        :return: list of per-container results
+        """
+        if parallelism is None:
+            parallelism = settings.KONTAINER_RESTART_PARALLELISM
+        if health_timeout is None:
+            health_timeout = settings.KONTAINER_RESTART_HEALTH_TIMEOUT
+
+        def _restart(attrs):
+            result = {"id": attrs['Id'], "name": get_container_name(attrs)}
+            try:
+                if timeout is not None:
+                    self.client.api.restart(attrs['Id'], timeout=timeout)
+                else:
+                    self.client.api.restart(attrs['Id'])
+                result["success"] = True
+            except Exception as e:
+                result["success"] = False
+                result["error"] = str(e)
+            return result
+
+        batches = order_containers_by_dependencies(containers) if ordered else [containers]
+        results = []
+        if len(containers) == 0:
+            return results
+
+        with ThreadPoolExecutor(max_workers=max(1, min(parallelism, len(containers)))) as executor:
+            for batch in batches:
+                batch_results = list(executor.map(_restart, batch))
+                if wait_healthy:
+                    restarted = [r for r in batch_results if r["success"]]
+                    health = self.wait_containers_healthy([r["id"] for r in restarted], health_timeout)
+                    for r in restarted:
+                        r["health"] = health.get(r["id"])
+                results.extend(batch_results)
+        return results
+
+
+    def wait_containers_healthy(self, container_ids, timeout, interval=1.0) -> dict:
+        """
+        Wait for containers to become healthy.
+        Containers without a healthcheck are ready, as soon as they are running.
+
+        :param container_ids: list of container ids
+        :param timeout: Max. seconds to wait
+        :param interval: Seconds between checks
+        :return: dict of container id to health status ('healthy', 'running', 'unhealthy', 'timeout', ...)
+        """
+        deadline = time.monotonic() + timeout
+        status = dict()
+        pending = list(container_ids)
+        while True:
+            for container_id in list(pending):
+                try:
+                    state = self.client.api.inspect_container(container_id).get('State', {})
+                except docker.errors.NotFound:
+                    status[container_id] = "removed"
+                    pending.remove(container_id)
+                    continue
+
+                health = state.get('Health')
+                if health is not None:
+                    status[container_id] = health.get('Status')
+                    ready = status[container_id] in ("healthy", "unhealthy")
+                else:
+                    status[container_id] = state.get('Status')
+                    ready = status[container_id] != "restarting"
+                if ready:
+                    pending.remove(container_id)
+
+            if len(pending) == 0 or time.monotonic() >= deadline:
+                break
+            time.sleep(interval)
+
+        for container_id in pending:
+            status[container_id] = "timeout"
+        return status
+
+
+    def bulk_container_action(self, action, keys, max_workers=None) -> list[dict]:
+        """
+        Run a container action on multiple containers concurrently
+
+        :param action: One of CONTAINER_ACTIONS, e.g. 'restart'
+        :param keys: list of container ids or names
+        :param max_workers: Max. number of concurrent docker requests
+        :return: list of per-container results, in the order of the keys
+        """
+        if action not in CONTAINER_ACTIONS:
+            raise ValueError(f"Unsupported container action: {action}")
+        if max_workers is None:
+            max_workers = settings.KONTAINER_BULK_MAX_WORKERS
+
+        method = getattr(self, f"{action}_container")
+
+        def _run(key):
+            try:
+                container = method(key)
+                return {"id": key, "name": container.name, "success": True}
+            except ContainerNotFoundError:
+                return {"id": key, "success": False, "error": f"Container {key} not found"}
+            except Exception as e:
+                return {"id": key, "success": False, "error": str(e)}
+
+        if len(keys) == 0:
+            return []
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(keys))) as executor:
+            return list(executor.map(_run, keys))
 
 
     def container_exists(self, key) -> bool:
@@ -196,7 +365,25 @@ class DockerManager:
         :param key: id from Container on Docker
         :return: bool
         """
-        return True if self.client.containers.get(key) else False
+        try:
+            self.client.containers.get(key)
+            return True
+        except docker.errors.NotFound:
+            return False
+
+
+    def _get_container(self, key) -> Container:
+        """
+        Get Container with a single inspect request
+
+        :param key: id or name from Container on Docker
+        :return: Container Object
+        :raises ContainerNotFoundError: if the container does not exist
+        """
+        try:
+            return self.client.containers.get(key)
+        except docker.errors.NotFound:
+            raise ContainerNotFoundError(key)
 
 
     def run_container(self, image_name, **kwargs) -> Container:
@@ -231,16 +418,13 @@ class DockerManager:
         :param key: id from Container on Docker
         :return: list
         """
-        if not self.container_exists(key):
-            raise ContainerNotFoundError(key)
-
         container_kwargs = {
             'stream': False,
             'tail': 500,
             'follow': False,
             'timestamps': True
         }
-        container = self.client.containers.get(key)
+        container = self._get_container(key)
         logs = list()
         log_bytes = container.logs(**container_kwargs, **kwargs)
         for log in log_bytes.decode().split('\n'):
@@ -248,6 +432,27 @@ class DockerManager:
         return logs
 
 
+    def stream_container_logs(self, key, follow=False, tail='all', since=None, until=None, timestamps=True):
+        """
+        Stream Container Logs
+
+        Returns the raw docker log stream. The caller must close the stream.
+
+        :param key: id or name from Container on Docker
+        :param follow: Keep the stream open and follow new log output
+        :param tail: Number of lines from the end of the logs or 'all'
+        :param since: Unix timestamp. Only logs since this time.
+        :param until: Unix timestamp. Only logs before this time.
+        :param timestamps: Prefix each line with its RFC3339 timestamp
+        :return: CancellableStream of bytes chunks
+        """
+        try:
+            return self.client.api.logs(key, stdout=True, stderr=True, stream=True, follow=follow,
+                                        tail=tail, since=since, until=until, timestamps=timestamps)
+        except docker.errors.NotFound:
+            raise ContainerNotFoundError(key)
+
+
     def exec_container_cmd(self, key, cmd) -> list[str]:
         """
         Execute Command in Container
@@ -256,10 +461,7 @@ class DockerManager:
         :param cmd: Command
         :return: list
         """
-        if not self.container_exists(key):
-            raise ContainerNotFoundError(key)
-
-        container = self.client.containers.get(key)
+        container = self._get_container(key)
         (exit_code, output) = container.exec_run(cmd, detach=False, stream=False, workdir="/")
 
         lines = output.decode().split('\n')
@@ -275,6 +477,7 @@ class DockerManager:
         """
         # Get all containers (running + stopped)
         containers = self.client.containers.list(all=True,
+                                                 sparse=True,
                                                  filters={"label": f"com.docker.compose.project={stack_name}"})
 
         return containers
@@ -303,17 +506,18 @@ class DockerManager:
             return None
 
         container = containers[0]
-        project_dir = container.attrs['Config']['Labels']['com.docker.compose.project.working_dir']
+        project_dir = get_container_labels(container.attrs).get('com.docker.compose.project.working_dir')
         return project_dir
 
 
-    def list_images(self) -> list[Image]:
+    def list_images(self, filters=None) -> list[Image]:
         """
         Get Images
 
+        :param filters: Docker image filters
         :return: Dictionary [id, tags, labels]
         """
-        all_containers = self.client.images.list(all=True)
+        all_containers = self.client.images.list(all=True, filters=filters)
         return all_containers
 
 
@@ -354,34 +558,27 @@ class DockerManager:
         return image
 
 
-    def list_volumes(self, check_in_use=False, check_size=False) -> list[Volume]:
+    def list_volumes(self, check_in_use=False, check_size=False, filters=None) -> list[Volume]:
         """
         Get Volumes
 
+        :param filters: Docker volume filters
         :return: Dictionary [id, tags, labels]
         """
-        all_volumes = self.client.volumes.list()
+        all_volumes = self.client.volumes.list(filters=filters)
 
         if check_in_use:
-            containers = self.client.containers.list(all=True)
-            def _map_in_use(volume):
-                related_containers = []
-                for c in containers:
-                    for m in c.attrs['Mounts']:
-                        if m['Type'] == "volume" and m['Name'] is not None and volume.attrs['Name'] == m['Name']:
-                            related_containers.append(c.attrs['Name'])
-                            break
-
+            containers = self.client.containers.list(all=True, sparse=True)
+            volume_usage = index_volume_mounts([c.attrs for c in containers])
+            for volume in all_volumes:
+                related_containers = [f"/{name}" for name in volume_usage.get(volume.attrs['Name'], [])]
                 volume.attrs['_InUse'] = len(related_containers) > 0
                 volume.attrs['_ContainerIds'] = related_containers
-                return volume
-            all_volumes = list(map(lambda x: _map_in_use(x), all_volumes))
 
         if check_size:
-            def _map_size(volume):
-                volume.attrs['_Size'] = get_docker_volume_size(self.client, volume.attrs['Name'])
-                return volume
-            all_volumes = list(map(lambda x: _map_size(x), all_volumes))
+            sizes = scan_volume_sizes([v.attrs for v in all_volumes])
+            for volume in all_volumes:
+                volume.attrs['_Size'] = sizes.get(volume.attrs['Name'])
 
         return all_volumes
 
@@ -422,13 +619,14 @@ class DockerManager:
         return volume
 
 
-    def list_networks(self) -> list[Network]:
+    def list_networks(self, filters=None) -> list[Network]:
         """
         Get Networks
 
+        :param filters: Docker network filters
         :return: list
         """
-        all_networks = self.client.networks.list()
+        all_networks = self.client.networks.list(filters=filters)
         return all_networks
 
 
@@ -0,0 +1,105 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from kontainer import settings
+from kontainer.docker.pool import get_docker_manager
+from kontainer.docker.util import count_containers_by_state, get_compose_project_states
+from kontainer.stacks.stacksmanager import get_stacks_manager
+
+
+def get_context_overview(ctx_id: str, timeout=None) -> dict:
+    """
+    Query the overview of a single docker context.
+
+    :param ctx_id: context id
+    :param timeout: max. seconds to wait for each request to the docker host
+    :return: dict with ping latency, engine version, container and stack counts
+    """
+    if timeout is None:
+        timeout = settings.KONTAINER_OVERVIEW_TIMEOUT
+
+    dkr = get_docker_manager(ctx_id, timeout=timeout)
+
+    start = time.monotonic()
+    dkr.ping(timeout=timeout)
+    latency = time.monotonic() - start
+
+    version = dkr.version(timeout=timeout)
+    containers = dkr.api_get("/containers/json", timeout, params={"all": 1}).json()
+    projects = get_compose_project_states(containers)
+    managed_names = [stack.name for stack in get_stacks_manager(ctx_id).list_all()]
+
+    return {
+        "latency_ms": round(latency * 1000, 1),
+        "version": version.get('Version'),
+        "api_version": version.get('ApiVersion'),
+        "os": version.get('Os'),
+        "arch": version.get('Arch'),
+        "containers": {
+            "total": len(containers),
+            **count_containers_by_state(containers),
+        },
+        "stacks": {
+            "total": len(set(managed_names) | set(projects.keys())),
+            "managed": len(managed_names),
+            "running": len([p for p, running in projects.items() if running]),
+        },
+    }
+
+
+def get_contexts_overview(contexts: list[dict], timeout=None, max_workers=None) -> list[dict]:
+    """
+    Query the overview of all docker contexts concurrently.
+
+    Each context is queried in its own worker thread, up to `max_workers` contexts at once.
+    Contexts, which did not answer within `timeout` seconds, are reported with status 'timeout',
+    so unreachable hosts do not delay the overview of the healthy hosts.
+    Each request to a docker host, including connecting a new client, times out after
+    `timeout` seconds as well, so the workers of unreachable hosts do not hang on.
+
+    :param contexts: list of docker contexts
+    :param timeout: max. seconds to wait for the contexts
+    :param max_workers: max. number of contexts queried concurrently. Contexts beyond this limit,
+        which are not queried within `timeout` seconds, are reported with status 'timeout' as well.
+    :return: list of dicts with the context id, host, status, elapsed seconds
+        and the context overview or error
+    """
+    if timeout is None:
+        timeout = settings.KONTAINER_OVERVIEW_TIMEOUT
+    if max_workers is None:
+        max_workers = settings.KONTAINER_OVERVIEW_MAX_WORKERS
+
+    results = []
+    if len(contexts) == 0:
+        return results
+
+    start = time.monotonic()
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(contexts)), thread_name_prefix="overview")
+    futures = [executor.submit(_timed, get_context_overview, ctx["id"], timeout) for ctx in contexts]
+    try:
+        wait(futures, timeout=timeout)
+    finally:
+        # Do not wait for hung hosts. Their workers finish in the background.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for ctx, future in zip(contexts, futures):
+        result = {"id": ctx["id"], "host": ctx.get("host")}
+        if not future.done():
+            result.update({"status": "timeout", "elapsed": round(time.monotonic() - start, 3),
+                           "error": f"No response within {timeout} seconds"})
+        elif future.cancelled():
+            result.update({"status": "timeout",
+                           "error": f"Not queried within {timeout} seconds"})
+        elif future.exception() is not None:
+            result.update({"status": "error", "error": str(future.exception())})
+        else:
+            overview, elapsed = future.result()
+            result.update({"status": "ok", "elapsed": round(elapsed, 3), **overview})
+        results.append(result)
+    return results
+
+
+def _timed(func, *args):
+    start = time.monotonic()
+    value = func(*args)
+    return value, time.monotonic() - start
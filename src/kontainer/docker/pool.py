@@ -0,0 +1,211 @@
+import os
+import threading
+import time
+
+from kontainer import settings
+from kontainer.docker.context import get_dockerhost_for_ctx_id
+from kontainer.docker.manager import DockerManager
+
+
+class _PoolEntry:
+    """
+    A pooled docker manager with its bookkeeping timestamps.
+    """
+
+    def __init__(self, ctx_id: str, docker_host: str, manager: DockerManager):
+        self.ctx_id = ctx_id
+        self.docker_host = docker_host
+        self.manager = manager
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.last_checked = self.created
+
+
+class DockerClientPool:
+    """
+    A thread-safe, fork-aware pool of docker managers keyed by context id.
+
+    Each context gets exactly one DockerManager per process. The underlying
+    DockerClient keeps its HTTP connection pool (unix socket, tcp or ssh),
+    so keep-alive connections and the negotiated API version are reused
+    across requests and celery tasks.
+
+    - Idle entries are closed and evicted after `idle_timeout` seconds.
+    - Entries that have not been health-checked for `health_check_interval` seconds
+      are pinged before they are handed out again and replaced if the ping fails.
+      The ping times out after KONTAINER_HEALTH_CHECK_TIMEOUT seconds, so a hung docker host
+      does not block the callers.
+    - After a fork the child process starts with an empty pool,
+      because sockets must not be shared between processes.
+    """
+
+    def __init__(self, idle_timeout=None, health_check_interval=None, max_pool_size=None):
+        self.idle_timeout = settings.KONTAINER_DOCKER_POOL_IDLE_TIMEOUT \
+            if idle_timeout is None else idle_timeout
+        self.health_check_interval = settings.KONTAINER_DOCKER_POOL_HEALTHCHECK_INTERVAL \
+            if health_check_interval is None else health_check_interval
+        self.max_pool_size = settings.KONTAINER_DOCKER_POOL_MAX_SIZE \
+            if max_pool_size is None else max_pool_size
+
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._ctx_locks: dict[str, threading.Lock] = {}
+        self._entries: dict[str, _PoolEntry] = {}
+
+
+    def get(self, ctx_id: str, timeout=None) -> DockerManager:
+        """
+        Get the pooled docker manager for the given context id.
+        Creates a new manager, if none exists or the existing one is unhealthy.
+
+        :param ctx_id: context id
+        :param timeout: Max. seconds to wait for the health check ping and for connecting a new manager
+        :return: DockerManager
+        :raises TimeoutError: if another caller is still connecting the manager after `timeout` seconds
+        """
+        with self._lock:
+            self._check_fork()
+            self._evict_idle()
+            entry = self._entries.get(ctx_id)
+            ctx_lock = self._ctx_locks.setdefault(ctx_id, threading.Lock())
+
+        if entry is not None and self._is_healthy(entry, timeout):
+            entry.last_used = time.monotonic()
+            return entry.manager
+
+        # Serialize client creation per context, so concurrent requests
+        # do not open multiple connections to the same docker host.
+        if not ctx_lock.acquire(timeout=-1 if timeout is None else timeout):
+            raise TimeoutError(f"No docker client for context {ctx_id} within {timeout} seconds")
+        try:
+            with self._lock:
+                current = self._entries.get(ctx_id)
+            if current is not None and current is not entry:
+                current.last_used = time.monotonic()
+                return current.manager
+
+            if entry is not None:
+                self.discard(ctx_id)
+
+            entry = self._create(ctx_id, timeout)
+            with self._lock:
+                self._entries[ctx_id] = entry
+            return entry.manager
+        finally:
+            ctx_lock.release()
+
+
+    def discard(self, ctx_id: str) -> None:
+        """
+        Close and remove the pooled docker manager for the given context id.
+
+        :param ctx_id: context id
+        """
+        with self._lock:
+            entry = self._entries.pop(ctx_id, None)
+        if entry is not None:
+            self._close(entry)
+
+
+    def clear(self) -> None:
+        """
+        Close and remove all pooled docker managers.
+        """
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries = {}
+        for entry in entries:
+            self._close(entry)
+
+
+    def stats(self) -> list[dict]:
+        """
+        Get pool statistics for all pooled contexts.
+
+        :return: list of dicts
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                "ctx_id": entry.ctx_id,
+                "host": entry.docker_host,
+                "age": round(now - entry.created, 3),
+                "idle": round(now - entry.last_used, 3),
+            } for entry in self._entries.values()]
+
+
+    def _create(self, ctx_id: str, timeout=None) -> _PoolEntry:
+        docker_host = get_dockerhost_for_ctx_id(ctx_id)
+        if docker_host is None:
+            raise Exception(f"Docker host context {ctx_id} not found")
+
+        manager = DockerManager(docker_host, max_pool_size=self.max_pool_size, timeout=timeout)
+        return _PoolEntry(ctx_id, docker_host, manager)
+
+
+    def _is_healthy(self, entry: _PoolEntry, timeout=None) -> bool:
+        now = time.monotonic()
+        if now - entry.last_checked < self.health_check_interval:
+            return True
+
+        if timeout is None:
+            timeout = settings.KONTAINER_HEALTH_CHECK_TIMEOUT
+        try:
+            entry.manager.ping(timeout=timeout)
+            entry.last_checked = now
+            return True
+        except Exception as e:
+            print(f"Docker client for context {entry.ctx_id} failed health check: {e}")
+            return False
+
+
+    def _evict_idle(self) -> None:
+        # Caller must hold self._lock
+        if self.idle_timeout <= 0:
+            return
+
+        now = time.monotonic()
+        for ctx_id, entry in list(self._entries.items()):
+            if now - entry.last_used > self.idle_timeout:
+                del self._entries[ctx_id]
+                self._close(entry)
+
+
+    def _check_fork(self) -> None:
+        # Caller must hold self._lock
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+
+
+    def _reset_after_fork(self) -> None:
+        # Drop the inherited entries without closing them.
+        # The sockets still belong to the parent process.
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._ctx_locks = {}
+        self._entries = {}
+
+
+    @staticmethod
+    def _close(entry: _PoolEntry) -> None:
+        try:
+            entry.manager.close()
+        except Exception as e:
+            print(f"Error closing docker client for context {entry.ctx_id}: {e}")
+
+
+docker_client_pool = DockerClientPool()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=docker_client_pool._reset_after_fork)
+
+
+def get_docker_manager(ctx_id: str, timeout=None) -> DockerManager:
+    """
+    Get the pooled docker manager for the given context id.
+
+    :param ctx_id: context id
+    :param timeout: Max. seconds to wait for the health check ping and for connecting a new manager
+    :return: DockerManager
+    """
+    return docker_client_pool.get(ctx_id, timeout=timeout)
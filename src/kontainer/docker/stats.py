@@ -0,0 +1,421 @@
+import os
+import threading
+import time
+from array import array
+
+from kontainer import settings
+from kontainer.docker.inventory import get_docker_inventory
+from kontainer.docker.pool import get_docker_manager
+
+
+# Fields of a stats sample. Network and block IO are rates in bytes per second.
+STATS_FIELDS = ("cpu_percent", "mem_usage", "mem_limit", "net_rx", "net_tx", "blk_read", "blk_write")
+
+# Downsampled tiers: (name, step in seconds, number of samples)
+# 1s for 5 minutes, 10s for 1 hour, 1m for 24 hours.
+STATS_TIERS = (("1s", 1, 300), ("10s", 10, 360), ("1m", 60, 1440))
+
+
+class RingBuffer:
+    """
+    Fixed-size time series ring buffer backed by a flat array of doubles.
+
+    Each slot holds a timestamp and one value per field.
+    Memory use is `capacity * (len(fields) + 1) * 8` bytes and is allocated upfront.
+    """
+
+    def __init__(self, capacity: int, fields: tuple):
+        self.capacity = capacity
+        self.fields = fields
+        self._width = len(fields) + 1
+        self._data = array('d', bytes(8 * capacity * self._width))
+        self._start = 0
+        self._size = 0
+
+
+    def __len__(self):
+        return self._size
+
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.itemsize * len(self._data)
+
+
+    def append(self, ts: float, values) -> None:
+        """
+        Append a sample. Overwrites the oldest sample, if the buffer is full.
+
+        :param ts: timestamp
+        :param values: sequence of values in the order of the fields
+        """
+        idx = (self._start + self._size) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+        else:
+            self._start = (self._start + 1) % self.capacity
+
+        offset = idx * self._width
+        self._data[offset] = ts
+        self._data[offset + 1:offset + self._width] = array('d', values)
+
+
+    def last(self) -> tuple | None:
+        """
+        :return: tuple of timestamp and values of the newest sample, or None if empty
+        """
+        if self._size == 0:
+            return None
+        offset = ((self._start + self._size - 1) % self.capacity) * self._width
+        return self._data[offset], tuple(self._data[offset + 1:offset + self._width])
+
+
+    def items(self, since: float | None = None) -> list[tuple]:
+        """
+        Get the samples, oldest first.
+
+        :param since: only return samples newer than this timestamp
+        :return: list of tuples of timestamp and values
+        """
+        result = []
+        for i in range(self._size):
+            offset = ((self._start + i) % self.capacity) * self._width
+            ts = self._data[offset]
+            if since is not None and ts <= since:
+                continue
+            result.append((ts, tuple(self._data[offset + 1:offset + self._width])))
+        return result
+
+
+class _TierAggregator:
+    # Averages the samples within a tier step and appends them to the tier's ring buffer
+
+    def __init__(self, step: int, capacity: int):
+        self.step = step
+        self.buffer = RingBuffer(capacity, STATS_FIELDS)
+        self._bucket = None
+        self._sums = [0.0] * len(STATS_FIELDS)
+        self._count = 0
+
+
+    def add(self, ts: float, values: tuple) -> None:
+        bucket = int(ts // self.step) * self.step
+        if self._bucket is not None and bucket != self._bucket:
+            self.flush()
+        self._bucket = bucket
+        for i, v in enumerate(values):
+            self._sums[i] += v
+        self._count += 1
+
+
+    def flush(self) -> None:
+        if self._count > 0:
+            self.buffer.append(self._bucket, [s / self._count for s in self._sums])
+        self._sums = [0.0] * len(STATS_FIELDS)
+        self._count = 0
+
+
+class ContainerStatsSeries:
+    """
+    Stats time series of a single container in all tiers.
+    """
+
+    def __init__(self, container_id: str):
+        self.container_id = container_id
+        self.updated_at = None
+        self._lock = threading.Lock()
+        self._tiers = {name: _TierAggregator(step, capacity) for name, step, capacity in STATS_TIERS}
+        self._prev = None
+
+
+    @property
+    def nbytes(self) -> int:
+        return sum(t.buffer.nbytes for t in self._tiers.values())
+
+
+    def add_sample(self, ts: float, stats: dict) -> None:
+        """
+        Add a raw docker stats sample.
+
+        :param ts: timestamp
+        :param stats: decoded docker stats
+        """
+        counters = _parse_counters(stats)
+        with self._lock:
+            prev_ts, prev = self._prev if self._prev is not None else (None, None)
+            self._prev = (ts, counters)
+            if prev is None or ts <= prev_ts:
+                rates = (0.0, 0.0, 0.0, 0.0)
+            else:
+                elapsed = ts - prev_ts
+                rates = tuple(max(counters[k] - prev[k], 0) / elapsed
+                              for k in ("net_rx", "net_tx", "blk_read", "blk_write"))
+
+            values = (_cpu_percent(stats), counters["mem_usage"], counters["mem_limit"]) + rates
+            for tier in self._tiers.values():
+                tier.add(ts, values)
+            self.updated_at = ts
+
+
+    def get(self, tier="1s", since=None) -> list[tuple]:
+        """
+        Get the samples of a tier. The current (incomplete) step is not included.
+
+        :param tier: tier name, e.g. '10s'
+        :param since: only return samples newer than this timestamp
+        :return: list of tuples of timestamp and values
+        """
+        if tier not in self._tiers:
+            raise ValueError(f"tier must be one of {', '.join(t[0] for t in STATS_TIERS)}")
+        with self._lock:
+            return self._tiers[tier].buffer.items(since)
+
+
+def _cpu_percent(stats: dict) -> float:
+    cpu = stats.get('cpu_stats') or {}
+    precpu = stats.get('precpu_stats') or {}
+    cpu_delta = (cpu.get('cpu_usage') or {}).get('total_usage', 0) \
+        - (precpu.get('cpu_usage') or {}).get('total_usage', 0)
+    system_delta = cpu.get('system_cpu_usage', 0) - precpu.get('system_cpu_usage', 0)
+    online_cpus = cpu.get('online_cpus') or len((cpu.get('cpu_usage') or {}).get('percpu_usage') or []) or 1
+    if cpu_delta <= 0 or system_delta <= 0:
+        return 0.0
+    return cpu_delta / system_delta * online_cpus * 100.0
+
+
+def _parse_counters(stats: dict) -> dict:
+    memory = stats.get('memory_stats') or {}
+    memory_details = memory.get('stats') or {}
+    # Like the docker cli, exclude the page cache from the memory usage
+    cache = memory_details.get('inactive_file', memory_details.get('total_inactive_file', 0))
+    mem_usage = max(memory.get('usage', 0) - cache, 0)
+
+    networks = (stats.get('networks') or {}).values()
+    blkio = (stats.get('blkio_stats') or {}).get('io_service_bytes_recursive') or []
+    return {
+        "mem_usage": mem_usage,
+        "mem_limit": memory.get('limit', 0),
+        "net_rx": sum(n.get('rx_bytes', 0) for n in networks),
+        "net_tx": sum(n.get('tx_bytes', 0) for n in networks),
+        "blk_read": sum(b.get('value', 0) for b in blkio if (b.get('op') or "").lower() == "read"),
+        "blk_write": sum(b.get('value', 0) for b in blkio if (b.get('op') or "").lower() == "write"),
+    }
+
+
+def aggregate_series(samples: list[list[tuple]]) -> list[tuple]:
+    """
+    Sum the samples of multiple containers with the same timestamp.
+
+    :param samples: list of sample lists (one per container)
+    :return: list of tuples of timestamp and summed values, oldest first
+    """
+    totals = dict()
+    for container_samples in samples:
+        for ts, values in container_samples:
+            if ts in totals:
+                totals[ts] = tuple(a + b for a, b in zip(totals[ts], values))
+            else:
+                totals[ts] = values
+    return sorted(totals.items())
+
+
+def serialize_series(samples: list[tuple], tier: str) -> dict:
+    """
+    Serialize samples to columns, e.g. {'tier': '1s', 'timestamps': [...], 'cpu_percent': [...], ...}
+
+    :param samples: list of tuples of timestamp and values
+    :param tier: tier name
+    :return: dict
+    """
+    result = {"tier": tier, "fields": list(STATS_FIELDS), "timestamps": [ts for ts, _ in samples]}
+    for i, field in enumerate(STATS_FIELDS):
+        result[field] = [round(values[i], 3) for _, values in samples]
+    return result
+
+
+class StatsCollector:
+    """
+    Background stats collector for a docker context.
+
+    Keeps one streaming stats subscription per running container and stores the samples
+    in fixed-size ring buffers per tier (see STATS_TIERS), so the memory per container
+    is known in advance (see ContainerStatsSeries.nbytes).
+
+    The set of running containers is reconciled every `resync_interval` seconds
+    and immediately on container start/die/destroy events, if the inventory is enabled.
+    """
+
+    def __init__(self, ctx_id: str, resync_interval=None):
+        self.ctx_id = ctx_id
+        self.resync_interval = settings.KONTAINER_STATS_RESYNC_INTERVAL \
+            if resync_interval is None else resync_interval
+
+        self._lock = threading.Lock()
+        self._series: dict[str, ContainerStatsSeries] = {}
+        self._streams: dict[str, object] = {}
+        self._threads: dict[str, threading.Thread] = {}
+        self._thread = None
+        self._stopped = threading.Event()
+        self._wakeup = threading.Event()
+
+
+    @property
+    def client(self):
+        return get_docker_manager(self.ctx_id).client
+
+
+    def ensure_started(self) -> None:
+        """
+        Start the collector thread, if not already running.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name=f"stats-{self.ctx_id}", daemon=True)
+            self._thread.start()
+
+        # React to container state changes without waiting for the next resync
+        inventory = get_docker_inventory(self.ctx_id)
+        if inventory is not None:
+            inventory.add_listener(self.on_event)
+
+
+    def stop(self) -> None:
+        """
+        Stop the collector and close all stats streams.
+        """
+        self._stopped.set()
+        self._wakeup.set()
+        with self._lock:
+            container_ids = list(self._streams.keys())
+        for container_id in container_ids:
+            self._close_stream(container_id)
+
+
+    def get_series(self, container_id: str) -> ContainerStatsSeries | None:
+        with self._lock:
+            return self._series.get(container_id)
+
+
+    def on_event(self, event: dict) -> None:
+        """
+        Docker event listener.
+
+        :param event: Decoded docker event
+        """
+        if event.get('Type') != "container":
+            return
+        action = event.get('Action')
+        container_id = event.get('Actor', {}).get('ID') or event.get('id')
+        if action in ("die", "kill", "stop", "pause"):
+            self._close_stream(container_id)
+        elif action == "destroy":
+            self._close_stream(container_id)
+            with self._lock:
+                self._series.pop(container_id, None)
+        elif action in ("start", "unpause", "restart"):
+            self._wakeup.set()
+
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self._reconcile()
+            except Exception as e:
+                print(f"Stats collector for context {self.ctx_id} failed to list containers: {e}")
+            self._wakeup.wait(self.resync_interval)
+            self._wakeup.clear()
+
+
+    def _reconcile(self) -> None:
+        containers = self.client.api.containers(all=True)
+        existing = set(c['Id'] for c in containers)
+        running = set(c['Id'] for c in containers if c.get('State') == "running")
+        with self._lock:
+            streaming = set(cid for cid, t in self._threads.items() if t.is_alive())
+            for container_id in running - streaming:
+                self._series.setdefault(container_id, ContainerStatsSeries(container_id))
+                thread = threading.Thread(target=self._collect, args=(container_id,),
+                                          name=f"stats-{self.ctx_id}-{container_id[:12]}", daemon=True)
+                self._threads[container_id] = thread
+                thread.start()
+
+            # Drop the series of removed containers
+            for container_id in list(self._series.keys()):
+                if container_id not in existing:
+                    del self._series[container_id]
+
+        for container_id in streaming - running:
+            self._close_stream(container_id)
+
+
+    def _collect(self, container_id: str) -> None:
+        try:
+            stream = self.client.api.stats(container_id, decode=True, stream=True)
+            with self._lock:
+                self._streams[container_id] = stream
+                series = self._series.get(container_id)
+            if series is None or self._stopped.is_set():
+                return
+
+            for stats in stream:
+                if self._stopped.is_set():
+                    break
+                series.add_sample(time.time(), stats)
+        except Exception as e:
+            if not self._stopped.is_set():
+                print(f"Stats stream for container {container_id} ended: {e}")
+        finally:
+            self._close_stream(container_id)
+            with self._lock:
+                if self._threads.get(container_id) is threading.current_thread():
+                    del self._threads[container_id]
+
+
+    def _close_stream(self, container_id: str) -> None:
+        with self._lock:
+            stream = self._streams.pop(container_id, None)
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+
+stats_collectors = {}
+stats_collectors_lock = threading.Lock()
+stats_collectors_pid = os.getpid()
+
+
+def get_stats_collector(ctx_id: str) -> StatsCollector:
+    """
+    Get the started stats collector for the given context id.
+
+    :param ctx_id: context id
+    :return: StatsCollector
+    """
+    global stats_collectors, stats_collectors_pid
+    with stats_collectors_lock:
+        # Collector threads do not survive a fork
+        if stats_collectors_pid != os.getpid():
+            stats_collectors = {}
+            stats_collectors_pid = os.getpid()
+
+        collector = stats_collectors.get(ctx_id)
+        if collector is None:
+            collector = stats_collectors[ctx_id] = StatsCollector(ctx_id)
+    collector.ensure_started()
+    return collector
+
+
+def discard_stats_collector(ctx_id: str) -> None:
+    """
+    Stop and remove the stats collector for the given context id.
+
+    :param ctx_id: context id
+    """
+    with stats_collectors_lock:
+        collector = stats_collectors.pop(ctx_id, None)
+    if collector is not None:
+        collector.stop()
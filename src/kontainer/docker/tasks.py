@@ -45,6 +45,20 @@ def container_delete_task(self, ctx_id, container_id):
     dkr.remove_container(container_id)
 
 
+@celery.task(bind=True)
+def container_bulk_task(self, ctx_id, action, container_ids):
+    print(f"Container BULK {action.upper()} {len(container_ids)} containers")
+    dkr = get_docker_manager_cached(ctx_id)
+    return dkr.bulk_container_action(action, container_ids)
+
+
+@celery.task(bind=True)
+def container_restart_all_task(self, ctx_id, **kwargs):
+    print(f"Container RESTART ALL")
+    dkr = get_docker_manager_cached(ctx_id)
+    return dkr.restart_all_containers(**kwargs)
+
+
 @celery.task(bind=True)
 def image_pull_task(self, ctx_id, container_id):
     print(f"Image PULL {container_id}")
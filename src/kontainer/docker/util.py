@@ -1,3 +1,144 @@
+def get_container_labels(attrs: dict) -> dict:
+    """
+    Get the labels of a container.
+    Works with both container summaries (list endpoint) and container inspect data.
+
+    :param attrs: container attrs
+    :return: dict of labels
+    """
+    if 'Config' in attrs:
+        return attrs.get('Config', {}).get('Labels') or {}
+    return attrs.get('Labels') or {}
+
+
+def get_container_state(attrs: dict) -> str | None:
+    """
+    Get the state of a container, e.g. 'running' or 'exited'.
+    Works with both container summaries (list endpoint) and container inspect data.
+
+    :param attrs: container attrs
+    :return: state string
+    """
+    state = attrs.get('State')
+    if isinstance(state, dict):
+        return state.get('Status')
+    return state
+
+
+def get_container_name(attrs: dict) -> str | None:
+    """
+    Get the name of a container without the leading slash.
+    Works with both container summaries (list endpoint) and container inspect data.
+
+    :param attrs: container attrs
+    :return: container name
+    """
+    name = attrs.get('Name')
+    if name is None and attrs.get('Names'):
+        name = attrs['Names'][0]
+    return name.lstrip('/') if name else None
+
+
+def get_container_volume_names(attrs: dict) -> set:
+    """
+    Get the names of the volumes mounted by a container.
+    Works with both container summaries (list endpoint) and container inspect data.
+
+    :param attrs: container attrs
+    :return: set of volume names
+    """
+    return set(m['Name'] for m in attrs.get('Mounts') or []
+               if m.get('Type') == "volume" and m.get('Name'))
+
+
+def index_volume_mounts(containers: list[dict]) -> dict[str, list[str]]:
+    """
+    Build a map of volume name to the names of the containers using the volume,
+    in a single pass over the container mounts.
+
+    :param containers: list of container attrs
+    :return: dict of volume name to list of container names
+    """
+    index = dict()
+    for attrs in containers:
+        name = get_container_name(attrs)
+        for volume_name in get_container_volume_names(attrs):
+            index.setdefault(volume_name, []).append(name)
+    return index
+
+
+def get_compose_dependencies(attrs: dict) -> set:
+    """
+    Get the compose services a container depends on,
+    from the 'com.docker.compose.depends_on' label, e.g. 'db:service_healthy:false,redis:service_started:false'
+
+    :param attrs: container attrs
+    :return: set of service names
+    """
+    return set(get_compose_dependency_conditions(attrs).keys())
+
+
+def get_compose_dependency_conditions(attrs: dict) -> dict[str, str]:
+    """
+    Get the compose services a container depends on with their condition,
+    from the 'com.docker.compose.depends_on' label, e.g. 'db:service_healthy:false,redis:service_started:false'
+
+    :param attrs: container attrs
+    :return: dict of service name to condition
+        ('service_started', 'service_healthy' or 'service_completed_successfully')
+    """
+    depends_on = get_container_labels(attrs).get('com.docker.compose.depends_on') or ""
+    conditions = dict()
+    for dependency in depends_on.split(","):
+        parts = dependency.split(":")
+        if parts[0] != "":
+            conditions[parts[0]] = parts[1] if len(parts) > 1 and parts[1] else "service_started"
+    return conditions
+
+
+def order_containers_by_dependencies(containers: list[dict]) -> list[list[dict]]:
+    """
+    Group containers into batches, so that each container comes after the containers
+    of the compose services it depends on (within the same compose project).
+    Dependencies on services without containers in the list are ignored.
+    Containers with circular dependencies are put into the last batch.
+
+    :param containers: list of container attrs
+    :return: list of batches of container attrs
+    """
+    # (project, service) -> containers
+    services = dict()
+    for attrs in containers:
+        labels = get_container_labels(attrs)
+        project = labels.get('com.docker.compose.project')
+        service = labels.get('com.docker.compose.service') if project else None
+        key = (project, service) if service else (None, attrs['Id'])
+        services.setdefault(key, []).append(attrs)
+
+    dependencies = dict()
+    for key, service_containers in services.items():
+        project = key[0]
+        deps = set()
+        if project is not None:
+            for attrs in service_containers:
+                deps |= set((project, d) for d in get_compose_dependencies(attrs))
+        dependencies[key] = set(d for d in deps if d in services and d != key)
+
+    batches = []
+    done = set()
+    remaining = set(services.keys())
+    while len(remaining) > 0:
+        ready = [key for key in remaining if dependencies[key] <= done]
+        if len(ready) == 0:
+            # Circular dependencies
+            ready = list(remaining)
+        ready.sort(key=lambda k: (k[0] or "", k[1] or ""))
+        batches.append([attrs for key in ready for attrs in services[key]])
+        done |= set(ready)
+        remaining -= set(ready)
+    return batches
+
+
 def list_projects_from_containers(containers):
     """
     List all projects from list of containers.
@@ -6,9 +147,7 @@ def list_projects_from_containers(containers):
     :return: list of project names
     """
     return list(
-        set([c.attrs
-            .get('Config', {})
-            .get('Labels', {})
+        set([get_container_labels(c.attrs)
             .get('com.docker.compose.project') for c in containers]))
 
 
@@ -20,9 +159,7 @@ def filter_containers_by_project(containers, project_name):
     :param project_name: str
     :return: list of containers
     """
-    return [c for c in containers if c.attrs
-    .get('Config', {})
-    .get('Labels', {})
+    return [c for c in containers if get_container_labels(c.attrs)
     .get('com.docker.compose.project') == project_name]
 
 
@@ -34,4 +171,35 @@ def filter_containers_by_status_text(containers, status):
     :param status: str
     :return: list of containers
     """
-    return [c for c in containers if c.attrs.get('State', {}).get('Status') == status]
+    return [c for c in containers if get_container_state(c.attrs) == status]
+
+
+def count_containers_by_state(containers: list[dict]) -> dict[str, int]:
+    """
+    Count containers by state, e.g. {'running': 3, 'exited': 1}.
+
+    :param containers: list of container attrs
+    :return: dict of state to number of containers
+    """
+    counts = {}
+    for attrs in containers:
+        state = get_container_state(attrs) or "unknown"
+        counts[state] = counts.get(state, 0) + 1
+    return counts
+
+
+def get_compose_project_states(containers: list[dict]) -> dict[str, bool]:
+    """
+    Map the compose projects of the containers to a flag,
+    which is True, if at least one container of the project is running.
+
+    :param containers: list of container attrs
+    :return: dict of project name to running flag
+    """
+    projects = {}
+    for attrs in containers:
+        project = get_container_labels(attrs).get('com.docker.compose.project')
+        if project is None:
+            continue
+        projects[project] = projects.get(project, False) or get_container_state(attrs) == "running"
+    return projects
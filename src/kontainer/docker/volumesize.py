@@ -0,0 +1,258 @@
+import os
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from kontainer import settings
+
+
+def scan_directory_size(path: str) -> int:
+    """
+    Calculate the disk usage of a directory tree in kilobytes, like `du -s`.
+
+    Uses os.scandir, so only a single stat call is needed per entry.
+    Hard-linked files are counted once. Symlinks are not followed.
+
+    :param path: directory path
+    :return: size in KB
+    :raises OSError: if the directory can not be read
+    """
+    seen_inodes = set()
+    total_blocks = os.lstat(path).st_blocks
+    stack = [path]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+
+                    if st.st_nlink > 1 and not stat.S_ISDIR(st.st_mode):
+                        inode = (st.st_dev, st.st_ino)
+                        if inode in seen_inodes:
+                            continue
+                        seen_inodes.add(inode)
+
+                    total_blocks += st.st_blocks
+                    if stat.S_ISDIR(st.st_mode):
+                        stack.append(entry.path)
+        except OSError as e:
+            if current == path:
+                raise
+            print(f"Failed to scan {current}: {e}")
+
+    # st_blocks is in 512-byte units
+    return total_blocks // 2
+
+
+def scan_volume_sizes(volumes: list[dict], max_workers=None) -> dict[str, int]:
+    """
+    Calculate the sizes of multiple volumes in parallel.
+
+    :param volumes: list of volume attrs
+    :param max_workers: number of scanner threads
+    :return: dict of volume name to size in KB (-1, if the size could not be calculated)
+    """
+    if max_workers is None:
+        max_workers = settings.KONTAINER_VOLUME_SIZE_WORKERS
+
+    def _scan(attrs):
+        try:
+            return attrs['Name'], scan_directory_size(attrs['Mountpoint'])
+        except OSError as e:
+            print(f"Failed to get_volume_size for volume {attrs['Name']}: {e}")
+            return attrs['Name'], -1
+
+    if len(volumes) == 0:
+        return dict()
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(volumes))) as executor:
+        return dict(executor.map(_scan, volumes))
+
+
+class _SizeEntry:
+
+    def __init__(self, size: int, mountpoint: str, mtime: float | None):
+        self.size = size
+        self.mountpoint = mountpoint
+        self.mtime = mtime
+        self.scanned_at = time.time()
+        self.stale = False
+
+
+class VolumeSizeScanner:
+    """
+    Cached, background volume size scanner for a docker context.
+
+    Sizes are served from the cache immediately. Missing or stale sizes are
+    recalculated by a thread pool in the background and are available with the next request.
+
+    A cached size is stale, if
+    - it is older than `ttl` seconds,
+    - the mtime of the volume's mountpoint has changed,
+    - or the volume has been unmounted from a container since the last scan (volume 'unmount' event).
+    Destroyed volumes are removed from the cache.
+    """
+
+    def __init__(self, ctx_id: str, ttl=None, max_workers=None):
+        self.ctx_id = ctx_id
+        self.ttl = settings.KONTAINER_VOLUME_SIZE_CACHE_TTL if ttl is None else ttl
+        self.max_workers = settings.KONTAINER_VOLUME_SIZE_WORKERS if max_workers is None else max_workers
+
+        self._lock = threading.Lock()
+        self._entries: dict[str, _SizeEntry] = {}
+        self._inflight = set()
+        self._executor = None
+
+
+    def get_sizes(self, volumes: list[dict], wait=False) -> dict[str, dict]:
+        """
+        Get the cached sizes of the given volumes and schedule a refresh of missing or stale sizes.
+
+        :param volumes: list of volume attrs
+        :param wait: If True, wait for the refresh to complete
+        :return: dict of volume name to dict with 'size' (KB or None, if not scanned yet) and 'scanned_at'
+        """
+        futures = []
+        with self._lock:
+            for attrs in volumes:
+                name = attrs['Name']
+                entry = self._entries.get(name)
+                if entry is not None and not self._is_stale(entry, attrs['Mountpoint']):
+                    continue
+                if name in self._inflight:
+                    continue
+                self._inflight.add(name)
+                futures.append(self._get_executor().submit(self._scan, name, attrs['Mountpoint']))
+
+        for future in futures if wait else []:
+            future.result()
+
+        result = dict()
+        with self._lock:
+            for attrs in volumes:
+                entry = self._entries.get(attrs['Name'])
+                result[attrs['Name']] = {
+                    "size": entry.size if entry is not None else None,
+                    "scanned_at": entry.scanned_at if entry is not None else None,
+                }
+        return result
+
+
+    def invalidate(self, volume_name: str) -> None:
+        with self._lock:
+            entry = self._entries.get(volume_name)
+            if entry is not None:
+                entry.stale = True
+
+
+    def on_event(self, event: dict) -> None:
+        """
+        Docker event listener.
+
+        :param event: Decoded docker event
+        """
+        if event.get('Type') != "volume":
+            return
+
+        action = event.get('Action')
+        volume_name = event.get('Actor', {}).get('ID')
+        if action == "destroy":
+            with self._lock:
+                self._entries.pop(volume_name, None)
+        elif action == "unmount":
+            self.invalidate(volume_name)
+
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Caller must hold self._lock
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix=f"volumesize-{self.ctx_id}")
+        return self._executor
+
+
+    def _is_stale(self, entry: _SizeEntry, mountpoint: str) -> bool:
+        if entry.stale or entry.mountpoint != mountpoint:
+            return True
+        if time.time() - entry.scanned_at > self.ttl:
+            return True
+        return self._get_mtime(mountpoint) != entry.mtime
+
+
+    @staticmethod
+    def _get_mtime(path: str) -> float | None:
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+
+    def _scan(self, volume_name: str, mountpoint: str) -> None:
+        try:
+            mtime = self._get_mtime(mountpoint)
+            try:
+                size = scan_directory_size(mountpoint)
+            except OSError as e:
+                print(f"Failed to get_volume_size for volume {volume_name}: {e}")
+                size = -1
+
+            with self._lock:
+                self._entries[volume_name] = _SizeEntry(size, mountpoint, mtime)
+        finally:
+            with self._lock:
+                self._inflight.discard(volume_name)
+
+
+volume_size_scanners = {}
+volume_size_scanners_lock = threading.Lock()
+volume_size_scanners_pid = os.getpid()
+
+
+def get_volume_size_scanner(ctx_id: str) -> VolumeSizeScanner:
+    """
+    Get the volume size scanner for the given context id.
+    The scanner subscribes to the docker inventory events, if the inventory cache is enabled.
+
+    :param ctx_id: context id
+    :return: VolumeSizeScanner
+    """
+    # Imported here, because the inventory depends on the docker manager, which uses this module
+    from kontainer.docker.inventory import get_docker_inventory
+
+    global volume_size_scanners, volume_size_scanners_pid
+    with volume_size_scanners_lock:
+        # Scanner threads do not survive a fork
+        if volume_size_scanners_pid != os.getpid():
+            volume_size_scanners = {}
+            volume_size_scanners_pid = os.getpid()
+
+        scanner = volume_size_scanners.get(ctx_id)
+        if scanner is None:
+            scanner = volume_size_scanners[ctx_id] = VolumeSizeScanner(ctx_id)
+            inventory = get_docker_inventory(ctx_id)
+            if inventory is not None:
+                inventory.add_listener(scanner.on_event)
+        return scanner
+
+
+def discard_volume_size_scanner(ctx_id: str) -> None:
+    """
+    Shut down and remove the volume size scanner for the given context id.
+
+    :param ctx_id: context id
+    """
+    with volume_size_scanners_lock:
+        scanner = volume_size_scanners.pop(ctx_id, None)
+    if scanner is not None:
+        scanner.shutdown()
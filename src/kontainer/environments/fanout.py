@@ -0,0 +1,119 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from kontainer import settings
+from kontainer.docker.context import get_docker_contexts, get_context_ssh_config
+from kontainer.util.remote_utils import exec_ssh_channel_command
+from kontainer.util.ssh_pool import ssh_session
+from kontainer.util.subprocess_util import CommandCancelledError
+
+
+def resolve_fanout_contexts(ctx_ids: list[str] | None) -> list[dict]:
+    """
+    Resolve the docker contexts of a fan-out.
+
+    :param ctx_ids: list of context ids. None for all contexts.
+    :return: list of docker contexts
+    :raises ValueError: if a context id is unknown
+    """
+    contexts = get_docker_contexts()
+    if ctx_ids is None:
+        return list(contexts)
+
+    by_id = {ctx["id"]: ctx for ctx in contexts}
+    unknown = [ctx_id for ctx_id in ctx_ids if ctx_id not in by_id]
+    if len(unknown) > 0:
+        raise ValueError(f"Unknown contexts: {', '.join(unknown)}")
+    return [by_id[ctx_id] for ctx_id in ctx_ids]
+
+
+def run_fanout(contexts: list[dict], command: str, max_workers=None, timeout=None, idle_timeout=None,
+               on_output=None, on_result=None, cancel_event=None) -> dict:
+    """
+    Run a shell command on many remote hosts concurrently.
+
+    Each host runs the command on a channel of its pooled SSH transport.
+    A failing or hanging host does not affect the other hosts.
+
+    :param contexts: docker contexts to run the command on
+    :param command: shell command
+    :param max_workers: max. number of hosts running the command concurrently
+    :param timeout: max. seconds per host
+    :param idle_timeout: max. seconds per host without output
+    :param on_output: Callable(ctx_id, stream, line), which receives the output lines of all hosts
+    :param on_result: Callable(result), which is called when a host has finished
+    :param cancel_event: Event, which cancels the running commands and the hosts not started yet
+    :return: dict with the aggregated results
+    """
+    if max_workers is None:
+        max_workers = settings.KONTAINER_FANOUT_MAX_WORKERS
+    if timeout is None:
+        timeout = settings.KONTAINER_FANOUT_TIMEOUT
+
+    def _run(ctx):
+        result = _run_on_context(ctx, command, timeout=timeout, idle_timeout=idle_timeout, on_output=on_output,
+                                 cancel_event=cancel_event)
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    start = time.time()
+    results = []
+    if len(contexts) > 0:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(contexts)), thread_name_prefix="fanout") as executor:
+            results = list(executor.map(_run, contexts))
+
+    return {
+        "command": command,
+        "started_at": start,
+        "elapsed": round(time.time() - start, 3),
+        "total": len(results),
+        "succeeded": len([r for r in results if r["status"] == "ok"]),
+        "failed": len([r for r in results if r["status"] != "ok"]),
+        "results": results,
+    }
+
+
+def _run_on_context(ctx: dict, command: str, timeout=None, idle_timeout=None, on_output=None,
+                    cancel_event=None) -> dict:
+    ctx_id = ctx["id"]
+    result = {"id": ctx_id, "host": ctx.get("host"), "exit_code": None, "stdout": "", "stderr": ""}
+
+    if cancel_event is not None and cancel_event.is_set():
+        result.update({"status": "cancelled", "elapsed": 0, "error": "Command was cancelled"})
+        return result
+
+    try:
+        ssh_config = get_context_ssh_config(ctx)
+    except ValueError as e:
+        result.update({"status": "error", "elapsed": 0, "error": str(e)})
+        return result
+    if ssh_config is None:
+        result.update({"status": "error", "elapsed": 0, "error": "Context is not reachable via SSH"})
+        return result
+
+    def on_line(stream, line):
+        if on_output is not None:
+            on_output(ctx_id, stream, line)
+
+    start = time.monotonic()
+    try:
+        with ssh_session(ssh_config) as session:
+            stdout, stderr, exit_code = exec_ssh_channel_command(session, command, timeout=timeout,
+                                                                 idle_timeout=idle_timeout, on_line=on_line,
+                                                                 max_output=settings.KONTAINER_FANOUT_MAX_OUTPUT,
+                                                                 cancel_event=cancel_event)
+        result.update({
+            "status": "ok" if exit_code == 0 else "failed",
+            "exit_code": exit_code,
+            "stdout": stdout.decode("utf-8", errors="replace"),
+            "stderr": stderr.decode("utf-8", errors="replace"),
+        })
+    except TimeoutError as e:
+        result.update({"status": "timeout", "error": str(e)})
+    except CommandCancelledError as e:
+        result.update({"status": "cancelled", "error": str(e)})
+    except Exception as e:
+        result.update({"status": "error", "error": str(e)})
+    result["elapsed"] = round(time.monotonic() - start, 3)
+    return result
@@ -0,0 +1,40 @@
+import collections
+import time
+
+from kontainer import settings
+from kontainer.celery import celery
+from kontainer.environments.fanout import resolve_fanout_contexts, run_fanout
+
+
+@celery.task(bind=True)
+def environments_fanout_task(self, command, ctx_ids=None, max_workers=None, timeout=None, idle_timeout=None):
+    print(f"Fan-out {command} on {ctx_ids if ctx_ids is not None else 'all contexts'}")
+    contexts = resolve_fanout_contexts(ctx_ids)
+
+    # Report the last output lines and the status of each host as task progress
+    hosts = {ctx["id"]: {"status": "running", "lines": collections.deque(maxlen=settings.KONTAINER_TASK_PROGRESS_LINES)}
+             for ctx in contexts}
+    progress = {"updated": 0.0, "done": 0}
+
+    def report(force=False):
+        now = time.monotonic()
+        if self.request.id is None or (not force and now - progress["updated"] < 1.0):
+            return
+        progress["updated"] = now
+        self.update_state(state='PROGRESS', meta={
+            'current': progress["done"],
+            'total': len(contexts),
+            'hosts': {ctx_id: {"status": host["status"], "lines": list(host["lines"])} for ctx_id, host in hosts.items()},
+        })
+
+    def on_output(ctx_id, stream, line):
+        hosts[ctx_id]["lines"].append(line.decode("utf-8", errors="replace"))
+        report()
+
+    def on_result(result):
+        hosts[result["id"]]["status"] = result["status"]
+        progress["done"] += 1
+        report(force=True)
+
+    return run_fanout(contexts, command, max_workers=max_workers, timeout=timeout, idle_timeout=idle_timeout,
+                      on_output=on_output, on_result=on_result)
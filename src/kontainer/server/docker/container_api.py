@@ -4,7 +4,15 @@ from flask_jwt_extended.view_decorators import jwt_required
 
 from kontainer import settings
 from kontainer.docker.tasks import container_start_task, container_pause_task, container_stop_task, \
-    container_delete_task, container_restart_task
+    container_delete_task, container_restart_task, container_bulk_task, container_restart_all_task
+from kontainer.docker.filters import CONTAINER_FILTERS, match_container
+from kontainer.docker.inventory import get_docker_inventory
+from kontainer.docker.logs import LogStreamReader
+from kontainer.docker.manager import CONTAINER_ACTIONS
+from kontainer.docker.stats import STATS_TIERS, get_stats_collector, serialize_series
+from kontainer.error import ContainerNotFoundError
+from kontainer.server.listing import ListQuery, paginate_query, list_response
+from kontainer.server.streaming import LogStreamQuery, log_stream_response
 from kontainer.server.middleware import docker_service_middleware
 
 container_api_bp = flask.Blueprint('container_api', __name__, url_prefix='/api/docker/containers')
@@ -13,15 +21,92 @@ docker_service_middleware(container_api_bp)
 @container_api_bp.route('', methods=["GET"])
 @jwt_required()
 def list_containers():
+    """
+    List all containers
+
+    Returns the container summaries from the docker list endpoint by default.
+
+    Optional query parameters:
+    - inspect: true/false (default: false) True to return the full inspect data of each container
+    - label, status, name, ancestor, id: Docker container filters
+    - fields, limit, cursor: Field projection and pagination. See ListQuery.
+
+    :return:
+    """
+    inspect = request.args.get('inspect', 'false') == 'true'
     try:
-        containers = g.dkr.list_containers()
+        query = ListQuery(request.args, CONTAINER_FILTERS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        inventory = get_docker_inventory(g.dkr_ctx_id)
+        if inventory is not None:
+            containers = [c for c in inventory.list_containers() if match_container(c, query.filters)]
+            total = len(containers)
+            # Only inspect the containers of the requested page
+            containers, next_cursor = paginate_query(containers, query, 'Id')
+            if inspect:
+                containers = [inventory.get_container(c['Id']) for c in containers]
+                containers = [c for c in containers if c is not None]
+            return list_response(containers, query, next_cursor, total)
+
+        containers = g.dkr.list_containers(sparse=not inspect, filters=query.filters)
         #mapped = list(map(lambda x: x.attrs, containers))
 
         mapped = list()
         for container in containers:
             mapped.append(container.attrs)
 
-        return jsonify(mapped)
+        page, next_cursor = paginate_query(mapped, query, 'Id')
+        return list_response(page, query, next_cursor, len(mapped))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@container_api_bp.route('/bulk', methods=["POST"])
+@jwt_required()
+def bulk_container_action():
+    """
+    Run a container action on multiple containers concurrently.
+
+    Request body:
+    - action: start, stop, restart, pause or remove
+    - ids: list of container ids or names
+    - label: label selector(s), e.g. 'com.docker.compose.project=foo'. Alternative to ids.
+
+    Optional query parameters:
+    - async: 1 to run the action in a background task
+
+    :return: list of per-container results or the task id
+    """
+    request_json = request.json or {}
+    action = request_json.get("action")
+    if action not in CONTAINER_ACTIONS:
+        return jsonify({"error": f"action must be one of {', '.join(CONTAINER_ACTIONS)}"}), 400
+    if action == "remove" and not settings.KONTAINER_ENABLE_DELETE:
+        return jsonify({"error": "Delete is disabled"}), 403
+
+    ids = request_json.get("ids")
+    label = request_json.get("label")
+    if ids is None and label is None:
+        return jsonify({"error": "ids or label is required"}), 400
+    if ids is not None and not isinstance(ids, list):
+        return jsonify({"error": "ids must be a list"}), 400
+
+    try:
+        if ids is None:
+            labels = label if isinstance(label, list) else [label]
+            containers = g.dkr.list_containers(sparse=True, filters={"label": labels})
+            ids = [c.id for c in containers]
+
+        if request.args.get('async', None) == "1":
+            ctx_id = g.dkr_ctx_id
+            task = container_bulk_task.apply_async(args=[ctx_id, action, ids])
+            return jsonify({"task_id": task.id, "ref": "/docker/containers"})
+
+        results = g.dkr.bulk_container_action(action, ids)
+        return jsonify(results)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -30,6 +115,12 @@ def list_containers():
 @jwt_required()
 def describe_container(key):
     try:
+        inventory = get_docker_inventory(g.dkr_ctx_id)
+        if inventory is not None:
+            attrs = inventory.get_container(key)
+            if attrs is not None:
+                return jsonify(attrs)
+
         return jsonify(g.dkr.get_container(key).attrs)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -132,6 +223,75 @@ def get_container_logs(key):
         return jsonify({"error": str(e)}), 500
 
 
+@container_api_bp.route('/<string:key>/logs/stream', methods=["GET"])
+@jwt_required()
+def stream_container_logs(key):
+    """
+    Stream container logs as plain text or server-sent events.
+
+    Optional query parameters: follow, tail, since, until, timestamps, format, keepalive. See LogStreamQuery.
+
+    :param key: Container id or name
+    :return:
+    """
+    try:
+        query = LogStreamQuery(request.args, request.headers.get('Accept'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        stream = g.dkr.stream_container_logs(key, **query.to_kwargs())
+    except ContainerNotFoundError:
+        return jsonify({"error": f"Container {key} not found"}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    return log_stream_response(LogStreamReader(stream), query.format, text_keepalive=query.keepalive)
+
+
+@container_api_bp.route('/<string:key>/stats', methods=["GET"])
+@jwt_required()
+def get_container_stats(key):
+    """
+    Get the CPU, memory, network and block IO stats time series of a container.
+    The stats are collected in the background and served from memory.
+
+    Optional query parameters:
+    - tier: 1s, 10s or 1m (default: 1s)
+    - since: unix timestamp. Only return samples newer than this timestamp.
+
+    :param key: Container id or name
+    :return: dict of columns, e.g. {'timestamps': [...], 'cpu_percent': [...], ...}
+    """
+    tier = request.args.get('tier', '1s')
+    if tier not in [t[0] for t in STATS_TIERS]:
+        return jsonify({"error": f"tier must be one of {', '.join(t[0] for t in STATS_TIERS)}"}), 400
+
+    since = request.args.get('since', None)
+    try:
+        since = float(since) if since else None
+    except ValueError:
+        return jsonify({"error": "since must be a unix timestamp"}), 400
+
+    try:
+        inventory = get_docker_inventory(g.dkr_ctx_id)
+        container_id = inventory.find_container_id(key) if inventory is not None else None
+        if container_id is None:
+            container_id = g.dkr.get_container(key).id
+
+        series = get_stats_collector(g.dkr_ctx_id).get_series(container_id)
+        samples = series.get(tier, since) if series is not None else []
+        result = serialize_series(samples, tier)
+        result['id'] = container_id
+        return jsonify(result)
+    except ContainerNotFoundError:
+        return jsonify({"error": f"Container {key} not found"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @container_api_bp.route('/<string:key>/exec', methods=["POST"])
 @jwt_required()
 def exec_container_command(key):
@@ -173,8 +333,44 @@ def run_container():
         return jsonify({"error": str(e)}), 500
 
 
+@container_api_bp.route('/restart', methods=["POST"])
+@jwt_required()
+def restart_all_containers():
+    """
+    Restart all running containers concurrently.
+
+    Optional request body:
+    - parallelism: Max. number of concurrent restarts
+    - ordered: true/false (default: false) Restart in batches ordered by compose depends_on
+    - wait_healthy: true/false (default: false) Wait for each batch to become healthy
+    - timeout: Seconds to wait for each container to stop before killing it
+    - health_timeout: Max. seconds to wait for a batch to become healthy
+
+    Optional query parameters:
+    - async: 1 to restart in a background task
+
+    :return: list of per-container results or the task id
+    """
+    request_json = request.get_json(silent=True) or {}
+    kwargs = dict()
+    try:
+        for key in ("parallelism", "timeout", "health_timeout"):
+            if request_json.get(key) is not None:
+                kwargs[key] = int(request_json[key])
+    except (TypeError, ValueError):
+        return jsonify({"error": "parallelism, timeout and health_timeout must be integers"}), 400
+    if kwargs.get("parallelism", 1) < 1:
+        return jsonify({"error": "parallelism must be greater than 0"}), 400
+    kwargs["ordered"] = request_json.get("ordered", False) is True
+    kwargs["wait_healthy"] = request_json.get("wait_healthy", False) is True
+
+    try:
+        if request.args.get('async', None) == "1":
+            ctx_id = g.dkr_ctx_id
+            task = container_restart_all_task.apply_async(args=[ctx_id], kwargs=kwargs)
+            return jsonify({"task_id": task.id, "ref": "/docker/containers"})
 
-# @container_api_bp.route('/containers/restart', methods=["POST"])
-# def restart_all_containers():
-#     return jsonify(g.dkr.restart_all_containers())
+        return jsonify(g.dkr.restart_all_containers(**kwargs))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
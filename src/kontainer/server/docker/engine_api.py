@@ -1,12 +1,16 @@
 import json
-import threading
 import time
 
 from docker.types import CancellableStream
 from flask import jsonify, request, Blueprint, g
 from flask_jwt_extended.view_decorators import jwt_required
 
+from kontainer import settings
+from kontainer.docker.events import get_docker_events_buffer, match_event
+from kontainer.docker.pool import get_docker_manager
 from kontainer.server.middleware import docker_service_middleware
+from kontainer.server.streaming import sse_event, sse_response
+from kontainer.util.cache_util import StaleWhileRevalidateCache
 
 engine_api_bp = Blueprint('engine_api', __name__, url_prefix='/api/docker/engine')
 docker_service_middleware(engine_api_bp)
@@ -49,16 +53,46 @@ def engine_ping():
     return jsonify(ping)
 
 
+def _load_df(ctx_id):
+    return get_docker_manager(ctx_id).client.df()
+
+
+# 'docker system df' can take a long time on hosts with many images and a large build cache
+df_cache = StaleWhileRevalidateCache(_load_df, ttl=settings.KONTAINER_DF_CACHE_TTL, name="df")
+
+
 @engine_api_bp.route('/df', methods=["GET"])
 @jwt_required()
 def engine_df():
     """
     Get Resource Usage Summary
 
+    Served from a per-context cache. A stale summary is returned immediately
+    and refreshed in the background. Concurrent requests share a single df call.
+
+    Optional query parameters:
+    - refresh: true/false (default: false) True to wait for a fresh summary
+
     :return: dict
     """
-    df = g.dkr.client.df()
-    return jsonify(df)
+    refresh = request.args.get('refresh', 'false') == 'true'
+    try:
+        df, loaded_at = df_cache.get(g.dkr_ctx_id, refresh=refresh)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    response = jsonify(df)
+    response.headers['X-Cache-Age'] = str(int(time.time() - loaded_at))
+    return response
+
+
+def _event_filters(args) -> dict:
+    filters = dict()
+    for key in ("type", "container"):
+        values = [v for v in args.getlist(key) if v != ""]
+        if len(values) > 0:
+            filters[key] = values
+    return filters
 
 
 @engine_api_bp.route('/events', methods=["GET"])
@@ -68,43 +102,126 @@ def engine_events():
     Get Engine Events.
     https://docker-py.readthedocs.io/en/stable/events.html
 
+    Served from the shared events buffer, if it holds all events of the requested period.
+    Otherwise, the events are read from the docker daemon.
+
     :return: dict
     """
     p_since = request.args.get("since", None)
     p_until = request.args.get("until", None)
     p_container = request.args.get("container", None)
 
-    since = int(p_since) if p_since else None
-    until = int(p_until) if p_until else None
+    try:
+        since = int(p_since) if p_since else None
+        until = int(p_until) if p_until else None
+    except ValueError:
+        return jsonify({"error": "since and until must be unix timestamps"}), 400
     container = str(p_container) if p_container else None
 
     filters = {}
     if container:
         filters = {"container": container}
-    if since is None or since == "":
-        since = int(time.time()) - 3600
-    if until is None or until == "":
-        until = int(time.time())
-
-    # now = int(time.time())
-    # print("now:   ", now)
-    # print("since: ", since, now - since)
-    # print("until: ", until, now - until)
-
-    events = list()
-
-    def read_events():
-        events_stream: CancellableStream = g.dkr.client.events(decode=True,
-                                                             since=since,
-                                                             until=until,
-                                                             filters=filters)
-        for ev in events_stream:
-            events.append(ev)
-
-    # read the (auto-decoded) event steam in a separate thread
-    # wait for the thread to finish, max 10 sec
-    t = threading.Thread(target=read_events)
-    t.start()
-    t.join(timeout=10)
-
+    now = int(time.time())
+    if since is None:
+        since = now - 3600
+    if until is None or until > now:
+        # Events after 'now' would keep the stream open
+        until = now
+
+    events_buffer = get_docker_events_buffer(g.dkr_ctx_id)
+    # Subscribe on first use, so later requests are served from the buffer
+    events_buffer.ensure_started()
+    if events_buffer.covers(since):
+        buffered, _ = events_buffer.read_since(since)
+        event_filters = {"container": [container]} if container else {}
+        events = [ev for ev in buffered if ev.get('time', 0) <= until and match_event(ev, event_filters)]
+        return jsonify(events)
+
+    # The daemon closes the stream after sending the events until 'until'
+    events_stream: CancellableStream = g.dkr.client.events(decode=True,
+                                                         since=since,
+                                                         until=until,
+                                                         filters=filters)
+    try:
+        events = list(events_stream)
+    finally:
+        events_stream.close()
     return jsonify(events)
+
+
+@engine_api_bp.route('/events/stream', methods=["GET"])
+@jwt_required()
+def engine_events_stream():
+    """
+    Stream Engine Events as server-sent events.
+
+    All clients of a docker context share a single upstream events subscription.
+    Each event has an id, which can be used as cursor to resume the stream.
+    A 'gap' event is sent, if events were lost since the cursor.
+    An 'end' event is sent, if the events buffer has been closed, e.g. because the context was removed.
+
+    Optional query parameters:
+    - cursor: resume after this event id. The 'Last-Event-ID' header is used, if set.
+    - type: event type filter, e.g. 'container'
+    - container: container id or name filter
+
+    :return: event stream
+    """
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('cursor', None)
+    filters = _event_filters(request.args)
+    events_buffer = get_docker_events_buffer(g.dkr_ctx_id)
+    keepalive_interval = settings.KONTAINER_LOGS_KEEPALIVE_INTERVAL
+
+    def generate():
+        next_cursor = cursor
+        while True:
+            events, next_cursor, gap = events_buffer.read(next_cursor, timeout=keepalive_interval)
+            if gap:
+                yield sse_event("", event="gap")
+
+            matched = [ev for ev in events if match_event(ev, filters)]
+            # The cursor of the batch is sent with its last event
+            for i, ev in enumerate(matched):
+                event_id = next_cursor if i == len(matched) - 1 else None
+                yield sse_event(json.dumps(ev), event_id=event_id)
+
+            if events_buffer.closed:
+                yield sse_event("", event="end")
+                return
+            if len(matched) == 0:
+                # Keep-alive also detects disconnected clients
+                yield b": keep-alive\n\n"
+
+    return sse_response(generate())
+
+
+@engine_api_bp.route('/events/poll', methods=["GET"])
+@jwt_required()
+def engine_events_poll():
+    """
+    Long-poll Engine Events.
+
+    Waits until there are new events after the cursor or the timeout has expired.
+    All clients of a docker context share a single upstream events subscription.
+
+    Optional query parameters:
+    - cursor: the cursor of the previous response. Without cursor, only new events are returned.
+    - timeout: max. seconds to wait (default: 25, max: 60)
+    - limit: max. number of events
+    - type: event type filter, e.g. 'container'
+    - container: container id or name filter
+
+    :return: dict with 'events', 'cursor', 'gap' (True, if events were lost since the cursor)
+        and 'closed' (True, if no more events will be received, e.g. because the context was removed)
+    """
+    try:
+        timeout = min(float(request.args.get('timeout', 25)), 60)
+        limit = int(request.args['limit']) if request.args.get('limit') else None
+    except ValueError:
+        return jsonify({"error": "timeout and limit must be numbers"}), 400
+
+    filters = _event_filters(request.args)
+    events_buffer = get_docker_events_buffer(g.dkr_ctx_id)
+    events, cursor, gap = events_buffer.read(request.args.get('cursor', None), timeout=timeout, limit=limit)
+    events = [ev for ev in events if match_event(ev, filters)]
+    return jsonify({"events": events, "cursor": cursor, "gap": gap, "closed": events_buffer.closed})
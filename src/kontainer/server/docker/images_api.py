@@ -1,6 +1,9 @@
-from flask import jsonify, Blueprint, g
+from flask import jsonify, request, Blueprint, g
 from flask_jwt_extended.view_decorators import jwt_required
 
+from kontainer.docker.filters import IMAGE_FILTERS, match_image
+from kontainer.docker.inventory import get_docker_inventory
+from kontainer.server.listing import ListQuery, paginate_query, list_response
 from kontainer.server.middleware import docker_service_middleware
 
 images_api_bp = Blueprint('images_api', __name__, url_prefix='/api/docker/images')
@@ -9,6 +12,26 @@ docker_service_middleware(images_api_bp)
 @images_api_bp.route('', methods=["GET"])
 @jwt_required()
 def list_images():
-    images = g.dkr.list_images()
-    mapped = list(map(lambda x: x.attrs, images))
-    return jsonify(mapped)
+    """
+    List all images
+
+    Optional query parameters:
+    - label, dangling, reference: Docker image filters
+    - fields, limit, cursor: Field projection and pagination. See ListQuery.
+
+    :return:
+    """
+    try:
+        query = ListQuery(request.args, IMAGE_FILTERS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    inventory = get_docker_inventory(g.dkr_ctx_id)
+    if inventory is not None:
+        mapped = [x for x in inventory.list_images() if match_image(x, query.filters)]
+    else:
+        images = g.dkr.list_images(filters=query.filters)
+        mapped = list(map(lambda x: x.attrs, images))
+
+    page, next_cursor = paginate_query(mapped, query, 'Id')
+    return list_response(page, query, next_cursor, len(mapped))
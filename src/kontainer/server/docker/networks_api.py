@@ -1,6 +1,9 @@
-from flask import jsonify, Blueprint, g
+from flask import jsonify, request, Blueprint, g
 from flask_jwt_extended.view_decorators import jwt_required
 
+from kontainer.docker.filters import NETWORK_FILTERS, match_network
+from kontainer.docker.inventory import get_docker_inventory
+from kontainer.server.listing import ListQuery, paginate_query, list_response
 from kontainer.server.middleware import docker_service_middleware
 
 networks_api_bp = Blueprint('networks_api', __name__, url_prefix='/api/docker/networks')
@@ -9,6 +12,26 @@ docker_service_middleware(networks_api_bp)
 @networks_api_bp.route('', methods=["GET"])
 @jwt_required()
 def list_networks():
-    networks = g.dkr.list_networks()
-    mapped = list(map(lambda x: x.attrs, networks))
-    return jsonify(mapped)
+    """
+    List all networks
+
+    Optional query parameters:
+    - label, name, driver, id: Docker network filters
+    - fields, limit, cursor: Field projection and pagination. See ListQuery.
+
+    :return:
+    """
+    try:
+        query = ListQuery(request.args, NETWORK_FILTERS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    inventory = get_docker_inventory(g.dkr_ctx_id)
+    if inventory is not None:
+        mapped = [x for x in inventory.list_networks() if match_network(x, query.filters)]
+    else:
+        networks = g.dkr.list_networks(filters=query.filters)
+        mapped = list(map(lambda x: x.attrs, networks))
+
+    page, next_cursor = paginate_query(mapped, query, 'Id')
+    return list_response(page, query, next_cursor, len(mapped))
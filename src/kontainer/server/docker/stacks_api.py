@@ -2,11 +2,13 @@ import flask
 from flask import jsonify, request, g
 from flask_jwt_extended.view_decorators import jwt_required
 
-from kontainer.docker.util import list_projects_from_containers, filter_containers_by_project, \
-    filter_containers_by_status_text
+from kontainer.docker.inventory import get_docker_inventory
+from kontainer.docker.logs import MergedLogReader, get_log_source_names
+from kontainer.docker.stats import STATS_TIERS, get_stats_collector, aggregate_series, serialize_series
 from kontainer.server.middleware import docker_service_middleware
-from kontainer.stacks.dockerstacks import UnmanagedDockerComposeStack
+from kontainer.server.streaming import LogStreamQuery, log_stream_response
 from kontainer.stacks.stacksmanager import get_stacks_manager
+from kontainer.stacks.status import build_stack_list
 from kontainer.stacks.tasks import stack_start_task, stack_stop_task, stack_destroy_task, stack_restart_task, \
     create_stack_task, \
     stack_delete_task, stack_sync_task
@@ -18,42 +20,31 @@ docker_service_middleware(stacks_api_bp)
 @stacks_api_bp.route('', methods=["GET"])
 @jwt_required()
 def list_stacks():
-    # time_start = time.time()
+    """
+    List the managed stacks and the compose projects found on the docker host.
+
+    The containers are listed once and grouped by compose project,
+    so the number of docker requests does not depend on the number of stacks.
+
+    Optional query parameters:
+    - inspect: true/false (default: false) True to return the full inspect data of each container
+
+    :return: list of stacks with their containers, status and container counts
+    """
     ctx_id = g.dkr_ctx_id
+    inspect = request.args.get('inspect', 'false') == 'true'
     stacks_manager = get_stacks_manager(ctx_id=ctx_id)
     stacks_manager.enumerate()
-    stacks = list(stacks_manager.list_all())
-    managed_names = [s.name for s in stacks]
-    # print(f"Enumerated stacks in {time.time() - time_start} seconds")
-
-    # get all running containers
-    # time_start = time.time()
-    containers = g.dkr.list_containers()
-    # print(f"Listed containers (1) in {time.time() - time_start} seconds")
-    active_stack_names = list_projects_from_containers(containers)
-    # print(f"Listed containers (2) in {time.time() - time_start} seconds")
-
-    # time_start = time.time()
-    for active_stack_name in active_stack_names:
-        if active_stack_name is None:
-            continue
-        if active_stack_name not in managed_names:
-            #stack = DockerComposeStack(active_stack_name, ctx_id=ctx_id, managed=False)
-            stack = UnmanagedDockerComposeStack(active_stack_name, ctx_id=ctx_id)
-            stacks.append(stack)
-
-    def _map_managed_stack(_stack):
-        stack_data = _stack.serialize()
-        stack_containers = filter_containers_by_project(containers, _stack.name)
-        stack_data['containers'] = list(map(lambda c: c.attrs, stack_containers))
-        stack_data['status'] = 'idle' if _stack.name in active_stack_names else 'created'
-        if len(filter_containers_by_status_text(stack_containers, "running")) > 0:
-            stack_data['status'] = 'running'
-        return stack_data
-
-    mapped = list(map(lambda x: _map_managed_stack(x), stacks))
-    # print(f"Mapped stacks in {time.time() - time_start} seconds")
-    return jsonify(mapped)
+
+    inventory = get_docker_inventory(ctx_id)
+    if inventory is not None:
+        containers = inventory.list_containers(inspect=inspect)
+    elif inspect:
+        containers = [c.attrs for c in g.dkr.list_containers()]
+    else:
+        containers = g.dkr.client.api.containers(all=True)
+
+    return jsonify(build_stack_list(ctx_id, stacks_manager.list_all(), containers))
 
 
 @stacks_api_bp.route('/<string:name>', methods=["GET"])
@@ -70,16 +61,45 @@ def describe_stack(name):
 @stacks_api_bp.route('/<string:name>/start', methods=["POST"])
 @jwt_required()
 def start_stack(name):
+    """
+    Start a stack. Only the changed services are recreated.
+
+    Optional query parameters:
+    - force: true to rebuild the images and recreate all containers
+    - sync: 1 to wait for the result
+    """
     ctx_id = g.dkr_ctx_id
+    force = request.args.get('force', 'false') == 'true'
     if request.args.get('sync', None) == "1":
-        result = stack_start_task(ctx_id, name)
+        result = stack_start_task(ctx_id, name, force=force)
     else:
         ctx_id = g.dkr_ctx_id
-        task = stack_start_task.apply_async(args=[ctx_id, name])
+        task = stack_start_task.apply_async(args=[ctx_id, name], kwargs={"force": force})
         result = {"task_id": task.id, "ref": f"/docker/{name}", "ctx_id": ctx_id}
     return jsonify(result)
 
 
+@stacks_api_bp.route('/<string:name>/plan', methods=["GET"])
+@jwt_required()
+def plan_stack(name):
+    """
+    Show what starting the stack would do: which services would be created,
+    recreated, started or left untouched, and which images would be rebuilt.
+
+    :return: dict
+    """
+    stack = get_stacks_manager(ctx_id=g.dkr_ctx_id).get(name)
+    if stack is None:
+        return jsonify({"error": f"Stack {name} not found"}), 404
+
+    try:
+        return jsonify(stack.plan())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @stacks_api_bp.route('/<string:name>/stop', methods=["POST"])
 @jwt_required()
 def stop_stack(name):
@@ -144,6 +164,86 @@ def restart_stack(name):
     return jsonify(result)
 
 
+@stacks_api_bp.route('/<string:name>/logs', methods=["GET"])
+@jwt_required()
+def stream_stack_logs(name):
+    """
+    Stream the merged, time-ordered logs of all containers of a stack
+    as plain text or server-sent events.
+    Each line is prefixed with the service name.
+
+    Optional query parameters: follow, tail, since, until, timestamps, format, keepalive. See LogStreamQuery.
+    The tail is applied per container.
+
+    :param name: Stack name
+    :return:
+    """
+    try:
+        query = LogStreamQuery(request.args, request.headers.get('Accept'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        containers = g.dkr.list_stack_containers(name)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    if len(containers) == 0:
+        return jsonify({"error": f"Stack {name} has no containers"}), 404
+
+    dkr = g.dkr
+    kwargs = query.to_kwargs()
+    # The merge is ordered by timestamp
+    kwargs['timestamps'] = True
+
+    def _opener(container_id):
+        return lambda: dkr.stream_container_logs(container_id, **kwargs)
+
+    # The streams are opened concurrently by the reader threads
+    names = get_log_source_names([c.attrs for c in containers])
+    sources = {names[c.id]: _opener(c.id) for c in containers}
+    reader = MergedLogReader(sources, timestamps=query.timestamps, follow=query.follow)
+    return log_stream_response(reader, query.format, text_keepalive=query.keepalive)
+
+
+@stacks_api_bp.route('/<string:name>/stats', methods=["GET"])
+@jwt_required()
+def get_stack_stats(name):
+    """
+    Get the aggregated stats time series of all containers of a stack.
+    The values of all containers are summed per timestamp.
+
+    Optional query parameters:
+    - tier: 1s, 10s or 1m (default: 1s)
+    - since: unix timestamp. Only return samples newer than this timestamp.
+
+    :param name: Stack name
+    :return: dict of columns, e.g. {'timestamps': [...], 'cpu_percent': [...], ...}
+    """
+    tier = request.args.get('tier', '1s')
+    if tier not in [t[0] for t in STATS_TIERS]:
+        return jsonify({"error": f"tier must be one of {', '.join(t[0] for t in STATS_TIERS)}"}), 400
+    since = request.args.get('since', None)
+    try:
+        since = float(since) if since else None
+    except ValueError:
+        return jsonify({"error": "since must be a unix timestamp"}), 400
+
+    try:
+        containers = g.dkr.list_stack_containers(name)
+        collector = get_stats_collector(g.dkr_ctx_id)
+        samples = []
+        for container in containers:
+            series = collector.get_series(container.id)
+            if series is not None:
+                samples.append(series.get(tier, since))
+
+        result = serialize_series(aggregate_series(samples), tier)
+        result['containers'] = [c.id for c in containers]
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @stacks_api_bp.route('/create', methods=["POST"])
 @jwt_required()
 def create_stack():
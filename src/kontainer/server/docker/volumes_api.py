@@ -2,6 +2,10 @@ import flask
 from flask import jsonify, g
 from flask_jwt_extended.view_decorators import jwt_required
 
+from kontainer.docker.filters import VOLUME_FILTERS, match_volume
+from kontainer.docker.inventory import get_docker_inventory
+from kontainer.docker.volumesize import get_volume_size_scanner
+from kontainer.server.listing import ListQuery, paginate_query, list_response
 from kontainer.server.middleware import docker_service_middleware
 
 volumes_api_bp = flask.Blueprint('volumes_api', __name__, url_prefix='/api/docker/volumes')
@@ -14,15 +18,41 @@ def list_volumes():
     List all volumes
 
     Optional query parameters:
-    - size: true/false (default: false) True to include size information
+    - size: true/false (default: false) True to include the cached size in KB.
+      The size is null, if the volume has not been scanned yet.
+    - wait: true/false (default: false) True to wait for missing or stale sizes to be recalculated
     - in_use: true/false (default: false) True to include in-use information
+    - label, name, dangling: Docker volume filters
+    - fields, limit, cursor: Field projection and pagination. See ListQuery.
 
     :return:
     """
     query = flask.request.args
     check_size = query.get('size', 'false') == 'true'
     check_in_use = query.get('in_use', 'false') == 'true'
+    wait_for_size = query.get('wait', 'false') == 'true'
+    try:
+        list_query = ListQuery(query, VOLUME_FILTERS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    volumes = g.dkr.list_volumes(check_in_use=check_in_use, check_size=check_size)
-    mapped = list(map(lambda x: x.attrs, volumes))
-    return jsonify(mapped)
+    inventory = get_docker_inventory(g.dkr_ctx_id)
+    if inventory is not None:
+        volume_usage = inventory.get_volume_usage()
+        mapped = [v for v in inventory.list_volumes()
+                  if match_volume(v, list_query.filters, set(volume_usage.keys()))]
+        if check_in_use:
+            mapped = [dict(v, _InUse=v['Name'] in volume_usage,
+                           _ContainerIds=[f"/{name}" for name in volume_usage.get(v['Name'], [])])
+                      for v in mapped]
+    else:
+        volumes = g.dkr.list_volumes(check_in_use=check_in_use, filters=list_query.filters)
+        mapped = list(map(lambda x: x.attrs, volumes))
+
+    page, next_cursor = paginate_query(mapped, list_query, 'Name')
+    if check_size:
+        # Sizes are served from the cache. Missing and stale sizes are recalculated in the background.
+        sizes = get_volume_size_scanner(g.dkr_ctx_id).get_sizes(page, wait=wait_for_size)
+        page = [dict(v, _Size=sizes[v['Name']]['size'], _SizeScannedAt=sizes[v['Name']]['scanned_at'])
+                for v in page]
+    return list_response(page, list_query, next_cursor, len(mapped))
@@ -1,9 +1,25 @@
+import json
+import queue
+import threading
+import time
+
 import flask
 from flask import jsonify
+
+from kontainer import settings
 from flask_jwt_extended.view_decorators import jwt_required
 
 from kontainer.docker.context import get_docker_contexts, add_docker_context, remove_docker_context
-from kontainer.docker.manager import DockerManager
+from kontainer.docker.events import discard_docker_events_buffer
+from kontainer.docker.health import get_context_health_monitor
+from kontainer.docker.inventory import discard_docker_inventory
+from kontainer.docker.overview import get_contexts_overview
+from kontainer.docker.pool import get_docker_manager, docker_client_pool
+from kontainer.docker.stats import discard_stats_collector
+from kontainer.docker.volumesize import discard_volume_size_scanner
+from kontainer.environments.fanout import resolve_fanout_contexts, run_fanout
+from kontainer.environments.tasks import environments_fanout_task
+from kontainer.server.streaming import sse_event, sse_response
 
 environments_api_bp = flask.Blueprint('environments_api', __name__, url_prefix='/api/environments')
 
@@ -28,6 +44,147 @@ def list_environments():
     return jsonify(get_docker_contexts())
 
 
+@environments_api_bp.route('/overview', methods=["GET"])
+@jwt_required()
+def environments_overview():
+    """
+    Get the overview of all environments.
+    All docker hosts are queried concurrently. Unreachable hosts are reported with an error,
+    while the results of the other hosts are still returned.
+
+    Optional query parameters:
+    - timeout: max. seconds to wait for the docker hosts
+
+    :return: dict with the list of environment overviews
+    """
+    try:
+        timeout = flask.request.args.get('timeout', None)
+        timeout = float(timeout) if timeout is not None else None
+    except ValueError:
+        return jsonify({"error": "timeout must be a number"}), 400
+
+    start = time.monotonic()
+    overviews = get_contexts_overview(get_docker_contexts(), timeout=timeout)
+    return jsonify({
+        "environments": overviews,
+        "total": len(overviews),
+        "reachable": len([o for o in overviews if o["status"] == "ok"]),
+        "elapsed": round(time.monotonic() - start, 3),
+    })
+
+
+@environments_api_bp.route('/health', methods=["GET"])
+@jwt_required()
+def environments_health():
+    """
+    Get the circuit breaker state and ping latency history of all environments
+
+    :return: list of dicts
+    """
+    monitor = get_context_health_monitor()
+    monitor.ensure_started()
+    return jsonify(monitor.status())
+
+
+@environments_api_bp.route('/fanout', methods=["POST"])
+@jwt_required()
+def environments_fanout():
+    """
+    Run a shell command on many remote environments concurrently.
+    The environments must be reachable via SSH.
+
+    JSON body:
+    - command: shell command
+    - contexts: optional list of context ids (default: all contexts)
+    - max_workers: optional max. number of hosts running the command concurrently
+    - timeout: optional max. seconds per host
+    - idle_timeout: optional max. seconds per host without output
+
+    Optional query parameters:
+    - sync: 1 to wait for the results
+    - stream: true to stream the output of all hosts as server-sent events
+
+    :return: task id, aggregated results or event stream
+    """
+    if not settings.KONTAINER_ENABLE_REMOTE_EXEC:
+        return jsonify({"error": "Remote command execution is disabled"}), 403
+
+    request_json = flask.request.json or {}
+    command = request_json.get("command")
+    if not command or not isinstance(command, str):
+        return jsonify({"error": "command is required"}), 400
+
+    ctx_ids = request_json.get("contexts", None)
+    kwargs = {}
+    for key in ("max_workers", "timeout", "idle_timeout"):
+        value = request_json.get(key)
+        if value is None:
+            continue
+        number_types = int if key == "max_workers" else (int, float)
+        if isinstance(value, bool) or not isinstance(value, number_types) or value <= 0:
+            return jsonify({"error": f"{key} must be a positive {'integer' if key == 'max_workers' else 'number'}"}), 400
+        kwargs[key] = value
+    try:
+        contexts = resolve_fanout_contexts(ctx_ids)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if flask.request.args.get('stream', 'false') == 'true':
+        return sse_response(_stream_fanout(contexts, command, **kwargs))
+
+    if flask.request.args.get('sync', None) == "1":
+        return jsonify(run_fanout(contexts, command, **kwargs))
+
+    task = environments_fanout_task.apply_async(args=[command, ctx_ids], kwargs=kwargs)
+    return jsonify({"task_id": task.id, "ref": "/environments/fanout"})
+
+
+def _stream_fanout(contexts, command, **kwargs):
+    events = queue.Queue(maxsize=10000)
+    # Set when the client has disconnected: cancels the remote commands
+    cancel_event = threading.Event()
+    keepalive_interval = settings.KONTAINER_LOGS_KEEPALIVE_INTERVAL
+
+    def on_output(ctx_id, stream, line):
+        try:
+            events.put_nowait(("output", {"id": ctx_id, "stream": stream,
+                                          "line": line.decode("utf-8", errors="replace")}))
+        except queue.Full:
+            # Slow client: Drop output lines, the results are still sent
+            pass
+
+    def put(event, data):
+        try:
+            events.put((event, data), timeout=keepalive_interval)
+        except queue.Full:
+            # The client does not read anymore
+            cancel_event.set()
+
+    def run():
+        try:
+            summary = run_fanout(contexts, command, on_output=on_output,
+                                 on_result=lambda result: put("result", result), cancel_event=cancel_event, **kwargs)
+            put("done", {k: v for k, v in summary.items() if k != "results"})
+        except Exception as e:
+            put("error", {"error": str(e)})
+
+    threading.Thread(target=run, name="fanout", daemon=True).start()
+
+    try:
+        while True:
+            try:
+                event, data = events.get(timeout=keepalive_interval)
+            except queue.Empty:
+                yield b": keep-alive\n\n"
+                continue
+            yield sse_event(json.dumps(data), event=event)
+            if event in ("done", "error"):
+                break
+    finally:
+        # Closed by the client or finished
+        cancel_event.set()
+
+
 @environments_api_bp.route('', methods=["POST"])
 @jwt_required()
 def create_environment():
@@ -87,8 +244,7 @@ def connect_environment(name: str):
         return jsonify({"error": "Environment not found"}), 404
 
     try:
-        docker_host = env["host"]
-        dkr = DockerManager(docker_host)
+        dkr = get_docker_manager(env["id"])
         info = dkr.info()
         return jsonify(info)
     except Exception as e:
@@ -109,4 +265,10 @@ def remove_environment(name: str):
     # EnvManager.remove(alias)
     # return jsonify(env.to_dict())
     remove_docker_context(name)
+    discard_docker_inventory(name)
+    discard_docker_events_buffer(name)
+    discard_stats_collector(name)
+    discard_volume_size_scanner(name)
+    get_context_health_monitor().discard(name)
+    docker_client_pool.discard(name)
     return jsonify({"message": "Environment removed"}), 200
\ No newline at end of file
@@ -72,3 +72,18 @@ def get_task_status(task_id):
         return jsonify(response)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+@tasks_api_bp.route('/<string:task_id>/cancel', methods=['POST'])
+@jwt_required()
+def cancel_task(task_id):
+    """
+    Cancels a submitted or running task.
+    A running task is terminated. Commands started by the task with
+    `run_command_streaming` are terminated with their whole process group.
+    """
+    try:
+        celery.control.revoke(task_id, terminate=True, signal='SIGTERM')
+        return jsonify({'task_id': task_id, 'status': 'REVOKED'}), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,144 @@
+from flask import jsonify
+
+
+class ListQuery:
+    """
+    Common query parameters of the list endpoints.
+
+    - Docker filters, e.g. `label=com.example=foo`, `status=running`, `name=web`.
+      Each filter can be passed multiple times.
+    - fields: comma-separated list of (dotted) JSON paths to include in each item,
+      e.g. `fields=Id,Names,State,Labels.com.docker.compose.project`
+    - limit: max. number of items to return
+    - cursor: the `X-Next-Cursor` header value of the previous page
+
+    If `limit` or `cursor` is set, the items are sorted by their key
+    and the next cursor is returned in the `X-Next-Cursor` response header.
+    """
+
+    def __init__(self, args, supported_filters: tuple):
+        self.filters = dict()
+        for key in supported_filters:
+            values = [v for v in args.getlist(key) if v != ""]
+            if len(values) > 0:
+                self.filters[key] = values
+
+        fields = args.get('fields', '')
+        self.fields = [f.strip() for f in fields.split(',') if f.strip() != ""]
+
+        self.cursor = args.get('cursor', None) or None
+
+        limit = args.get('limit', None)
+        self.limit = None
+        if limit is not None and limit != "":
+            try:
+                self.limit = int(limit)
+            except ValueError:
+                raise ValueError("limit must be an integer")
+            if self.limit < 1:
+                raise ValueError("limit must be greater than 0")
+
+    @property
+    def paginated(self) -> bool:
+        return self.limit is not None or self.cursor is not None
+
+
+def paginate_query(items: list, query: ListQuery, key: str) -> tuple[list, str | None]:
+    """
+    Paginate the items according to the list query.
+
+    :param items: list of dicts
+    :param query: ListQuery
+    :param key: the item key to sort by, e.g. 'Id'
+    :return: tuple of page items and next cursor
+    """
+    if not query.paginated:
+        return items, None
+    return paginate(items, key, query.cursor, query.limit)
+
+
+def paginate(items: list, key: str, cursor=None, limit=None) -> tuple[list, str | None]:
+    """
+    Cursor-based pagination.
+    The items are sorted by the given key and the cursor is the key of the last item of the previous page.
+
+    :param items: list of dicts
+    :param key: the item key to sort by, e.g. 'Id'
+    :param cursor: return items after this key
+    :param limit: max. number of items
+    :return: tuple of page items and next cursor (None, if there are no more items)
+    """
+    if cursor is None and limit is None:
+        return items, None
+
+    items = sorted(items, key=lambda x: x.get(key) or "")
+    if cursor is not None:
+        items = [i for i in items if (i.get(key) or "") > cursor]
+
+    if limit is not None and len(items) > limit:
+        return items[:limit], items[limit - 1].get(key)
+    return items, None
+
+
+def _lookup_path(item, parts: list):
+    # Resolve a dotted path. Keys may contain dots themselves (e.g. label keys),
+    # so the longest matching key is tried first.
+    if len(parts) == 0:
+        return True, item
+    if not isinstance(item, dict):
+        return False, None
+
+    for i in range(len(parts), 0, -1):
+        key = ".".join(parts[:i])
+        if key in item:
+            found, value = _lookup_path(item[key], parts[i:])
+            if found:
+                return True, (key, value, parts[i:])
+    return False, None
+
+
+def project_fields(item: dict, fields: list) -> dict:
+    """
+    Project an item to the given (dotted) JSON paths.
+
+    :param item: dict
+    :param fields: list of dotted paths, e.g. ['Id', 'State.Status']
+    :return: dict with the selected paths only
+    """
+    result = dict()
+    for field in fields:
+        found, match = _lookup_path(item, field.split("."))
+        if not found:
+            continue
+
+        src, dst = match, result
+        while True:
+            key, value, rest = src
+            if len(rest) == 0:
+                dst[key] = value
+                break
+            dst = dst.setdefault(key, dict())
+            src = value
+    return result
+
+
+def list_response(items: list, query: ListQuery, next_cursor=None, total=None):
+    """
+    Build the JSON response for a list endpoint.
+    Applies the field projection and sets the pagination headers.
+
+    :param items: list of (filtered and paginated) items
+    :param query: ListQuery
+    :param next_cursor: cursor of the next page, if any
+    :param total: total number of items matching the filters
+    :return: flask response
+    """
+    if len(query.fields) > 0:
+        items = [project_fields(i, query.fields) for i in items]
+
+    response = jsonify(items)
+    if total is not None:
+        response.headers['X-Total-Count'] = str(total)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
@@ -1,9 +1,11 @@
 from flask import request, jsonify, g, abort
 
+from kontainer import settings
 from kontainer.docker.context import get_dockerhost_for_ctx_id
 #from flask_jwt_extended import verify_jwt_in_request
 
-from kontainer.docker.service import DockerService
+from kontainer.docker.health import get_context_health_monitor
+from kontainer.docker.pool import get_docker_manager
 
 
 # Middleware to check API key presence
@@ -89,5 +91,31 @@ def docker_service_middleware(app):
 
         g.dkr_ctx_id = docker_ctxid
         g.dkr_host = get_dockerhost_for_ctx_id(docker_ctxid)
-        g.dkr = DockerService(docker_ctxid).dkr
+        if g.dkr_host is None:
+            return jsonify({"error": f"Docker context {docker_ctxid} not found"}), 404
+
+        # Fail fast, while the docker host is known to be down
+        monitor = get_context_health_monitor()
+        monitor.ensure_started()
+        breaker = monitor.get_breaker(docker_ctxid)
+        probe = breaker.before_request()
+        if probe is None:
+            return _docker_host_unavailable(docker_ctxid, breaker)
+
+        try:
+            g.dkr = get_docker_manager(docker_ctxid)
+            if probe:
+                g.dkr.ping(timeout=settings.KONTAINER_HEALTH_CHECK_TIMEOUT)
+        except Exception as e:
+            breaker.record_failure(e)
+            return _docker_host_unavailable(docker_ctxid, breaker)
+
+        if probe:
+            breaker.record_success()
         return None
+
+
+def _docker_host_unavailable(ctx_id, breaker):
+    response = jsonify({"error": f"Docker host {ctx_id} is unavailable", "message": breaker.last_error})
+    response.headers['Retry-After'] = str(breaker.retry_after())
+    return response, 503
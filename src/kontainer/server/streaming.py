@@ -0,0 +1,142 @@
+from flask import Response, stream_with_context
+
+from kontainer import settings
+
+
+def _parse_timestamp(value, name):
+    if value is None or value == "":
+        return None
+    try:
+        ts = float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a unix timestamp")
+    return int(ts) if ts.is_integer() else ts
+
+
+class LogStreamQuery:
+    """
+    Common query parameters of the log stream endpoints.
+
+    - follow: true/false (default: false) Keep the stream open and send new log lines
+    - tail: number of lines from the end of the logs or 'all' (default: 500)
+    - since, until: unix timestamps
+    - timestamps: true/false (default: true) Prefix each line with its timestamp
+    - format: 'sse' or 'text'. Defaults to 'sse', if the client accepts text/event-stream.
+    - keepalive: true/false (default: false) In text mode, send an empty line while a followed log is idle.
+      Clients, which enable it, can not tell the keep-alives apart from empty log lines.
+      In sse mode, keep-alive comments are always sent.
+    """
+
+    def __init__(self, args, accept=None):
+        self.follow = args.get('follow', 'false') == 'true'
+        self.timestamps = args.get('timestamps', 'true') == 'true'
+        self.keepalive = args.get('keepalive', 'false') == 'true'
+        self.since = _parse_timestamp(args.get('since', None), "since")
+        self.until = _parse_timestamp(args.get('until', None), "until")
+
+        tail = args.get('tail', '500')
+        if tail == 'all':
+            self.tail = 'all'
+        else:
+            try:
+                self.tail = int(tail)
+            except ValueError:
+                raise ValueError("tail must be an integer or 'all'")
+            if self.tail < 0:
+                raise ValueError("tail must not be negative")
+
+        default_format = 'sse' if accept and 'text/event-stream' in accept else 'text'
+        self.format = args.get('format', default_format)
+        if self.format not in ('sse', 'text'):
+            raise ValueError("format must be 'sse' or 'text'")
+
+    def to_kwargs(self) -> dict:
+        return {
+            'follow': self.follow,
+            'tail': self.tail,
+            'since': self.since,
+            'until': self.until,
+            'timestamps': self.timestamps,
+        }
+
+
+def sse_event(data: str, event=None, event_id=None) -> bytes:
+    """
+    Format a server-sent event.
+
+    :param data: event data. Multi-line data is split into multiple data fields.
+    :param event: optional event type
+    :param event_id: optional event id
+    :return: bytes
+    """
+    msg = f"event: {event}\n" if event else ""
+    if event_id is not None:
+        msg += f"id: {event_id}\n"
+    for line in data.split("\n"):
+        msg += f"data: {line}\n"
+    return (msg + "\n").encode()
+
+
+def sse_response(generator) -> Response:
+    """
+    Build a streaming server-sent events response.
+
+    :param generator: generator of bytes
+    :return: flask response
+    """
+    response = Response(stream_with_context(generator), mimetype="text/event-stream")
+    response.headers['Cache-Control'] = "no-cache"
+    # Disable response buffering in the nginx reverse proxy
+    response.headers['X-Accel-Buffering'] = "no"
+    return response
+
+
+def log_stream_response(reader, fmt: str, keepalive_interval=None, text_keepalive=False) -> Response:
+    """
+    Build a streaming response for a log reader.
+
+    The reader is closed when the stream ends or the client disconnects.
+    While a followed log is idle, an SSE keep-alive comment is sent,
+    so a disconnected client is noticed even if no new log lines arrive.
+    In text mode, there is no keep-alive unless `text_keepalive` is set, because
+    an empty line can not be told apart from an empty log line. A disconnected client
+    is then noticed with the next log line.
+    An 'end' event is sent when the log stream has ended.
+
+    :param reader: LogStreamReader or any object with `iter_lines(idle_timeout)`, `close()` and `error`
+    :param fmt: 'sse' or 'text'
+    :param keepalive_interval: seconds
+    :param text_keepalive: If True, send an empty line as keep-alive in text mode
+    :return: flask response
+    """
+    if keepalive_interval is None:
+        keepalive_interval = settings.KONTAINER_LOGS_KEEPALIVE_INTERVAL
+
+    def generate():
+        try:
+            for line in reader.iter_lines(idle_timeout=keepalive_interval):
+                if fmt == 'sse':
+                    if line is None:
+                        yield b": keep-alive\n\n"
+                    else:
+                        yield sse_event(line.decode("utf-8", errors="replace"))
+                elif line is None:
+                    if text_keepalive:
+                        # An empty chunk is not written to the socket
+                        yield b"\n"
+                else:
+                    yield line + b"\n"
+
+            if fmt == 'sse':
+                if reader.error is not None:
+                    yield sse_event(str(reader.error), event="error")
+                yield sse_event("", event="end")
+        finally:
+            reader.close()
+
+    mimetype = "text/event-stream" if fmt == 'sse' else "text/plain"
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Cache-Control'] = "no-cache"
+    # Disable response buffering in the nginx reverse proxy
+    response.headers['X-Accel-Buffering'] = "no"
+    return response
@@ -33,6 +33,105 @@ KONTAINER_ENABLE_KUBERNETES = os.getenv("KONTAINER_ENABLE_KUBERNETES", "false").
 KONTAINER_ENABLE_DELETE = os.getenv("KONTAINER_ENABLE_DELETE", "true").lower() == "true"
 
 
+# Docker client pool
+# Idle clients are closed after KONTAINER_DOCKER_POOL_IDLE_TIMEOUT seconds (0 = never).
+# Clients idle for longer than KONTAINER_DOCKER_POOL_HEALTHCHECK_INTERVAL seconds are pinged before reuse.
+KONTAINER_DOCKER_POOL_IDLE_TIMEOUT = int(os.getenv("KONTAINER_DOCKER_POOL_IDLE_TIMEOUT", "600"))
+KONTAINER_DOCKER_POOL_HEALTHCHECK_INTERVAL = int(os.getenv("KONTAINER_DOCKER_POOL_HEALTHCHECK_INTERVAL", "30"))
+KONTAINER_DOCKER_POOL_MAX_SIZE = int(os.getenv("KONTAINER_DOCKER_POOL_MAX_SIZE", "10"))
+
+# Docker inventory cache
+# If enabled, list and describe endpoints are served from an in-memory inventory,
+# which is kept up to date by the docker events stream.
+KONTAINER_ENABLE_INVENTORY_CACHE = os.getenv("KONTAINER_ENABLE_INVENTORY_CACHE", "true").lower() == "true"
+
+# Log streaming
+# Max. number of lines buffered per log stream, max. length of a single line in bytes,
+# and the interval in seconds for keep-alive messages while a followed log is idle.
+KONTAINER_LOGS_STREAM_BUFFER_LINES = int(os.getenv("KONTAINER_LOGS_STREAM_BUFFER_LINES", "1000"))
+KONTAINER_LOGS_MAX_LINE_LENGTH = int(os.getenv("KONTAINER_LOGS_MAX_LINE_LENGTH", "65536"))
+KONTAINER_LOGS_KEEPALIVE_INTERVAL = int(os.getenv("KONTAINER_LOGS_KEEPALIVE_INTERVAL", "15"))
+# Seconds to wait for lines of idle containers, when merging followed log streams
+KONTAINER_LOGS_REORDER_WINDOW = float(os.getenv("KONTAINER_LOGS_REORDER_WINDOW", "0.5"))
+
+# Volume sizes
+# Sizes are cached for KONTAINER_VOLUME_SIZE_CACHE_TTL seconds and scanned by KONTAINER_VOLUME_SIZE_WORKERS threads.
+KONTAINER_VOLUME_SIZE_CACHE_TTL = int(os.getenv("KONTAINER_VOLUME_SIZE_CACHE_TTL", "300"))
+KONTAINER_VOLUME_SIZE_WORKERS = int(os.getenv("KONTAINER_VOLUME_SIZE_WORKERS", "4"))
+
+# Max. number of concurrent docker requests for bulk container actions
+KONTAINER_BULK_MAX_WORKERS = int(os.getenv("KONTAINER_BULK_MAX_WORKERS", "8"))
+
+# Restart all containers
+# Max. number of concurrent restarts and max. seconds to wait for a batch to become healthy
+KONTAINER_RESTART_PARALLELISM = int(os.getenv("KONTAINER_RESTART_PARALLELISM", "4"))
+KONTAINER_RESTART_HEALTH_TIMEOUT = int(os.getenv("KONTAINER_RESTART_HEALTH_TIMEOUT", "60"))
+
+# Container stats collector
+# Seconds between reconciling the stats streams with the running containers
+KONTAINER_STATS_RESYNC_INTERVAL = int(os.getenv("KONTAINER_STATS_RESYNC_INTERVAL", "30"))
+
+# Docker events
+# Number of events kept in the shared events buffer per context
+KONTAINER_EVENTS_BUFFER_SIZE = int(os.getenv("KONTAINER_EVENTS_BUFFER_SIZE", "1000"))
+
+# Seconds after which the cached 'docker system df' summary is refreshed in the background
+KONTAINER_DF_CACHE_TTL = int(os.getenv("KONTAINER_DF_CACHE_TTL", "300"))
+
+# Environments overview
+# Max. seconds to wait for a docker host and max. number of hosts queried concurrently.
+# Keep the max. number of workers above the number of contexts, so all hosts are queried at once.
+KONTAINER_OVERVIEW_TIMEOUT = float(os.getenv("KONTAINER_OVERVIEW_TIMEOUT", "5"))
+KONTAINER_OVERVIEW_MAX_WORKERS = int(os.getenv("KONTAINER_OVERVIEW_MAX_WORKERS", "64"))
+
+# Context health monitor
+# Seconds between pings of all docker contexts (0 = disabled), max. seconds to wait for a ping
+# and number of ping results kept per context
+KONTAINER_HEALTH_CHECK_INTERVAL = int(os.getenv("KONTAINER_HEALTH_CHECK_INTERVAL", "15"))
+KONTAINER_HEALTH_CHECK_TIMEOUT = float(os.getenv("KONTAINER_HEALTH_CHECK_TIMEOUT", "5"))
+KONTAINER_HEALTH_HISTORY_SIZE = int(os.getenv("KONTAINER_HEALTH_HISTORY_SIZE", "240"))
+# The circuit of a context opens after KONTAINER_CIRCUIT_FAILURE_THRESHOLD consecutive failed pings.
+# Requests fail fast with 503 until a probe is let through after KONTAINER_CIRCUIT_RESET_TIMEOUT seconds.
+KONTAINER_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("KONTAINER_CIRCUIT_FAILURE_THRESHOLD", "3"))
+KONTAINER_CIRCUIT_RESET_TIMEOUT = int(os.getenv("KONTAINER_CIRCUIT_RESET_TIMEOUT", "30"))
+
+# SSH transport pool (remote git and remote compose)
+# Idle transports are closed after KONTAINER_SSH_POOL_IDLE_TIMEOUT seconds (0 = never).
+# Keep-alive packets are sent every KONTAINER_SSH_KEEPALIVE_INTERVAL seconds (0 = disabled).
+KONTAINER_SSH_POOL_IDLE_TIMEOUT = int(os.getenv("KONTAINER_SSH_POOL_IDLE_TIMEOUT", "300"))
+KONTAINER_SSH_KEEPALIVE_INTERVAL = int(os.getenv("KONTAINER_SSH_KEEPALIVE_INTERVAL", "30"))
+# OpenSSH client config, which provides the user, port and identity file of ssh:// docker hosts
+KONTAINER_SSH_CONFIG_FILE = os.path.expanduser(os.getenv("KONTAINER_SSH_CONFIG_FILE", "~/.ssh/config"))
+# Max. number of bytes of stdout and stderr kept per remote command
+KONTAINER_SSH_OUTPUT_MAX_BYTES = int(os.getenv("KONTAINER_SSH_OUTPUT_MAX_BYTES", str(1024 * 1024)))
+
+# Number of output lines reported in the progress of celery tasks
+KONTAINER_TASK_PROGRESS_LINES = int(os.getenv("KONTAINER_TASK_PROGRESS_LINES", "50"))
+# Run stop, start, restart, ps and down of compose stacks in-process with the docker API,
+# instead of running docker compose. Build and up with changes always use docker compose.
+KONTAINER_NATIVE_COMPOSE = os.getenv("KONTAINER_NATIVE_COMPOSE", "true").lower() == "true"
+# Max. number of bytes of stdout and stderr kept per docker compose command.
+# The full output is only streamed to the task progress.
+KONTAINER_COMPOSE_OUTPUT_MAX_BYTES = int(os.getenv("KONTAINER_COMPOSE_OUTPUT_MAX_BYTES", str(256 * 1024)))
+
+# Remote command fan-out
+# Running shell commands on the remote hosts via the API must be enabled explicitly.
+# Max. number of hosts running a command concurrently, max. seconds per host
+# and max. number of bytes of stdout and stderr kept per host
+KONTAINER_ENABLE_REMOTE_EXEC = os.getenv("KONTAINER_ENABLE_REMOTE_EXEC", "false").lower() == "true"
+KONTAINER_FANOUT_MAX_WORKERS = int(os.getenv("KONTAINER_FANOUT_MAX_WORKERS", "16"))
+KONTAINER_FANOUT_TIMEOUT = int(os.getenv("KONTAINER_FANOUT_TIMEOUT", "600"))
+KONTAINER_FANOUT_MAX_OUTPUT = int(os.getenv("KONTAINER_FANOUT_MAX_OUTPUT", str(64 * 1024)))
+
+# Directory of the synced stack projects on remote hosts, relative to the home directory of the ssh user
+KONTAINER_REMOTE_STACKS_DIR = os.getenv("KONTAINER_REMOTE_STACKS_DIR", ".kontainer/stacks")
+
+# Metadata store for stacks, contexts and registries: 'json' (one JSON file each) or 'sqlite'.
+# With 'sqlite', the existing JSON files are imported into KONTAINER_METASTORE_FILE on first use.
+KONTAINER_METASTORE = os.getenv("KONTAINER_METASTORE", "json").lower()
+KONTAINER_METASTORE_FILE = os.getenv("KONTAINER_METASTORE_FILE", os.path.join(KONTAINER_DATA_DIR, "kontainer.db"))
+
+
 # Admin
 KONTAINER_ADMIN_USERNAME = os.getenv("KONTAINER_ADMIN_USERNAME", "admin")
 KONTAINER_ADMIN_PASSWORD_FILE = os.getenv("KONTAINER_ADMIN_PASSWORD_FILE", os.path.join(KONTAINER_DATA_DIR, "admin_password.txt"))
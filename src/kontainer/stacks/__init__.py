@@ -3,6 +3,7 @@ import os
 from abc import ABCMeta, abstractmethod
 
 from kontainer import settings
+from kontainer.util.metastore import use_metastore, get_metastore
 
 
 class ContainerStack(metaclass=ABCMeta):
@@ -71,6 +72,13 @@ class ContainerStack(metaclass=ABCMeta):
             #print(f"Stack {self.name} is not managed")
             return
 
+        if use_metastore():
+            config = get_metastore().get_stack(self.ctx_id, self.name)
+            if config is None:
+                raise FileNotFoundError(f"Stack {self.name} not found")
+            self._config = config
+            return
+
         with open(self._config_file, "r") as f:
             self._config = json.load(f)
 
@@ -79,9 +87,30 @@ class ContainerStack(metaclass=ABCMeta):
             #print(f"Stack {self.name} is not managed")
             return
 
+        if use_metastore():
+            get_metastore().put_stack(self.ctx_id, self.name, self._config)
+            return
+
         with open(self._config_file, "w") as f:
             json.dump(self._config, f, indent=2)
 
+    def delete_config(self) -> bool:
+        """
+        Delete the stack configuration.
+
+        :return: True, if the configuration existed
+        """
+        if not self.managed:
+            return False
+
+        if use_metastore():
+            return get_metastore().delete_stack(self.ctx_id, self.name)
+
+        if os.path.exists(self._config_file):
+            os.remove(self._config_file)
+            return True
+        return False
+
     def serialize(self) -> dict:
         return {
             "ctx_id": self.ctx_id,
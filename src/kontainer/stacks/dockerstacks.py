@@ -1,12 +1,23 @@
+import json
 import os
-import subprocess
+import posixpath
+import shlex
 
 from docker.constants import DEFAULT_TIMEOUT_SECONDS
 
 from kontainer import settings
+from kontainer.docker.context import get_ssh_config_for_ctx_id
 from kontainer.docker.dkr import get_docker_manager_cached
+from kontainer.docker.util import get_container_labels
 from kontainer.stacks import ContainerStack
-from kontainer.util.subprocess_util import kwargs_to_cmdargs, load_envfile
+from kontainer.stacks.drift import parse_config_hashes, plan_stack, compute_build_hashes
+from kontainer.stacks.engine import NativeComposeEngine
+from kontainer.util.remote_utils import exec_ssh_channel_command
+from kontainer.util.sftp_sync_util import sftp_sync_dir
+from kontainer.util.ssh_pool import ssh_sftp, ssh_session
+from kontainer.util.subprocess_util import kwargs_to_cmdargs, load_envfile, run_command_streaming
+from kontainer.util.task_util import task_progress_callback
+from kontainer.util.yaml_util import yaml_to_dict
 
 
 class DockerComposeStack(ContainerStack):
@@ -21,6 +32,25 @@ class DockerComposeStack(ContainerStack):
         self._dkr = get_docker_manager_cached(ctx_id)
 
 
+    @property
+    def engine(self) -> NativeComposeEngine:
+        """
+        The in-process compose engine for the existing containers of the stack.
+        """
+        return NativeComposeEngine(self._dkr, self.name)
+
+
+    def _use_native(self, kwargs, supported=("timeout",)) -> bool:
+        """
+        Check if a command can run with the native compose engine.
+
+        :param kwargs: command arguments
+        :param supported: arguments supported by the native command
+        :return: True, if the native engine is enabled and supports all arguments
+        """
+        return settings.KONTAINER_NATIVE_COMPOSE and set(kwargs.keys()) <= set(supported)
+
+
     def _compose(self, cmd, **kwargs) -> bytes:
         """
         Run a docker compose command.
@@ -39,59 +69,75 @@ class DockerComposeStack(ContainerStack):
         """
         Run a docker compose command on the remote docker host.
 
+        The local project directory is synced to the remote host first. Only the files,
+        which changed since the last sync, are transferred. The compose command runs
+        on a channel of the pooled SSH connection and its output is streamed back.
+
         :param cmd: Command to run
         :param kwargs: Additional arguments to pass to docker compose
         :return:
         """
-        compose_project_name = self.name
+        ssh_config = get_ssh_config_for_ctx_id(self.ctx_id)
+        if ssh_config is None:
+            raise Exception(f"Context {self.ctx_id} is not reachable via SSH")
+
+        base_path = ""
+        if self.config:
+            base_path = self.config.get('base_path', "")
+
+        working_dir = str(os.path.join(settings.KONTAINER_DATA_DIR, self.project_dir))
+        if working_dir is None or not os.path.isdir(working_dir):
+            return b"Stack working dir not found " + self.project_dir.encode("utf-8")
+
         compose_file_name = 'docker-compose.yml'
-        remote_working_dir = f"~/.kontainer/stacks/{self.ctx_id}/{self.name}"
+        if os.path.exists(os.path.join(working_dir, base_path, 'docker-compose.stack.yml')):
+            compose_file_name = 'docker-compose.stack.yml'
 
-        compose_args = dict()
-        compose_args['project-name'] = self.name
-        compose_args['project-directory'] = remote_working_dir
-        compose_args['file'] = compose_file_name
-        compose_args['progress'] = 'plain'
         try:
-            pcmd = ((["docker-compose"]
-                     + kwargs_to_cmdargs(compose_args))  # compose specific args
+            with ssh_sftp(ssh_config) as sftp:
+                # SFTP paths are not shell-expanded: resolve the remote home directory
+                remote_project_dir = posixpath.join(sftp.normalize("."), settings.KONTAINER_REMOTE_STACKS_DIR,
+                                                    self.ctx_id, self.name)
+                result = sftp_sync_dir(sftp, working_dir, remote_project_dir)
+            print(f"Synced {self.name} to {remote_project_dir}: {len(result['uploaded'])} uploaded, "
+                  f"{len(result['deleted'])} deleted, {result['unchanged']} unchanged ({result['bytes']} bytes)")
+
+            remote_working_dir = posixpath.normpath(posixpath.join(remote_project_dir, base_path))
+            compose_args = dict()
+            compose_args['project-name'] = self.name
+            compose_args['project-directory'] = remote_working_dir
+            compose_args['file'] = compose_file_name
+            compose_args['progress'] = 'plain'
+            args = (kwargs_to_cmdargs(compose_args)  # compose specific args
                     + [cmd]  # the compose command (up/down/...)
                     + kwargs_to_cmdargs(kwargs))  # additional command args
-            print(f"RAW CMD: {pcmd}")
-            print(f"CMD: {" ".join(pcmd)}")
+            args = " ".join(shlex.quote(arg) for arg in args)
+            print(f"CMD: docker compose {args}")
+
+            # Prefer the compose plugin, fall back to the standalone docker-compose binary
+            command = (f"cd {shlex.quote(remote_working_dir)} && "
+                       f"if docker compose version >/dev/null 2>&1; then docker compose {args}; "
+                       f"else docker-compose {args}; fi")
 
             # environment variables for docker compose ON THE REMOTE HOST (!)
+            # The compose args take precedence, the variables are set in case the sshd accepts them.
             renv = dict()
-            # renv['PATH'] = os.getenv('PATH')
-            # todo renv['DOCKER_HOST'] = 'unix:///var/run/docker.sock' # the docker host on the remote machine
-            # todo renv['DOCKER_CONFIG'] = settings.DOCKER_CONFIG # the docker config on the remote machine
-            renv['COMPOSE_PROJECT_DIRECTORY'] = remote_working_dir
-            renv['COMPOSE_PROJECT_NAME'] = compose_project_name
+            renv['COMPOSE_PROJECT_NAME'] = self.name
             renv['COMPOSE_FILE'] = compose_file_name
-            renv['PWD'] = remote_working_dir
-            # renv['DOCKER_HOST'] = 'unix:///var/run/docker.sock'
-
-            # todo Load .env file into 'renv'
-            # env_file = os.path.join(KONTAINER_DATA_DIR, 'stacks', f'{self.name}.stack.env.production')
-            # if os.path.exists(env_file):
-            #     renv = load_envfile(env_file, renv)
-            # print(f"ENV: {renv}")
-
-            # p1 = subprocess.run(pcmd, cwd=working_dir, env=renv, capture_output=True)
-            # print("STDOUT", p1.stdout)
-            # print("STDERR", p1.stderr)
-            #
-            # if p1.returncode != 0:
-            #     raise Exception(f"Error running command: {p1.stderr}")
-            #
-            # return p1.stdout
-            raise Exception("Docker Compose remote execution not implemented yet")
+
+            with ssh_session(ssh_config) as session:
+                stdout, stderr, exit_code = exec_ssh_channel_command(
+                    session, command, environment=renv, max_output=settings.KONTAINER_COMPOSE_OUTPUT_MAX_BYTES)
+
+            if exit_code != 0:
+                raise Exception(f"Error running command: {stderr}")
+
+            return stdout
         except Exception as e:
             print(e)
             raise e
 
 
-
     def _compose_local(self, cmd, **kwargs) -> bytes:
         """
         Run a docker compose command locally
@@ -144,14 +190,16 @@ class DockerComposeStack(ContainerStack):
                 penv = load_envfile(env_file, penv)
             print(f"ENV: {penv}")
 
-            p1 = subprocess.run(pcmd, cwd=working_dir, env=penv, capture_output=True)
-            print("STDOUT", p1.stdout)
-            print("STDERR", p1.stderr)
+            # The output is streamed to the task progress, only the tail is kept
+            stdout, stderr, exit_code = run_command_streaming(pcmd, cwd=working_dir, env=penv,
+                                                              on_line=task_progress_callback(),
+                                                              max_output=settings.KONTAINER_COMPOSE_OUTPUT_MAX_BYTES)
+            print(f"EXIT CODE: {exit_code} ({len(stdout)} bytes stdout, {len(stderr)} bytes stderr)")
 
-            if p1.returncode != 0:
-                raise Exception(f"Error running command: {p1.stderr}")
+            if exit_code != 0:
+                raise Exception(f"Error running command: {stderr}")
 
-            return p1.stdout
+            return stdout
         except Exception as e:
             print(e)
             raise e
@@ -179,22 +227,116 @@ class DockerComposeStack(ContainerStack):
     #     return os.path.exists(self.project_dir)
 
 
-    def up(self, **kwargs) -> bytes:
+    def plan(self) -> dict:
+        """
+        Show what 'up' would do.
+
+        Compares the config hashes of the rendered compose model (docker compose config --hash)
+        with the config hash labels of the project containers, and the hashes of the
+        build contexts with the hashes recorded at the last deployment.
+
+        :return: dict with the per-service plan, see `kontainer.stacks.drift.plan_stack`
+        """
+        out = self._compose("config", hash="*")
+        config_hashes = parse_config_hashes(out)
+        if len(config_hashes) == 0:
+            raise Exception(f"Failed to render the compose model: {out.decode('utf-8', errors='replace')}")
+
+        containers = self._dkr.client.api.containers(
+            all=True, filters={"label": f"com.docker.compose.project={self.name}"})
+        plan = plan_stack(config_hashes, containers, self._build_hashes(), self._load_build_hashes())
+        plan["stack"] = self.name
+        return plan
+
+
+    def up(self, force=False, **kwargs) -> bytes:
         """
         Start the stack
         https://docs.docker.com/reference/cli/docker/compose/up/
 
         Runs docker compose up
 
+        Compose only recreates the services with a changed config. Images are only rebuilt,
+        if the build inputs changed since the last deployment. Nothing is run, if the stack is up to date.
+
+        :param force: If True, always rebuild the images and recreate all containers
         :param kwargs: Additional arguments to pass to docker compose up
         """
         print(f"Starting project {self.name} in {self.project_dir}")
 
         kwargs['detach'] = True if 'detach' not in kwargs else kwargs['detach']
-        kwargs['build'] = True if 'build' not in kwargs else kwargs['build']
-        kwargs['force-recreate'] = True if 'force-recreate' not in kwargs else kwargs['force-recreate']
+        build_hashes = None
+        if force:
+            kwargs['build'] = True if 'build' not in kwargs else kwargs['build']
+            kwargs['force-recreate'] = True if 'force-recreate' not in kwargs else kwargs['force-recreate']
+        elif 'build' not in kwargs and 'force-recreate' not in kwargs:
+            try:
+                plan = self.plan()
+            except Exception as e:
+                # Fall back to a full redeploy, if the plan can not be computed
+                print(f"Failed to plan stack {self.name}: {e}")
+                plan = None
+
+            if plan is not None:
+                if not plan["changed"]:
+                    return f"Stack {self.name} is up to date\n".encode("utf-8")
+                if (len(plan["build"]) == 0 and kwargs['detach'] and self._use_native(kwargs, ("detach",))
+                        and all(service["action"] in ("noop", "start") for service in plan["services"])):
+                    # The containers are up to date, but stopped: start them without docker compose
+                    return self.engine.start()
+                kwargs['build'] = len(plan["build"]) > 0
+                build_hashes = self._build_hashes()
+            else:
+                kwargs['build'] = True
+                kwargs['force-recreate'] = True
         # kwargs['y'] = True if 'y' not in kwargs else kwargs['y'] # run non-interactively
-        return self._compose("up", **kwargs)
+        out = self._compose("up", **kwargs)
+
+        if build_hashes is None and kwargs.get('build'):
+            build_hashes = self._build_hashes()
+        if build_hashes is not None:
+            self._save_build_hashes(build_hashes)
+        return out
+
+
+    def _get_working_dir(self) -> str:
+        base_path = ""
+        if self.config:
+            base_path = self.config.get('base_path', "")
+        return str(os.path.join(settings.KONTAINER_DATA_DIR, self.project_dir, base_path))
+
+
+    def _build_hashes(self) -> dict:
+        working_dir = self._get_working_dir()
+        compose_file = os.path.join(working_dir, 'docker-compose.stack.yml')
+        if not os.path.exists(compose_file):
+            compose_file = os.path.join(working_dir, 'docker-compose.yml')
+        if not os.path.exists(compose_file):
+            return {}
+
+        with open(compose_file, "r") as f:
+            compose = yaml_to_dict(f.read()) or {}
+        return compute_build_hashes(compose, working_dir)
+
+
+    @property
+    def _build_hashes_file(self) -> str:
+        return os.path.join(settings.KONTAINER_DATA_DIR, f"stacks/{self.ctx_id}/{self.name}.build.json")
+
+
+    def _load_build_hashes(self) -> dict:
+        try:
+            with open(self._build_hashes_file, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+
+    def _save_build_hashes(self, build_hashes: dict) -> None:
+        if not self.managed:
+            return
+        with open(self._build_hashes_file, "w") as f:
+            json.dump(build_hashes, f, indent=2)
 
 
     def down(self, **kwargs) -> bytes:
@@ -208,6 +350,8 @@ class DockerComposeStack(ContainerStack):
         print(f"COMPOSE DOWN {self.name} in {self.project_dir}")
 
         kwargs['timeout'] = DEFAULT_TIMEOUT_SECONDS if 'timeout' not in kwargs else kwargs['timeout']
+        if self._use_native(kwargs, ("timeout", "volumes")):
+            return self.engine.down(**kwargs)
         return self._compose("down", **kwargs)
 
 
@@ -222,6 +366,8 @@ class DockerComposeStack(ContainerStack):
         print(f"COMPOSE STOP {self.name} in {self.project_dir}")
 
         kwargs['timeout'] = DEFAULT_TIMEOUT_SECONDS if 'timeout' not in kwargs else kwargs['timeout']
+        if self._use_native(kwargs):
+            return self.engine.stop(**kwargs)
         return self._compose("stop", **kwargs)
 
 
@@ -230,6 +376,8 @@ class DockerComposeStack(ContainerStack):
 
         # Run docker compose restart
         kwargs['timeout'] = DEFAULT_TIMEOUT_SECONDS if 'timeout' not in kwargs else kwargs['timeout']
+        if self._use_native(kwargs):
+            return self.engine.restart(**kwargs)
         return self._compose("restart", **kwargs)
 
 
@@ -248,6 +396,8 @@ class DockerComposeStack(ContainerStack):
 
         :param kwargs: Additional arguments to pass to docker compose ps
         """
+        if self._use_native(kwargs, ("all",)):
+            return self.engine.ps(**kwargs)
         return self._compose("ps", **kwargs)
 
 
@@ -266,9 +416,10 @@ class UnmanagedDockerComposeStack(DockerComposeStack):
         self.managed = False
         self._meta = config  # will always be None
 
-        if self._dkr.stack_exists(name):
-            project_dir = self._dkr.get_stack_project_dir(name)
-            self.project_dir = project_dir
+        # A single container list request for the existence check and the project dir
+        containers = self.engine.containers()
+        if len(containers) > 0:
+            self.project_dir = get_container_labels(containers[0]).get('com.docker.compose.project.working_dir')
             self.project_file = None
 
         print(f"Unmanaged stack {self.name} initialized with project_dir {self.project_dir}")
@@ -277,22 +428,17 @@ class UnmanagedDockerComposeStack(DockerComposeStack):
         return f"Unmanaged stack: {self.name}"
 
 
+    def plan(self) -> dict:
+        raise ValueError("Plan is not supported for unmanaged stacks")
+
+
     def up(self, **kwargs) -> bytes:
         """
         Start the stack.
 
         If the stack is managed outside the agent, then only already created containers will be started.
         """
-        out = b""
-        containers: list = self._dkr.list_stack_containers(self.name)
-        for container in containers:
-            try:
-                out += f"Starting container {container.id}\n".encode("utf-8")
-                self._dkr.start_container(container.id)
-            except Exception as e:
-                print(f"Error starting container {container.id}: {e}")
-                out += f"Error starting container {container.id}: {e}\n".encode("utf-8")
-        return out
+        return self.engine.start()
 
 
     def restart(self, **kwargs) -> bytes:
@@ -301,16 +447,7 @@ class UnmanagedDockerComposeStack(DockerComposeStack):
 
         If the stack is managed outside the agent, then just restart the containers
         """
-        out = b""
-        containers: list = self._dkr.list_stack_containers(self.name)
-        for container in containers:
-            try:
-                out += f"Restarting container {container.id}\n".encode("utf-8")
-                self._dkr.restart_container(container.id)
-            except Exception as e:
-                print(f"Error restarting container {container.id}: {e}")
-                out += f"Error restarting container {container.id}: {e}\n".encode("utf-8")
-        return out
+        return self.engine.restart(timeout=kwargs.get('timeout'))
 
 
     def stop(self, **kwargs) -> bytes:
@@ -319,16 +456,14 @@ class UnmanagedDockerComposeStack(DockerComposeStack):
 
         If the stack is managed outside the agent, then just stop the containers
         """
-        out = b""
-        containers: list = self._dkr.list_stack_containers(self.name)
-        for container in containers:
-            try:
-                out += f"Stopping container {container.id}\n".encode("utf-8")
-                self._dkr.stop_container(container.id)
-            except Exception as e:
-                print(f"Error stopping container {container.id}: {e}")
-                out += f"Error stopping container {container.id}: {e}\n".encode("utf-8")
-        return out
+        return self.engine.stop(timeout=kwargs.get('timeout'))
+
+
+    def ps(self, **kwargs) -> bytes:
+        """
+        Get the status of the stack.
+        """
+        return self.engine.ps(all=kwargs.get('all', False))
 
 
     def down(self, **kwargs) -> bytes:
@@ -351,13 +486,4 @@ class UnmanagedDockerComposeStack(DockerComposeStack):
         If the stack is managed outside the agent, then just delete the containers.
         The stack will disappear after all containers are removed.
         """
-        out = b""
-        containers: list = self._dkr.list_stack_containers(self.name)
-        for container in containers:
-            try:
-                out += f"Removing container {container.id}\n".encode("utf-8")
-                self._dkr.remove_container(container.id)
-            except Exception as e:
-                print(f"Error removing container {container.id}: {e}")
-                out += f"Error removing container {container.id}: {e}\n".encode("utf-8")
-        return out
+        return self.engine.rm(timeout=kwargs.get('timeout'))
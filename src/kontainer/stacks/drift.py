@@ -0,0 +1,272 @@
+import hashlib
+import json
+import os
+import posixpath
+import re
+import stat
+
+from kontainer.docker.util import get_container_labels, get_container_name, get_container_state
+from kontainer.util.sftp_sync_util import hash_file
+
+CONFIG_HASH_LABEL = "com.docker.compose.config-hash"
+SERVICE_LABEL = "com.docker.compose.service"
+ONEOFF_LABEL = "com.docker.compose.oneoff"
+
+
+def parse_config_hashes(output: bytes | str) -> dict[str, str]:
+    """
+    Parse the output of `docker compose config --hash "*"`.
+
+    :param output: command output with one '<service> <hash>' line per service
+    :return: dict of service name to config hash
+    """
+    if isinstance(output, bytes):
+        output = output.decode("utf-8", errors="replace")
+
+    hashes = {}
+    for line in output.splitlines():
+        parts = line.strip().split()
+        if len(parts) == 2:
+            hashes[parts[0]] = parts[1]
+    return hashes
+
+
+def group_service_containers(containers: list[dict]) -> dict[str, list[dict]]:
+    """
+    Group the containers of a compose project by service. One-off containers are skipped.
+
+    :param containers: list of container attrs
+    :return: dict of service name to list of container attrs
+    """
+    services = {}
+    for attrs in containers:
+        labels = get_container_labels(attrs)
+        if labels.get(ONEOFF_LABEL) == "True" or SERVICE_LABEL not in labels:
+            continue
+        services.setdefault(labels[SERVICE_LABEL], []).append(attrs)
+    return services
+
+
+def get_build_contexts(compose: dict, working_dir: str) -> dict[str, str | None]:
+    """
+    Get the local build context directories of the services with a build section.
+
+    :param compose: parsed compose file
+    :param working_dir: project directory
+    :return: dict of service name to the build context directory.
+        None, if the context is not a local directory (e.g. a git URL or an interpolated path).
+    """
+    contexts = {}
+    for service, config in (compose.get('services') or {}).items():
+        build = (config or {}).get('build')
+        if build is None:
+            continue
+        context = build if isinstance(build, str) else (build.get('context') or ".")
+        if "$" in context or "://" in context or context.startswith("git@"):
+            contexts[service] = None
+            continue
+        path = os.path.normpath(os.path.join(working_dir, context))
+        contexts[service] = path if os.path.isdir(path) else None
+    return contexts
+
+
+def _dockerignore_regex(pattern: str) -> re.Pattern:
+    """
+    Translate a .dockerignore pattern into a regex, which matches the path and everything below it.
+    """
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+            continue
+        if c == "*":
+            regex += "[^/]*"
+        elif c == "?":
+            regex += "[^/]"
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                regex += re.escape(c)
+            else:
+                regex += "[" + pattern[i + 1:end].replace("\\", "\\\\") + "]"
+                i = end
+        else:
+            regex += re.escape(c)
+        i += 1
+    return re.compile(f"^{regex}(?:/.*)?$")
+
+
+def read_dockerignore(context_dir: str) -> list[tuple[bool, re.Pattern]]:
+    """
+    Read the .dockerignore file of a build context.
+
+    :param context_dir: build context directory
+    :return: list of (exception, regex) rules. Exception rules start with '!'.
+    """
+    rules = []
+    try:
+        with open(os.path.join(context_dir, ".dockerignore"), "r") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return rules
+
+    for line in lines:
+        line = line.strip()
+        if line == "" or line.startswith("#"):
+            continue
+        exception = line.startswith("!")
+        pattern = posixpath.normpath(line.lstrip("!").strip()).lstrip("/")
+        if pattern in ("", "."):
+            continue
+        rules.append((exception, _dockerignore_regex(pattern)))
+    return rules
+
+
+def is_dockerignored(rel_path: str, rules: list[tuple[bool, re.Pattern]]) -> bool:
+    """
+    Check if a path is excluded from the build context. The last matching rule wins.
+
+    :param rel_path: posix path relative to the build context
+    :param rules: rules of `read_dockerignore`
+    :return: True, if the path is excluded
+    """
+    ignored = False
+    for exception, regex in rules:
+        if regex.match(rel_path):
+            ignored = not exception
+    return ignored
+
+
+def hash_build_context(context_dir: str, build: dict | str | None = None) -> str:
+    """
+    Hash the contents of a build context and the build config.
+
+    Files excluded by the .dockerignore file of the context are skipped.
+    The Dockerfile and the .dockerignore file are always hashed, because docker
+    sends them to the daemon anyway. The content of unreadable files is unknown:
+    their size and modification time are hashed instead.
+
+    :param context_dir: build context directory
+    :param build: build section of the service
+    :return: hex digest
+    """
+    rules = read_dockerignore(context_dir)
+    # Without exception rules, an excluded directory can be skipped as a whole
+    has_exceptions = any(exception for exception, _ in rules)
+    dockerfile = "Dockerfile"
+    if isinstance(build, dict) and build.get('dockerfile'):
+        dockerfile = posixpath.normpath(build['dockerfile'])
+    always_included = {dockerfile, ".dockerignore"}
+
+    h = hashlib.sha256()
+    h.update(json.dumps(build, sort_keys=True, default=str).encode())
+    for root, dirs, files in os.walk(context_dir):
+        rel_root = os.path.relpath(root, context_dir).replace(os.sep, "/")
+        rel_root = "" if rel_root == "." else rel_root + "/"
+        dirs[:] = sorted(d for d in dirs if d != ".git" and not os.path.islink(os.path.join(root, d))
+                         and (has_exceptions or not is_dockerignored(rel_root + d, rules)))
+        for name in sorted(files):
+            rel_path = rel_root + name
+            if rel_path not in always_included and is_dockerignored(rel_path, rules):
+                continue
+            path = os.path.join(root, name)
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            try:
+                digest = hash_file(path)
+            except OSError:
+                digest = f"unreadable:{st.st_size}:{st.st_mtime_ns}"
+            h.update(f"{rel_path}\0{digest}\0{stat.S_IMODE(st.st_mode)}\n".encode())
+    return h.hexdigest()
+
+
+def compute_build_hashes(compose: dict, working_dir: str) -> dict[str, str | None]:
+    """
+    Hash the build inputs of all services with a build section.
+
+    :param compose: parsed compose file
+    :param working_dir: project directory
+    :return: dict of service name to build hash. None, if the build inputs can not be hashed.
+    """
+    services = compose.get('services') or {}
+    return {service: hash_build_context(context, services[service].get('build')) if context else None
+            for service, context in get_build_contexts(compose, working_dir).items()}
+
+
+def plan_stack(config_hashes: dict[str, str], containers: list[dict],
+               build_hashes: dict[str, str | None] = None, last_build_hashes: dict[str, str] = None) -> dict:
+    """
+    Compare the rendered compose model with the running containers of the project.
+
+    Actions per service:
+    - create: the service has no containers
+    - recreate: the config hash of a container differs, or the build inputs changed
+    - start: the containers are up to date, but not all are running
+    - noop: the containers are up to date and running
+
+    :param config_hashes: dict of service name to config hash (`docker compose config --hash "*"`)
+    :param containers: container attrs of the compose project
+    :param build_hashes: dict of service name to current build hash
+    :param last_build_hashes: dict of service name to build hash of the last deployment
+    :return: dict with the per-service plan, the orphaned containers,
+        the services to build and whether anything would change
+    """
+    build_hashes = build_hashes or {}
+    last_build_hashes = last_build_hashes or {}
+    service_containers = group_service_containers(containers)
+
+    services = []
+    build = []
+    for service, config_hash in sorted(config_hashes.items()):
+        current = service_containers.get(service, [])
+        names = [get_container_name(attrs) for attrs in current]
+
+        needs_build = False
+        if service in build_hashes:
+            build_hash = build_hashes[service]
+            needs_build = build_hash is None or last_build_hashes.get(service) != build_hash
+        if needs_build:
+            build.append(service)
+
+        stale = [get_container_name(attrs) for attrs in current
+                 if get_container_labels(attrs).get(CONFIG_HASH_LABEL) != config_hash]
+        if len(current) == 0:
+            action, reason = "create", "no containers"
+        elif len(stale) > 0:
+            action, reason = "recreate", f"config changed: {', '.join(stale)}"
+        elif needs_build:
+            action, reason = "recreate", "build inputs changed"
+        elif any(get_container_state(attrs) != "running" for attrs in current):
+            action, reason = "start", "not running"
+        else:
+            action, reason = "noop", "up to date"
+
+        services.append({
+            "service": service,
+            "action": action,
+            "reason": reason,
+            "build": needs_build,
+            "config_hash": config_hash,
+            "containers": names,
+        })
+
+    orphans = [get_container_name(attrs) for service, current in sorted(service_containers.items())
+               if service not in config_hashes for attrs in current]
+
+    return {
+        "services": services,
+        "orphans": orphans,
+        "build": build,
+        "changed": any(s["action"] != "noop" for s in services),
+    }
@@ -0,0 +1,271 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import docker
+
+from kontainer import settings
+from kontainer.docker.util import get_container_labels, get_container_name, get_container_state, \
+    order_containers_by_dependencies, get_compose_dependency_conditions
+from kontainer.stacks.drift import ONEOFF_LABEL, SERVICE_LABEL, group_service_containers
+from kontainer.stacks.status import PROJECT_LABEL
+
+
+class NativeComposeEngine:
+    """
+    In-process implementation of the docker compose lifecycle commands,
+    which only act on the existing containers of a compose project.
+
+    The containers are found by their compose labels and controlled with the docker API
+    of the pooled client. Containers are processed concurrently, in batches ordered by
+    the compose `depends_on` dependencies (reversed for stop and down).
+    Before a batch is started, the `service_healthy` and `service_completed_successfully`
+    conditions of its dependencies are awaited.
+    Commands, which need the compose model (e.g. building images or creating containers),
+    are not supported and must run with docker compose.
+
+    The output has the same format as `docker compose --progress plain`.
+    """
+
+    def __init__(self, dkr, project: str, max_workers=None):
+        """
+        :param dkr: docker manager
+        :param project: compose project name
+        :param max_workers: Max. number of concurrent docker requests
+        """
+        self.dkr = dkr
+        self.client = dkr.client
+        self.project = project
+        self.max_workers = max_workers or settings.KONTAINER_BULK_MAX_WORKERS
+
+
+    def containers(self, oneoff=False) -> list[dict]:
+        """
+        List the service containers of the project.
+
+        :param oneoff: If True, include the one-off containers (compose run)
+        :return: list of container attrs
+        """
+        containers = self.client.api.containers(all=True, filters={"label": f"{PROJECT_LABEL}={self.project}"})
+        if oneoff:
+            return containers
+        return [attrs for attrs in containers if get_container_labels(attrs).get(ONEOFF_LABEL) != "True"]
+
+
+    def ps(self, all=False) -> bytes:
+        """
+        List the containers of the project, like `docker compose ps`.
+
+        :param all: If True, also list stopped containers
+        :return: table with the name, image, service and status of each container
+        """
+        rows = [("NAME", "IMAGE", "SERVICE", "STATUS")]
+        containers = sorted(self.containers(), key=lambda attrs: get_container_name(attrs) or "")
+        for attrs in containers:
+            if not all and get_container_state(attrs) != "running":
+                continue
+            rows.append((get_container_name(attrs) or "", attrs.get('Image', ""),
+                         get_container_labels(attrs).get(SERVICE_LABEL, ""), attrs.get('Status', "")))
+
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        lines = ["   ".join(value.ljust(widths[i]) for i, value in enumerate(row)).rstrip() for row in rows]
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+    def start(self, timeout=None) -> bytes:
+        """
+        Start the stopped containers of the project, like `docker compose start`.
+
+        :param timeout: Max. seconds to wait for the dependency conditions of each batch
+        """
+        def _start(attrs):
+            if get_container_state(attrs) == "paused":
+                self.client.api.unpause(attrs['Id'])
+            else:
+                self.client.api.start(attrs['Id'])
+
+        if timeout is None:
+            timeout = settings.KONTAINER_RESTART_HEALTH_TIMEOUT
+
+        containers = self.containers()
+        services = group_service_containers(containers)
+        stopped = [attrs for attrs in containers if get_container_state(attrs) != "running"]
+        return self._run(stopped, _start, "Starting", "Started",
+                         before_batch=lambda batch: self._wait_dependencies(batch, services, timeout))
+
+
+    def stop(self, timeout=None) -> bytes:
+        """
+        Stop the running containers of the project, like `docker compose stop`.
+
+        :param timeout: Seconds to wait for each container to stop before killing it
+        """
+        containers = [attrs for attrs in self.containers() if get_container_state(attrs) in ("running", "paused")]
+        return self._run(containers, lambda attrs: self._stop(attrs, timeout), "Stopping", "Stopped", reverse=True)
+
+
+    def restart(self, timeout=None) -> bytes:
+        """
+        Restart all containers of the project, like `docker compose restart`.
+
+        :param timeout: Seconds to wait for each container to stop before killing it
+        """
+        def _restart(attrs):
+            if timeout is not None:
+                self.client.api.restart(attrs['Id'], timeout=timeout)
+            else:
+                self.client.api.restart(attrs['Id'])
+
+        return self._run(self.containers(), _restart, "Restarting", "Started")
+
+
+    def rm(self, timeout=None, volumes=False) -> bytes:
+        """
+        Stop and remove the containers of the project, including the one-off containers.
+
+        :param timeout: Seconds to wait for each container to stop before killing it
+        :param volumes: If True, remove the anonymous volumes of the containers
+        """
+        def _remove(attrs):
+            if get_container_state(attrs) in ("running", "paused", "restarting"):
+                self._stop(attrs, timeout)
+            self.client.api.remove_container(attrs['Id'], v=volumes, force=True)
+
+        return self._run(self.containers(oneoff=True), _remove, "Removing", "Removed", reverse=True)
+
+
+    def down(self, timeout=None, volumes=False) -> bytes:
+        """
+        Stop and remove the containers and networks of the project, like `docker compose down`.
+        Containers of services, which were removed from the compose file, are removed as well.
+
+        :param timeout: Seconds to wait for each container to stop before killing it
+        :param volumes: If True, remove the named volumes of the project and the anonymous volumes of the containers
+        """
+        out = self.rm(timeout=timeout, volumes=volumes)
+
+        resources = [("Network", self.client.api.networks(filters={"label": f"{PROJECT_LABEL}={self.project}"}),
+                      self.client.api.remove_network)]
+        if volumes:
+            volume_list = self.client.api.volumes(filters={"label": f"{PROJECT_LABEL}={self.project}"})
+            resources.append(("Volume", (volume_list or {}).get('Volumes') or [], self.client.api.remove_volume))
+
+        errors = []
+        for kind, items, remove in resources:
+            for item in items:
+                name = item.get('Name') or item.get('Id')
+                out += f" {kind} {name}  Removing\n".encode("utf-8")
+                try:
+                    remove(item['Id'] if kind == "Network" else name)
+                    out += f" {kind} {name}  Removed\n".encode("utf-8")
+                except docker.errors.NotFound:
+                    out += f" {kind} {name}  Removed\n".encode("utf-8")
+                except Exception as e:
+                    out += f" {kind} {name}  Error {e}\n".encode("utf-8")
+                    errors.append(f"{kind} {name}: {e}")
+
+        if len(errors) > 0:
+            raise Exception(f"Error running down: {'; '.join(errors)}")
+        return out
+
+
+    def _stop(self, attrs, timeout=None) -> None:
+        if timeout is not None:
+            self.client.api.stop(attrs['Id'], timeout=timeout)
+        else:
+            self.client.api.stop(attrs['Id'])
+
+
+    def _wait_dependencies(self, batch: list[dict], services: dict[str, list[dict]], timeout) -> bytes:
+        """
+        Wait for the `service_healthy` and `service_completed_successfully` conditions
+        of the dependencies of a batch, like docker compose does before starting a service.
+
+        :param batch: container attrs of the batch
+        :param services: dict of service name to container attrs of the project
+        :param timeout: Max. seconds to wait
+        :return: output
+        :raises Exception: if a condition is not met
+        """
+        healthy = dict()
+        completed = dict()
+        for attrs in batch:
+            for service, condition in get_compose_dependency_conditions(attrs).items():
+                for dependency in services.get(service, []):
+                    if condition == "service_healthy":
+                        healthy[dependency['Id']] = get_container_name(dependency)
+                    elif condition == "service_completed_successfully":
+                        completed[dependency['Id']] = get_container_name(dependency)
+
+        out = b""
+        if len(healthy) > 0:
+            out += "".join(f" Container {name}  Waiting\n" for name in healthy.values()).encode("utf-8")
+            status = self.dkr.wait_containers_healthy(list(healthy.keys()), timeout)
+            for container_id, name in healthy.items():
+                if status.get(container_id) != "healthy":
+                    raise Exception(f"Dependency failed to start: container {name} is {status.get(container_id)}")
+                out += f" Container {name}  Healthy\n".encode("utf-8")
+
+        for container_id, name in completed.items():
+            out += f" Container {name}  Waiting\n".encode("utf-8")
+            try:
+                exit_code = self.client.api.wait(container_id, timeout=timeout).get('StatusCode')
+            except Exception as e:
+                raise Exception(f"Dependency failed to start: container {name} did not exit: {e}")
+            if exit_code != 0:
+                raise Exception(f"Dependency failed to start: container {name} exited with code {exit_code}")
+            out += f" Container {name}  Exited\n".encode("utf-8")
+        return out
+
+
+    def _run(self, containers: list[dict], action, doing: str, done: str, reverse=False, before_batch=None) -> bytes:
+        """
+        Run an action on containers, concurrently within each dependency batch.
+
+        :param containers: container attrs
+        :param action: Callable(attrs)
+        :param doing: progress text before the action
+        :param done: progress text after the action
+        :param reverse: If True, process the dependent containers first
+        :param before_batch: Callable(batch), which is called before each batch and returns output.
+            If it raises, the remaining batches are skipped.
+        :return: output
+        :raises Exception: if the action failed for any container, after all containers were processed
+        """
+        batches = order_containers_by_dependencies(containers)
+        if reverse:
+            batches.reverse()
+
+        def _action(attrs):
+            try:
+                action(attrs)
+                return None
+            except docker.errors.NotFound:
+                # Removed in the meantime
+                return None
+            except Exception as e:
+                return str(e)
+
+        out = b""
+        errors = []
+        if len(containers) == 0:
+            return out
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(containers)))) as executor:
+            for batch in batches:
+                if before_batch is not None:
+                    try:
+                        out += before_batch(batch)
+                    except Exception as e:
+                        errors.append(str(e))
+                        break
+                names = [get_container_name(attrs) for attrs in batch]
+                out += "".join(f" Container {name}  {doing}\n" for name in names).encode("utf-8")
+                for name, error in zip(names, executor.map(_action, batch)):
+                    if error is not None:
+                        out += f" Container {name}  Error {error}\n".encode("utf-8")
+                        errors.append(f"{name}: {error}")
+                    else:
+                        out += f" Container {name}  {done}\n".encode("utf-8")
+
+        if len(errors) > 0:
+            raise Exception(f"Error running command: {'; '.join(errors)}")
+        return out
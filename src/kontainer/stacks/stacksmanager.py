@@ -1,5 +1,7 @@
 import os
 import shutil
+import threading
+import time
 from typing import Union
 
 from . import ContainerStack
@@ -8,6 +10,7 @@ from .initializer import stack_from_portainer_template, stack_from_gitrepo, \
 from .dockerstacks import DockerComposeStack, UnmanagedDockerComposeStack
 from .sync import sync_stack
 from ..settings import KONTAINER_DATA_DIR
+from ..util.metastore import use_metastore, get_metastore
 
 
 # Init stack manager
@@ -18,6 +21,11 @@ from ..settings import KONTAINER_DATA_DIR
 # if they have neither, ignore the directory
 
 stack_manager_cache = {}
+stack_manager_cache_lock = threading.Lock()
+
+# Directory mtimes have a coarse granularity. A stack file added in the same tick as a listing
+# does not change the mtime again, so a directory modified shortly before its listing is listed again.
+RACY_MTIME_NS = 1_000_000_000
 
 def get_stacks_manager(ctx_id):
     """
@@ -25,12 +33,13 @@ def get_stacks_manager(ctx_id):
     :param ctx_id: context id
     :return: stack manager
     """
-    if ctx_id in stack_manager_cache:
-        return stack_manager_cache[ctx_id]
+    with stack_manager_cache_lock:
+        if ctx_id in stack_manager_cache:
+            return stack_manager_cache[ctx_id]
 
-    stack_manager = StacksManager(ctx_id)
-    stack_manager_cache[ctx_id] = stack_manager
-    return stack_manager
+        stack_manager = StacksManager(ctx_id)
+        stack_manager_cache[ctx_id] = stack_manager
+        return stack_manager
 
 
 class StacksManager:
@@ -52,10 +61,15 @@ class StacksManager:
     def __init__(self, ctx_id):
         self.ctx_id = ctx_id
         self.stacks = {}
+        # Guards self.stacks. Reentrant, because stack operations call enumerate() and get()
+        self._lock = threading.RLock()
+        self._stacks_dir_mtime = None
+        self._stacks_dir_listed_at = 0
+        self._stack_file_stats = {}
         self.enumerate()
 
 
-    def enumerate(self):
+    def enumerate(self, force=False):
         """
         Init stack manager
         scan for directories in DOCKER_PROJECTS_DIR and check if they have a stack.json or a docker-compose.yml file
@@ -63,26 +77,74 @@ class StacksManager:
         if they have a docker-compose.yml file, create a stack from the file
         if they have both, load the stack from the stack.json file and update it with the docker-compose.yml file
         if they have neither, ignore the directory
-        """
-        self.stacks = {}
 
+        The scan is incremental: The stacks directory is only listed, if its mtime changed,
+        i.e. stack files were added, removed or renamed, or if it was modified within a second
+        before the last listing. Otherwise only the known stack files are stat'ed.
+        Only added, removed or modified stacks are updated. Existing stack objects are kept,
+        the config of a modified stack is reloaded on the next access.
+
+        With the sqlite metastore, the stacks and their config versions are read from the metastore instead.
+
+        :param force: If True, always list the stacks directory
+        """
         stacks_dir = os.path.join(KONTAINER_DATA_DIR, 'stacks', self.ctx_id)
         os.makedirs(stacks_dir, exist_ok=True)
-        for file in os.listdir(stacks_dir):
-            file_path = os.path.join(stacks_dir, file)
-            # if os.path.isdir(file_path):
-            #     docker_compose = os.path.join(file_path, "docker-compose.yml")
-            #     if os.path.exists(docker_compose):
-            #         stack = DockerComposeStack(file, ctx_id=self.ctx_id, managed=True)
-            #         self.add(stack)
-            #         print(f"Added from stack dir: {stack.name}")
-            #     else:
-            #         print(f"Skipping {file_path}")
-            if os.path.isfile(file_path) and file.endswith(".stack.json"):
-                stack_name = file.replace(".stack.json", "")
-                stack = DockerComposeStack(stack_name, ctx_id=self.ctx_id, managed=True)
-                self.add(stack)
-                print(f"Added from stack.json: {stack.name}")
+
+        with self._lock:
+            now = time.time_ns()
+            dir_mtime = os.stat(stacks_dir).st_mtime_ns
+            racy = self._stacks_dir_listed_at - dir_mtime < RACY_MTIME_NS
+            file_stats = {}
+            if use_metastore():
+                file_stats = get_metastore().list_stack_versions(self.ctx_id)
+            elif force or dir_mtime != self._stacks_dir_mtime or racy:
+                self._stacks_dir_listed_at = now
+                for file in os.listdir(stacks_dir):
+                    if not file.endswith(".stack.json"):
+                        continue
+                    stat = self._stat_stack_file(os.path.join(stacks_dir, file))
+                    if stat is not None:
+                        file_stats[file.replace(".stack.json", "")] = stat
+            else:
+                for stack_name in self._stack_file_stats.keys():
+                    stat = self._stat_stack_file(os.path.join(stacks_dir, f"{stack_name}.stack.json"))
+                    if stat is not None:
+                        file_stats[stack_name] = stat
+
+            # Unmanaged stacks are only valid until the next enumeration
+            for stack_name, stack in list(self.stacks.items()):
+                if not stack.managed and stack_name not in file_stats:
+                    del self.stacks[stack_name]
+
+            for stack_name in self._stack_file_stats.keys() - file_stats.keys():
+                self.stacks.pop(stack_name, None)
+                print(f"Removed stack: {stack_name}")
+
+            for stack_name, stat in file_stats.items():
+                stack = self.stacks.get(stack_name)
+                if stack is None or not stack.managed:
+                    stack = DockerComposeStack(stack_name, ctx_id=self.ctx_id, managed=True)
+                    self.stacks[stack_name] = stack
+                    print(f"Added stack: {stack.name}")
+                elif self._stack_file_stats.get(stack_name) != stat:
+                    # Reload the config lazily
+                    stack._config = None
+                    print(f"Modified stack: {stack.name}")
+
+            self._stacks_dir_mtime = dir_mtime
+            self._stack_file_stats = file_stats
+
+
+    @staticmethod
+    def _stat_stack_file(file_path) -> tuple | None:
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        if not os.path.isfile(file_path):
+            return None
+        return st.st_mtime_ns, st.st_size
 
     
     def register_initializer(self, initializer_name, initializer):
@@ -109,49 +171,53 @@ class StacksManager:
     # MANAGE STACKS
 
     def list_all(self):
-        return self.stacks.values()
+        with self._lock:
+            return list(self.stacks.values())
 
 
     def add(self, stack) -> None:
-        if stack.name in self.stacks:
-            # raise ValueError(f"Stack {stack.name} already exists")
-            return
-        self.stacks[stack.name] = stack
+        with self._lock:
+            if stack.name in self.stacks:
+                # raise ValueError(f"Stack {stack.name} already exists")
+                return
+            self.stacks[stack.name] = stack
 
 
     
     def get(self, name) -> Union[ContainerStack, None]:
-        if name not in self.stacks:
-            return None
-
-        stack = self.stacks[name]
-        return stack
+        with self._lock:
+            return self.stacks.get(name)
 
 
     def get_or_unmanaged(self, name) -> ContainerStack:
         stack = self.get(name)
         if stack is None:
             stack = UnmanagedDockerComposeStack(name, ctx_id=self.ctx_id)
-            self.add(stack) # Add the unmanaged stack to the manager
+            with self._lock:
+                # Another thread might have added the stack in the meantime
+                stack = self.stacks.setdefault(name, stack) # Add the unmanaged stack to the manager
         return stack
 
     
     def remove(self, name) -> None:
-        if name not in self.stacks:
-            raise ValueError(f"Stack {name} not found")
-        stack = self.stacks[name]
-        del self.stacks[name]
-        return stack
+        with self._lock:
+            if name not in self.stacks:
+                raise ValueError(f"Stack {name} not found")
+            stack = self.stacks[name]
+            del self.stacks[name]
+            return stack
 
 
 
     # STACK OPERATIONS
 
-    def start(self, name) -> bytes:
+    def start(self, name, force=False) -> bytes:
         # if name not in self.stacks:
         #     raise ValueError(f"Stack {name} not found")
         # stack = self.stacks[name]
         stack = self.get_or_unmanaged(name)
+        if force:
+            return stack.up(force=True)
         return stack.up()
 
 
@@ -198,14 +264,17 @@ class StacksManager:
             shutil.rmtree(full_project_dir)
             out += bytes(f"\n\nDeleted project directory {stack.project_dir}", 'utf-8')
 
-        project_file = os.path.join(KONTAINER_DATA_DIR, stack.name + ".stack.json")
-        if stack.managed and os.path.exists(project_file):
-            os.remove(project_file)
-            out += bytes(f"\n\nDeleted project file {project_file}", 'utf-8')
+        if stack.delete_config():
+            out += bytes(f"\n\nDeleted stack config of {stack.name}", 'utf-8')
+
+        build_hashes_file = os.path.join(KONTAINER_DATA_DIR, f"stacks/{self.ctx_id}/{stack.name}.build.json")
+        if stack.managed and os.path.exists(build_hashes_file):
+            os.remove(build_hashes_file)
 
         # Remove the stack from the manager
-        if name in self.stacks:
-            del self.stacks[name]
+        with self._lock:
+            self.stacks.pop(name, None)
+            self._stack_file_stats.pop(name, None)
 
         return out
 
@@ -214,8 +283,7 @@ class StacksManager:
         if self.ctx_id != "local":
             raise ValueError("Sync is only supported for local stacks")
 
-        # Refresh the list of stacks
-        # @todo find a better way to refresh the list of stacks before sync
+        # Refresh the list of stacks (incremental)
         self.enumerate()
 
         stack = self.get_or_unmanaged(name)
@@ -0,0 +1,85 @@
+from kontainer.docker.util import get_container_labels, get_container_state, count_containers_by_state
+
+PROJECT_LABEL = "com.docker.compose.project"
+WORKING_DIR_LABEL = "com.docker.compose.project.working_dir"
+
+
+def group_containers_by_project(containers: list[dict]) -> dict[str, list[dict]]:
+    """
+    Group containers by their compose project in a single pass.
+    Containers without a compose project are skipped.
+
+    :param containers: list of container attrs
+    :return: dict of project name to list of container attrs
+    """
+    projects = {}
+    for attrs in containers:
+        project = get_container_labels(attrs).get(PROJECT_LABEL)
+        if project is not None:
+            projects.setdefault(project, []).append(attrs)
+    return projects
+
+
+def get_stack_status(containers: list[dict]) -> str:
+    """
+    Get the status of a stack from its containers.
+
+    :param containers: container attrs of the stack
+    :return: 'running', if any container is running, 'idle', if the stack has containers, else 'created'
+    """
+    if any(get_container_state(attrs) == "running" for attrs in containers):
+        return "running"
+    return "idle" if len(containers) > 0 else "created"
+
+
+def serialize_unmanaged_stack(ctx_id: str, name: str, containers: list[dict]) -> dict:
+    """
+    Serialize a compose project, which is not managed by kontainer, from its containers.
+    Same format as `UnmanagedDockerComposeStack.serialize()`, without querying the docker daemon.
+
+    :param ctx_id: context id
+    :param name: compose project name
+    :param containers: container attrs of the project
+    :return: dict
+    """
+    project_dir = None
+    if len(containers) > 0:
+        project_dir = get_container_labels(containers[0]).get(WORKING_DIR_LABEL)
+    return {
+        "ctx_id": ctx_id,
+        "name": name,
+        "project_dir": project_dir,
+        "managed": False,
+        "config": None,
+    }
+
+
+def build_stack_list(ctx_id: str, managed_stacks, containers: list[dict]) -> list[dict]:
+    """
+    Build the stack list with the status and containers of each stack
+    from a single snapshot of the containers.
+
+    :param ctx_id: context id
+    :param managed_stacks: stacks managed by the stacks manager
+    :param containers: container attrs of all containers
+    :return: list of serialized stacks with 'containers', 'status' and 'counts'
+    """
+    projects = group_containers_by_project(containers)
+
+    stacks = []
+    managed_names = set()
+    for stack in managed_stacks:
+        managed_names.add(stack.name)
+        stacks.append((stack.serialize(), projects.get(stack.name, [])))
+
+    for name, project_containers in projects.items():
+        if name not in managed_names:
+            stacks.append((serialize_unmanaged_stack(ctx_id, name, project_containers), project_containers))
+
+    result = []
+    for stack_data, stack_containers in stacks:
+        stack_data['containers'] = stack_containers
+        stack_data['status'] = get_stack_status(stack_containers)
+        stack_data['counts'] = {"total": len(stack_containers), **count_containers_by_state(stack_containers)}
+        result.append(stack_data)
+    return result
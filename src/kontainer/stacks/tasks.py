@@ -14,9 +14,9 @@ def create_stack_task(self, ctx_id, stack_name, initializer_name, **kwargs):
 
 
 @celery.task(bind=True)
-def stack_start_task(self, ctx_id, stack_name):
+def stack_start_task(self, ctx_id, stack_name, force=False):
     print(f"Stack START {stack_name}")
-    return get_stacks_manager(ctx_id).start(stack_name)
+    return get_stacks_manager(ctx_id).start(stack_name, force=force)
 
 
 @celery.task(bind=True)
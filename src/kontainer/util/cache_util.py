@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+
+class _CacheEntry:
+
+    def __init__(self):
+        self.value = None
+        self.loaded_at = None
+        self.error = None
+        self.future: Future | None = None
+
+
+class StaleWhileRevalidateCache:
+    """
+    A thread-safe cache with stale-while-revalidate semantics and single-flight loading.
+
+    - A fresh value (younger than `ttl` seconds) is returned from the cache.
+    - A stale value is returned immediately, while a background thread reloads it.
+    - Without a cached value, the caller waits for the value to be loaded.
+    - At most one load per key is running at any time. Concurrent callers share its result.
+    - If a background reload fails, the stale value is kept and the error is recorded.
+    """
+
+    def __init__(self, loader, ttl: float, name="cache"):
+        """
+        :param loader: Callable, which loads the value for a key
+        :param ttl: seconds after which a value is stale
+        :param name: name used for the background threads
+        """
+        self.loader = loader
+        self.ttl = ttl
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries: dict[str, _CacheEntry] = {}
+        self._pid = os.getpid()
+
+
+    def get(self, key, refresh=False, timeout=None) -> tuple:
+        """
+        Get the value for a key.
+
+        :param key: cache key
+        :param refresh: If True, wait for a reload, even if a value is cached
+        :param timeout: max. seconds to wait for a load
+        :return: tuple of value and the time it was loaded
+        :raises Exception: the loader error, if no value could be loaded
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                # Loads running in the parent process do not complete in the child
+                self._entries = {}
+                self._pid = os.getpid()
+
+            entry = self._entries.setdefault(key, _CacheEntry())
+            if entry.loaded_at is not None and not refresh:
+                if time.time() - entry.loaded_at > self.ttl:
+                    self._load(key, entry)
+                return entry.value, entry.loaded_at
+            future = self._load(key, entry)
+
+        future.result(timeout=timeout)
+        return entry.value, entry.loaded_at
+
+
+    def info(self, key) -> dict | None:
+        """
+        :return: dict with the load time, the last error and whether a load is running
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            return {
+                "loaded_at": entry.loaded_at,
+                "stale": entry.loaded_at is None or time.time() - entry.loaded_at > self.ttl,
+                "loading": entry.future is not None,
+                "error": str(entry.error) if entry.error is not None else None,
+            }
+
+
+    def invalidate(self, key) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.future is None:
+                del self._entries[key]
+
+
+    def _load(self, key, entry: _CacheEntry) -> Future:
+        # Caller must hold self._lock
+        if entry.future is not None:
+            return entry.future
+
+        future = Future()
+        entry.future = future
+
+        def _run():
+            try:
+                value = self.loader(key)
+                with self._lock:
+                    entry.value = value
+                    entry.loaded_at = time.time()
+                    entry.error = None
+                future.set_result(value)
+            except Exception as e:
+                print(f"Failed to load {self.name} for {key}: {e}")
+                with self._lock:
+                    entry.error = e
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    entry.future = None
+
+        threading.Thread(target=_run, name=f"{self.name}-{key}", daemon=True).start()
+        return future
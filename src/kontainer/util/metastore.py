@@ -0,0 +1,311 @@
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from kontainer import settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS stacks (
+    ctx_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    config TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (ctx_id, name)
+);
+CREATE TABLE IF NOT EXISTS contexts (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS registries (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    position INTEGER NOT NULL
+);
+"""
+
+UPSERT_STACK_SQL = ("INSERT INTO stacks (ctx_id, name, config, version, updated_at) VALUES (?, ?, ?, 1, ?) "
+                    "ON CONFLICT (ctx_id, name) DO UPDATE "
+                    "SET config = excluded.config, version = version + 1, updated_at = excluded.updated_at")
+
+
+class MetaStore:
+    """
+    SQLite store for the stack, context and registry metadata.
+
+    The database runs in WAL mode, so readers never block the writer.
+    Each thread uses its own connection. Writes run in `BEGIN IMMEDIATE` transactions,
+    which serializes concurrent writers of all processes (gunicorn workers and celery workers).
+    """
+
+    def __init__(self, db_file: str, busy_timeout: float = 30.0):
+        """
+        :param db_file: path to the database file
+        :param busy_timeout: max. seconds to wait for the write lock
+        """
+        self.db_file = db_file
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_file)), exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            # Connections must not be shared with a forked child process
+            self._local = threading.local()
+            self._pid = os.getpid()
+
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: transactions are controlled explicitly
+            conn = sqlite3.connect(self.db_file, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run a write transaction. The transaction is rolled back, if an exception is raised.
+
+        :return: connection
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+    # Stacks
+
+    def get_stack(self, ctx_id: str, name: str) -> dict | None:
+        """
+        Get the config of a stack.
+
+        :param ctx_id: context id
+        :param name: stack name
+        :return: stack config or None, if the stack does not exist
+        """
+        row = self._connection().execute("SELECT config FROM stacks WHERE ctx_id = ? AND name = ?",
+                                         (ctx_id, name)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+
+    def put_stack(self, ctx_id: str, name: str, config: dict) -> None:
+        """
+        Insert or replace the config of a stack.
+
+        :param ctx_id: context id
+        :param name: stack name
+        :param config: stack config
+        """
+        with self.transaction() as conn:
+            conn.execute(UPSERT_STACK_SQL, (ctx_id, name, json.dumps(config), time.time()))
+
+
+    def delete_stack(self, ctx_id: str, name: str) -> bool:
+        """
+        Delete a stack.
+
+        :param ctx_id: context id
+        :param name: stack name
+        :return: True, if the stack existed
+        """
+        with self.transaction() as conn:
+            return conn.execute("DELETE FROM stacks WHERE ctx_id = ? AND name = ?", (ctx_id, name)).rowcount > 0
+
+
+    def list_stack_versions(self, ctx_id: str) -> dict[str, int]:
+        """
+        List the stacks of a context with their version.
+        The version is incremented on every update of the stack config.
+
+        :param ctx_id: context id
+        :return: dict of stack name to version
+        """
+        rows = self._connection().execute("SELECT name, version FROM stacks WHERE ctx_id = ?", (ctx_id,))
+        return {name: version for name, version in rows}
+
+
+    # Contexts and registries
+
+    def list_contexts(self) -> list[dict]:
+        rows = self._connection().execute("SELECT data FROM contexts ORDER BY position")
+        return [json.loads(data) for data, in rows]
+
+
+    def replace_contexts(self, contexts: list[dict]) -> None:
+        with self.transaction() as conn:
+            self._replace_rows(conn, "contexts", "id", contexts)
+
+
+    def update_contexts(self, fn, default: list[dict] = None) -> list[dict]:
+        """
+        Atomically update the docker contexts.
+
+        :param fn: Callable, which receives the current list of contexts and returns the new list
+        :param default: contexts used, if there are no contexts
+        :return: new list of contexts
+        """
+        with self.transaction() as conn:
+            contexts = [json.loads(data) for data, in conn.execute("SELECT data FROM contexts ORDER BY position")]
+            if len(contexts) == 0:
+                contexts = json.loads(json.dumps(default or []))
+            contexts = fn(contexts)
+            self._replace_rows(conn, "contexts", "id", contexts)
+        return contexts
+
+
+    def list_registries(self) -> list[dict] | None:
+        """
+        List the container registries.
+
+        :return: list of registries or None, if the registries were never written
+        """
+        conn = self._connection()
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'registries'").fetchone() is None:
+            return None
+        return [json.loads(data) for data, in conn.execute("SELECT data FROM registries ORDER BY position")]
+
+
+    def replace_registries(self, registries: list[dict]) -> None:
+        with self.transaction() as conn:
+            self._replace_rows(conn, "registries", "name", registries)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('registries', ?)", (str(time.time()),))
+
+
+    def update_registries(self, fn, default: list[dict] = None) -> list[dict]:
+        """
+        Atomically update the container registries.
+
+        :param fn: Callable, which receives the current list of registries and returns the new list
+        :param default: registries used, if the registries were never written
+        :return: new list of registries
+        """
+        with self.transaction() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'registries'").fetchone() is None:
+                registries = json.loads(json.dumps(default or []))
+            else:
+                registries = [json.loads(data) for data, in
+                              conn.execute("SELECT data FROM registries ORDER BY position")]
+            registries = fn(registries)
+            self._replace_rows(conn, "registries", "name", registries)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('registries', ?)", (str(time.time()),))
+        return registries
+
+
+    @staticmethod
+    def _replace_rows(conn, table: str, key: str, items: list[dict]) -> None:
+        conn.execute(f"DELETE FROM {table}")
+        conn.executemany(f"INSERT OR REPLACE INTO {table} ({key}, data, position) VALUES (?, ?, ?)",
+                         [(item[key], json.dumps(item), i) for i, item in enumerate(items)])
+
+
+    # Import
+
+    def import_files(self, data_dir: str, contexts_file: str = None) -> dict | None:
+        """
+        Import the existing JSON metadata files once:
+        `stacks/<ctx_id>/<name>.stack.json`, the contexts file and `config/registries.json`.
+        The files are left in place. Rows, which already exist, are not overwritten.
+
+        :param data_dir: kontainer data directory
+        :param contexts_file: path to the contexts file
+        :return: dict with the number of imported items or None, if the files were imported before
+        """
+        if contexts_file is None:
+            contexts_file = os.path.join(data_dir, "contexts.json")
+
+        with self.transaction() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'imported_at'").fetchone() is not None:
+                return None
+
+            result = {"stacks": 0, "contexts": 0, "registries": 0}
+            for stack_file in sorted(glob.glob(os.path.join(data_dir, "stacks", "*", "*.stack.json"))):
+                ctx_id = os.path.basename(os.path.dirname(stack_file))
+                name = os.path.basename(stack_file)[:-len(".stack.json")]
+                try:
+                    with open(stack_file, "r") as f:
+                        config = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"Skipping stack file {stack_file}: {e}")
+                    continue
+                result["stacks"] += conn.execute(
+                    "INSERT OR IGNORE INTO stacks (ctx_id, name, config, version, updated_at) VALUES (?, ?, ?, 1, ?)",
+                    (ctx_id, name, json.dumps(config), time.time())).rowcount
+
+            has_contexts = conn.execute("SELECT 1 FROM contexts LIMIT 1").fetchone() is not None
+            if not has_contexts and os.path.exists(contexts_file):
+                with open(contexts_file, "r") as f:
+                    contexts = json.load(f)
+                self._replace_rows(conn, "contexts", "id", contexts)
+                result["contexts"] = len(contexts)
+
+            registries_file = os.path.join(data_dir, "config", "registries.json")
+            has_registries = conn.execute("SELECT 1 FROM meta WHERE key = 'registries'").fetchone() is not None
+            if not has_registries and os.path.exists(registries_file):
+                with open(registries_file, "r") as f:
+                    registries = json.load(f)
+                self._replace_rows(conn, "registries", "name", registries)
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('registries', ?)", (str(time.time()),))
+                result["registries"] = len(registries)
+
+            conn.execute("INSERT INTO meta (key, value) VALUES ('imported_at', ?)", (str(time.time()),))
+        return result
+
+
+metastore = None
+metastore_lock = threading.Lock()
+
+def use_metastore() -> bool:
+    """
+    Check if the metadata is stored in the SQLite metastore instead of JSON files.
+
+    :return: True, if KONTAINER_METASTORE is 'sqlite'
+    """
+    return settings.KONTAINER_METASTORE == "sqlite"
+
+
+def get_metastore() -> MetaStore:
+    """
+    Get the metastore.
+    On first use, the existing JSON metadata files are imported.
+
+    :return: metastore
+    """
+    global metastore
+    with metastore_lock:
+        if metastore is None:
+            from kontainer.docker.context import get_docker_contexts_file
+
+            store = MetaStore(settings.KONTAINER_METASTORE_FILE)
+            imported = store.import_files(settings.KONTAINER_DATA_DIR, contexts_file=get_docker_contexts_file())
+            if imported is not None:
+                print(f"Imported metadata files into {settings.KONTAINER_METASTORE_FILE}: {imported}")
+            metastore = store
+        return metastore
@@ -1,8 +1,14 @@
+import select
 import socket
+import time
 
 import paramiko
 from paramiko.client import SSHClient
 
+from kontainer import settings
+from kontainer.util.subprocess_util import OutputBuffer, CommandCancelledError
+from kontainer.util.task_util import task_progress_callback
+
 
 def ssh_connect(hostname, username, password=None,
                 private_key_file=None, private_key_pass=None, private_key_pass_file=None) -> SSHClient:
@@ -40,7 +46,7 @@ def ssh_connect(hostname, username, password=None,
 
 def ssh_connect_sock(hostname, username, password=None,
                      private_key_file=None, private_key_pass=None,
-                     private_key_pass_file=None) -> paramiko.transport.Transport:
+                     private_key_pass_file=None, port=22) -> paramiko.transport.Transport:
     """
     Connect to a remote server using SSH and return a Transport object.
 
@@ -50,10 +56,11 @@ def ssh_connect_sock(hostname, username, password=None,
     :param private_key_file: The path to the private key file (optional).
     :param private_key_pass: The passphrase for the private key (optional). Not recommended to use.
     :param private_key_pass_file: The path to the file containing the passphrase for the private key (optional).
+    :param port: The SSH port (optional).
     :return: An SSH client object connected to the remote server.
     """
     print(f"Connecting to {hostname}...")
-    sock = paramiko.Transport((hostname, 22))
+    sock = paramiko.Transport((hostname, int(port or 22)))
 
     pkey = None
     if private_key_file:
@@ -63,56 +70,155 @@ def ssh_connect_sock(hostname, username, password=None,
         else:
             key_passphrase = private_key_pass
 
-        pkey = paramiko.RSAKey.from_private_key_file(private_key_file, password=key_passphrase)
+        pkey = paramiko.PKey.from_path(private_key_file, passphrase=key_passphrase)
+
+    if pkey is None and password is None:
+        # Without a key or password, authenticate with the keys of the SSH agent
+        sock.start_client()
+        for agent_key in paramiko.Agent().get_keys():
+            try:
+                sock.auth_publickey(username, agent_key)
+                break
+            except paramiko.AuthenticationException:
+                continue
+        if not sock.is_authenticated():
+            sock.close()
+            raise paramiko.AuthenticationException(f"No SSH agent key was accepted by {hostname}")
+        return sock
 
     sock.connect(username=username, password=password, pkey=pkey, hostkey=None)
     return sock
 
 
-def exec_ssh_client_command(ssh: SSHClient, command, environment=None, timeout=None, fail_on_error=False, verbose=False) -> tuple[bytes,bytes,int] | None:
+def drain_ssh_channel(channel: paramiko.Channel, timeout=None, idle_timeout=None,
+                      on_line=None, max_output=None, cancel_event=None) -> tuple[bytes, bytes, int]:
     """
-    Execute a command on the remote server using SSH.
+    Read stdout and stderr of a running remote command at the same time, until the command exits.
+
+    Both streams are drained while the command runs, so the command never blocks
+    on a full channel window. Only the last `max_output` bytes of each stream are kept.
+
+    :param channel: The session channel, on which the command was started.
+    :param timeout: Max. seconds until the command must have exited.
+    :param idle_timeout: Max. seconds without any output.
+    :param on_line: Callable(stream, line), which receives each output line. Stream is 'stdout' or 'stderr'.
+    :param max_output: Max. number of bytes kept per stream.
+    :param cancel_event: Event, which cancels the command when set
+    :return: Tuple of (stdout, stderr, exit_code).
+    :raises socket.timeout: if a timeout expired. The channel is closed.
+    :raises CommandCancelledError: if the command was cancelled. The channel is closed.
+    """
+    if max_output is None:
+        max_output = settings.KONTAINER_SSH_OUTPUT_MAX_BYTES
+
+    stdout = OutputBuffer("stdout", max_output, on_line)
+    stderr = OutputBuffer("stderr", max_output, on_line)
+
+    start = time.monotonic()
+    last_output = start
+    while True:
+        received = False
+        while channel.recv_ready():
+            stdout.feed(channel.recv(32768))
+            received = True
+        while channel.recv_stderr_ready():
+            stderr.feed(channel.recv_stderr(32768))
+            received = True
+
+        now = time.monotonic()
+        if received:
+            last_output = now
+        elif channel.exit_status_ready():
+            # The exit status is sent after the output. Output, which arrived together with
+            # the exit status after the reads above, is still buffered in the channel.
+            while channel.recv_ready():
+                stdout.feed(channel.recv(32768))
+            while channel.recv_stderr_ready():
+                stderr.feed(channel.recv_stderr(32768))
+            break
+
+        if cancel_event is not None and cancel_event.is_set():
+            # Closing the channel hangs up the remote command
+            channel.close()
+            raise CommandCancelledError("Command was cancelled")
+        if timeout is not None and now - start > timeout:
+            channel.close()
+            raise socket.timeout(f"Command timed out after {timeout} seconds")
+        if idle_timeout is not None and now - last_output > idle_timeout:
+            channel.close()
+            raise socket.timeout(f"Command produced no output for {idle_timeout} seconds")
+
+        if not received:
+            # The channel is readable, when data arrives on stdout or stderr
+            select.select([channel], [], [], 0.5)
+
+    exit_code = channel.recv_exit_status()
+    return stdout.close(), stderr.close(), exit_code
+
+
+def _prepare_command(command, environment=None, fail_on_error=False, verbose=False) -> tuple[str, dict]:
+    if environment is None:
+        environment = dict()
+
+    environment["KONTAINER_REMOTE_ENV"] = "1"
+    environment["KONTAINER_REMOTE_UTILS_VERSION"] = "0.1.0"
+    environment["KONTAINER_REMOTE_HOME"] = "~/.kontainer"
+    # environment["KONTAINER_REMOTE_GIT_BIN"] = "/usr/bin/git"
+    # environment["KONTAINER_REMOTE_DOCKER_BIN"] = "/usr/bin/docker"
+
+    if verbose:
+        command = f"""
+        set -x
+        {command}
+        """
+
+    if fail_on_error:
+        command = f"""
+        set -e
+        {command}
+        """
+    return command, environment
+
+
+def exec_ssh_channel_command(session: paramiko.Channel, command, environment=None, timeout=None, idle_timeout=None,
+                             on_line=None, max_output=None, agent_forward=False,
+                             fail_on_error=False, verbose=False, cancel_event=None) -> tuple[bytes,bytes,int]:
+    """
+    Execute a command on an open session channel and stream its output.
 
-    :param ssh: The SSH client object.
+    :param session: The session channel. It is not closed.
     :param command: The command to execute on the remote server.
     :param environment: A dictionary of environment variables to set for the command.
-    :param timeout: The timeout for the command execution.
-    :param fail_on_error: If True, raise an exception if the command fails (has stderr output).
+    :param timeout: Max. seconds until the command must have exited.
+    :param idle_timeout: Max. seconds without any output.
+    :param on_line: Callable(stream, line), which receives each output line.
+        Defaults to reporting the output as progress of the current celery task.
+    :param max_output: Max. number of bytes of stdout and stderr returned.
+    :param agent_forward: If True, enable agent forwarding on the channel.
+    :param fail_on_error: If True, raise an exception if the command fails.
     :param verbose: If True, print the command before executing it.
+    :param cancel_event: Event, which cancels the command when set
     :return: The output of the command. Tuple of (stdout, stderr, exit_code).
     """
     try:
-        print(f"Executing command on remote: {command}")
-
-        if environment is None:
-            environment = dict()
-
-        environment["KONTAINER_REMOTE_ENV"] = "1"
-        environment["KONTAINER_REMOTE_UTILS_VERSION"] = "0.1.0"
-        environment["KONTAINER_REMOTE_HOME"] = "~/.kontainer"
-        # environment["KONTAINER_REMOTE_GIT_BIN"] = "/usr/bin/git"
-        # environment["KONTAINER_REMOTE_DOCKER_BIN"] = "/usr/bin/docker"
-
-        if verbose:
-            command = f"""
-            set -x
-            {command}
-            """
-
-        if fail_on_error:
-            command = f"""
-            set -e
-            {command}
-            """
-
-        stdin, stdout, stderr = ssh.exec_command(command, timeout=timeout, environment=environment)
+        # 🔑 Enable agent forwarding on this channel
+        if agent_forward:
+            paramiko.agent.AgentRequestHandler(session)
 
-        # Wait for command to finish and get the exit status
-        exit_code = stdout.channel.recv_exit_status()
+        print(f"Executing command on remote: {command}")
+        command, environment = _prepare_command(command, environment, fail_on_error, verbose)
+        # The remote sshd only accepts the variables listed in its AcceptEnv option
+        session.update_environment(environment)
+        session.exec_command(command)
 
-        stdout_bytes = stdout.read()
-        stderr_bytes = stderr.read()
-        print(stdout_bytes.decode())
+        if on_line is None:
+            on_line = task_progress_callback()
+        stdout_bytes, stderr_bytes, exit_code = drain_ssh_channel(session, timeout=timeout, idle_timeout=idle_timeout,
+                                                                  on_line=on_line, max_output=max_output,
+                                                                  cancel_event=cancel_event)
+        print(stdout_bytes.decode(errors="replace"))
+        if stderr_bytes:
+            print(f"Error: {stderr_bytes.decode(errors='replace')}")
 
         if exit_code != 0 and fail_on_error:
             raise Exception(f"Command failed with non-zero exit code: {exit_code}")
@@ -120,20 +226,40 @@ def exec_ssh_client_command(ssh: SSHClient, command, environment=None, timeout=N
         return stdout_bytes, stderr_bytes, exit_code
 
     except socket.timeout as e:
-        print(f"❌ Command timed out after {timeout} seconds.")
+        print(f"❌ {e}")
         raise e
 
     except Exception as e:
         print(f"❌ Command failed: {e}")
         raise e
 
+
+def exec_ssh_client_command(ssh: SSHClient, command, environment=None, timeout=None, fail_on_error=False, verbose=False,
+                            **kwargs) -> tuple[bytes,bytes,int] | None:
+    """
+    Execute a command on the remote server using SSH.
+
+    :param ssh: The SSH client object.
+    :param command: The command to execute on the remote server.
+    :param environment: A dictionary of environment variables to set for the command.
+    :param timeout: The timeout for the command execution.
+    :param fail_on_error: If True, raise an exception if the command fails (has stderr output).
+    :param verbose: If True, print the command before executing it.
+    :param kwargs: Additional arguments of `exec_ssh_channel_command`
+    :return: The output of the command. Tuple of (stdout, stderr, exit_code).
+    """
+    session = ssh.get_transport().open_session()
+    try:
+        return exec_ssh_channel_command(session, command, environment=environment, timeout=timeout,
+                                        fail_on_error=fail_on_error, verbose=verbose, **kwargs)
     finally:
         # ssh.close()
-        pass
+        session.close()
 
 
 def exec_ssh_sock_command(sock: paramiko.transport.Transport, command, environment=None, timeout=None,
-                          agent_forward=False, fail_on_error=False, verbose=False) -> tuple[bytes,bytes,int] | None:
+                          agent_forward=False, fail_on_error=False, verbose=False,
+                          **kwargs) -> tuple[bytes,bytes,int] | None:
     """
     Execute a command on the remote server using SSH Transport.
     This is a lower-level interface than exec_ssh_client_command.
@@ -147,70 +273,16 @@ def exec_ssh_sock_command(sock: paramiko.transport.Transport, command, environme
     :param agent_forward: If True, enable agent forwarding on the channel.
     :param fail_on_error: If True, raise an exception if the command fails (has stderr output).
     :param verbose: If True, print the command before executing it.
+    :param kwargs: Additional arguments of `exec_ssh_channel_command`
     :return: The output of the command. Tuple of (stdout, stderr, exit_code).
     """
 
     # Create a new session channel
     session = sock.open_session()
     try:
-        # 🔑 Enable agent forwarding on this channel
-        if agent_forward:
-            paramiko.agent.AgentRequestHandler(session)
-
-        print(f"Executing command on remote: {command}")
-
-        if environment is None:
-            environment = dict()
-        environment["KONTAINER_REMOTE_ENV"] = "1"
-        environment["KONTAINER_REMOTE_UTILS_VERSION"] = "0.1.0"
-        environment["KONTAINER_REMOTE_HOME"] = "~/.kontainer"
-        # environment["KONTAINER_REMOTE_GIT_BIN"] = "/usr/bin/git"
-        # environment["KONTAINER_REMOTE_DOCKER_BIN"] = "/usr/bin/docker"
-
-        if verbose:
-            command = f"""
-            set -x
-            {command}
-            """
-
-        if fail_on_error:
-            command = f"""
-            set -e
-            {command}
-            """
-
-        session.exec_command(command)
-
-        # Wait for command to finish with a timeout
-        if session.recv_ready() or session.recv_stderr_ready():
-            # Already ready — no need to wait
-            pass
-        elif timeout is not None and timeout > 0:
-            session.settimeout(timeout)
-
-        # Wait until command finishes
-        exit_code = session.recv_exit_status() # Blocks
-
-        stdout = session.makefile('rb')
-        stderr = session.makefile_stderr('rb')
-
-        stdout_bytes = stdout.read()
-        stderr_bytes = stderr.read()
-        print(stdout_bytes.decode())
-        print(f"Error: {stderr_bytes.decode()}")
-
-        if exit_code != 0 and fail_on_error:
-            raise Exception(f"Command failed with non-zero exit code: {exit_code}")
-
-        return stdout_bytes, stderr_bytes, exit_code
-
-    except socket.timeout as e:
-        print(f"❌ Command timed out after {timeout} seconds.")
-        raise e
-    except Exception as e:
-        print(f"❌ Command failed: {e}")
-        raise e
-
+        return exec_ssh_channel_command(session, command, environment=environment, timeout=timeout,
+                                        agent_forward=agent_forward, fail_on_error=fail_on_error,
+                                        verbose=verbose, **kwargs)
     finally:
         session.close()
 
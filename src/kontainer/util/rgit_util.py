@@ -1,6 +1,7 @@
 import paramiko
 
-from kontainer.util.remote_utils import ssh_connect, exec_ssh_client_command, ssh_connect_sock, exec_ssh_sock_command
+from kontainer.util.remote_utils import ssh_connect, exec_ssh_client_command, exec_ssh_sock_command
+from kontainer.util.ssh_pool import ssh_transport
 
 
 def rgit_ssh(ssh_config=None) -> paramiko.SSHClient:
@@ -47,15 +48,13 @@ def rgit_clone(repo_url: str, dest: str, ssh_config, **kwargs) -> bytes:
     fi
     """
 
-    # Using a ssh transport here, because we want agent forwarding
-    ssh_sock = ssh_connect_sock(**ssh_config)
-    try:
+    # Using a ssh transport here, because we want agent forwarding.
+    # The transport is pooled and stays open for the next remote command.
+    with ssh_transport(ssh_config) as ssh_sock:
         stdout, stderr, rc = exec_ssh_sock_command(ssh_sock, command, agent_forward=True)
-        if rc != 0:
-            raise ValueError(f"Remote cloning repository exit with non-zero exit code: {rc}")
-        return stdout
-    finally:
-        ssh_sock.close()
+    if rc != 0:
+        raise ValueError(f"Remote cloning repository exit with non-zero exit code: {rc}")
+    return stdout
 
 
 def rgit_pull_head(working_dir: str, ssh_config, **kwargs) -> bytes:
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import posixpath
+import stat
+
+import paramiko
+
+# Name of the manifest file, which records the synced files in the remote directory
+SYNC_MANIFEST_FILE = ".kontainer-sync.json"
+
+
+def hash_file(path: str) -> str:
+    """
+    Get the SHA-256 hex digest of a file.
+
+    :param path: file path
+    :return: hex digest
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def build_manifest(local_dir: str, exclude=(".git",)) -> dict[str, dict]:
+    """
+    Build the content manifest of a local directory.
+    Symlinks are skipped.
+
+    :param local_dir: directory
+    :param exclude: names of files and directories to skip
+    :return: dict of relative posix path to dict with 'sha256', 'size' and 'mode'
+    """
+    manifest = {}
+    for root, dirs, files in os.walk(local_dir):
+        dirs[:] = sorted(d for d in dirs if d not in exclude and not os.path.islink(os.path.join(root, d)))
+        for name in sorted(files):
+            if name in exclude or name == SYNC_MANIFEST_FILE:
+                continue
+            path = os.path.join(root, name)
+            st = os.lstat(path)
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            rel_path = os.path.relpath(path, local_dir).replace(os.sep, "/")
+            manifest[rel_path] = {
+                "sha256": hash_file(path),
+                "size": st.st_size,
+                "mode": stat.S_IMODE(st.st_mode),
+            }
+    return manifest
+
+
+def diff_manifests(local: dict, remote: dict) -> tuple[list[str], list[str]]:
+    """
+    Compare a local and a remote manifest.
+
+    :param local: manifest of the local directory
+    :param remote: manifest of the last sync
+    :return: tuple of the changed or new paths and the deleted paths
+    """
+    changed = [path for path, entry in local.items()
+               if path not in remote or remote[path].get("sha256") != entry["sha256"]
+               or remote[path].get("mode") != entry["mode"]]
+    deleted = [path for path in remote.keys() if path not in local]
+    return changed, deleted
+
+
+def sftp_makedirs(sftp: paramiko.SFTPClient, remote_dir: str) -> None:
+    """
+    Create a remote directory and its parents, like `mkdir -p`.
+
+    :param sftp: SFTP client
+    :param remote_dir: absolute posix path
+    """
+    parts = [p for p in remote_dir.split("/") if p]
+    path = "/" if remote_dir.startswith("/") else ""
+    for part in parts:
+        path = posixpath.join(path, part) if path else part
+        try:
+            sftp.stat(path)
+        except FileNotFoundError:
+            sftp.mkdir(path)
+
+
+def read_remote_manifest(sftp: paramiko.SFTPClient, remote_dir: str) -> dict:
+    """
+    Read the manifest of the last sync.
+
+    :param sftp: SFTP client
+    :param remote_dir: remote directory
+    :return: manifest or an empty dict, if the directory was never synced
+    """
+    try:
+        with sftp.open(posixpath.join(remote_dir, SYNC_MANIFEST_FILE), "r") as f:
+            return json.loads(f.read()).get("files", {})
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def sftp_sync_dir(sftp: paramiko.SFTPClient, local_dir: str, remote_dir: str, delete=True) -> dict:
+    """
+    Sync a local directory to a remote directory with a content-hash delta transfer.
+
+    Only the files, which changed since the last sync according to the manifest
+    stored in the remote directory, are uploaded. Files are uploaded to a temporary name
+    and renamed into place. Files, which were synced before and do not exist locally
+    anymore, are deleted. Files created on the remote host are never touched.
+
+    :param sftp: SFTP client
+    :param local_dir: local directory
+    :param remote_dir: absolute remote directory
+    :param delete: If True, delete previously synced files, which do not exist locally anymore
+    :return: dict with the uploaded and deleted paths, the number of unchanged files and the uploaded bytes
+    """
+    local = build_manifest(local_dir)
+    sftp_makedirs(sftp, remote_dir)
+    remote = read_remote_manifest(sftp, remote_dir)
+    changed, deleted = diff_manifests(local, remote)
+    unchanged = len(local) - len(changed)
+
+    uploaded_bytes = 0
+    created_dirs = set()
+    for rel_path in changed:
+        remote_path = posixpath.join(remote_dir, rel_path)
+        parent = posixpath.dirname(remote_path)
+        if parent not in created_dirs:
+            sftp_makedirs(sftp, parent)
+            created_dirs.add(parent)
+
+        tmp_path = f"{remote_path}.kontainer-tmp"
+        sftp.put(os.path.join(local_dir, *rel_path.split("/")), tmp_path, confirm=False)
+        sftp.chmod(tmp_path, local[rel_path]["mode"])
+        sftp.posix_rename(tmp_path, remote_path)
+        uploaded_bytes += local[rel_path]["size"]
+
+    if delete:
+        for rel_path in deleted:
+            try:
+                sftp.remove(posixpath.join(remote_dir, rel_path))
+            except FileNotFoundError:
+                pass
+    else:
+        # Keep tracking the files, which were not deleted
+        local.update({path: remote[path] for path in deleted})
+
+    with sftp.open(posixpath.join(remote_dir, SYNC_MANIFEST_FILE), "w") as f:
+        f.write(json.dumps({"files": local}))
+
+    return {
+        "uploaded": changed,
+        "deleted": deleted if delete else [],
+        "unchanged": unchanged,
+        "bytes": uploaded_bytes,
+    }
@@ -0,0 +1,278 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import paramiko
+
+from kontainer import settings
+from kontainer.util.remote_utils import ssh_connect_sock
+
+
+class _PooledTransport:
+
+    def __init__(self, key: tuple, transport: paramiko.Transport):
+        self.key = key
+        self.transport = transport
+        self.created = time.monotonic()
+        self.last_used = self.created
+        # Number of sessions, which currently use the transport
+        self.in_use = 0
+
+
+class SSHTransportPool:
+    """
+    A thread-safe, fork-aware pool of SSH transports keyed by host, port, user and key file.
+
+    An SSH transport multiplexes any number of channels over one connection,
+    so each command, SFTP session or port forward opens a new channel on the pooled
+    transport instead of doing a full key exchange and authentication.
+
+    - Transports are kept alive with SSH keep-alive packets.
+    - Idle transports are closed after `idle_timeout` seconds. Transports with open sessions
+      (see `open_session` and `lease`) are never idle, however long a command runs.
+    - Dead transports are replaced on the next use.
+    - After a fork the child process starts with an empty pool.
+    """
+
+    def __init__(self, idle_timeout=None, keepalive_interval=None):
+        self.idle_timeout = settings.KONTAINER_SSH_POOL_IDLE_TIMEOUT \
+            if idle_timeout is None else idle_timeout
+        self.keepalive_interval = settings.KONTAINER_SSH_KEEPALIVE_INTERVAL \
+            if keepalive_interval is None else keepalive_interval
+
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._key_locks: dict[tuple, threading.Lock] = {}
+        self._entries: dict[tuple, _PooledTransport] = {}
+
+
+    @staticmethod
+    def make_key(hostname=None, username=None, port=22, private_key_file=None, **kwargs) -> tuple:
+        return hostname, int(port or 22), username, private_key_file
+
+
+    def get_transport(self, **ssh_config) -> paramiko.Transport:
+        """
+        Get a connected SSH transport for the ssh config.
+        Connects, if no active transport is pooled.
+        Use `lease` instead, if the transport is used longer than the idle timeout.
+
+        :param ssh_config: keyword arguments of `ssh_connect_sock`
+        :return: paramiko Transport
+        """
+        return self._get_entry(False, **ssh_config).transport
+
+
+    @contextmanager
+    def lease(self, **ssh_config):
+        """
+        Use the pooled SSH transport. The transport is not evicted, until the lease is released on exit.
+
+        :param ssh_config: keyword arguments of `ssh_connect_sock`
+        :return: paramiko Transport
+        """
+        entry = self._get_entry(True, **ssh_config)
+        try:
+            yield entry.transport
+        finally:
+            self._release(entry)
+
+
+    @contextmanager
+    def open_session(self, **ssh_config):
+        """
+        Open a new session channel on the pooled transport. The channel is closed on exit.
+        The transport is not evicted, while the channel is open.
+        Reconnects once, if the pooled transport was closed by the remote host.
+
+        :param ssh_config: keyword arguments of `ssh_connect_sock`
+        :return: paramiko Channel
+        """
+        entry = self._get_entry(True, **ssh_config)
+        try:
+            try:
+                channel = entry.transport.open_session()
+            except (paramiko.SSHException, EOFError, OSError) as e:
+                print(f"Pooled SSH transport to {ssh_config.get('hostname')} failed: {e}. Reconnecting.")
+                self._release(entry)
+                entry = None
+                self.discard(self.make_key(**ssh_config))
+                entry = self._get_entry(True, **ssh_config)
+                channel = entry.transport.open_session()
+
+            try:
+                yield channel
+            finally:
+                channel.close()
+        finally:
+            if entry is not None:
+                self._release(entry)
+
+
+    def _get_entry(self, acquire: bool, **ssh_config) -> _PooledTransport:
+        key = self.make_key(**ssh_config)
+        with self._lock:
+            self._check_fork()
+            self._evict_idle()
+            entry = self._entries.get(key)
+            if entry is not None and entry.transport.is_active():
+                return self._use(entry, acquire)
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Serialize connecting per key, so concurrent callers share one connection
+        with key_lock:
+            with self._lock:
+                current = self._entries.get(key)
+                if current is not None and current.transport.is_active():
+                    return self._use(current, acquire)
+            if current is not None:
+                self.discard(key)
+
+            transport = ssh_connect_sock(**ssh_config)
+            if self.keepalive_interval > 0:
+                transport.set_keepalive(self.keepalive_interval)
+            with self._lock:
+                entry = _PooledTransport(key, transport)
+                self._entries[key] = entry
+                return self._use(entry, acquire)
+
+
+    @staticmethod
+    def _use(entry: _PooledTransport, acquire: bool) -> _PooledTransport:
+        # Caller must hold self._lock
+        entry.last_used = time.monotonic()
+        if acquire:
+            entry.in_use += 1
+        return entry
+
+
+    def _release(self, entry: _PooledTransport) -> None:
+        with self._lock:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+
+
+    def discard(self, key: tuple) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._close(entry)
+
+
+    def clear(self) -> None:
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries = {}
+        for entry in entries:
+            self._close(entry)
+
+
+    def stats(self) -> list[dict]:
+        """
+        :return: list of dicts with the host, user, age, idle time and open sessions of each pooled transport
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                "host": entry.key[0],
+                "port": entry.key[1],
+                "username": entry.key[2],
+                "active": entry.transport.is_active(),
+                "age": round(now - entry.created, 3),
+                "idle": round(now - entry.last_used, 3),
+                "in_use": entry.in_use,
+            } for entry in self._entries.values()]
+
+
+    def _evict_idle(self) -> None:
+        # Caller must hold self._lock
+        if self.idle_timeout <= 0:
+            return
+
+        now = time.monotonic()
+        for key, entry in list(self._entries.items()):
+            idle = entry.in_use == 0 and now - entry.last_used > self.idle_timeout
+            if idle or not entry.transport.is_active():
+                del self._entries[key]
+                self._close(entry)
+
+
+    def _check_fork(self) -> None:
+        # Caller must hold self._lock
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+
+
+    def _reset_after_fork(self) -> None:
+        # Drop the inherited transports without closing them.
+        # The sockets still belong to the parent process.
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._entries = {}
+
+
+    @staticmethod
+    def _close(entry: _PooledTransport) -> None:
+        try:
+            entry.transport.close()
+        except Exception as e:
+            print(f"Error closing SSH transport to {entry.key[0]}: {e}")
+
+
+ssh_transport_pool = SSHTransportPool()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=ssh_transport_pool._reset_after_fork)
+
+
+def get_ssh_transport(**ssh_config) -> paramiko.Transport:
+    """
+    Get the pooled SSH transport for the ssh config.
+
+    :param ssh_config: keyword arguments of `ssh_connect_sock`
+    :return: paramiko Transport
+    """
+    return ssh_transport_pool.get_transport(**ssh_config)
+
+
+@contextmanager
+def ssh_session(ssh_config: dict):
+    """
+    Open a session channel on the pooled SSH transport. The channel is closed on exit,
+    the transport stays open for the next caller.
+
+    :param ssh_config: keyword arguments of `ssh_connect_sock`
+    :return: paramiko Channel
+    """
+    with ssh_transport_pool.open_session(**ssh_config) as channel:
+        yield channel
+
+
+@contextmanager
+def ssh_transport(ssh_config: dict):
+    """
+    Use the pooled SSH transport. The transport is not evicted while in use.
+
+    :param ssh_config: keyword arguments of `ssh_connect_sock`
+    :return: paramiko Transport
+    """
+    with ssh_transport_pool.lease(**ssh_config) as transport:
+        yield transport
+
+
+@contextmanager
+def ssh_sftp(ssh_config: dict):
+    """
+    Open an SFTP session on the pooled SSH transport.
+
+    :param ssh_config: keyword arguments of `ssh_connect_sock`
+    :return: paramiko SFTPClient
+    """
+    with ssh_transport_pool.lease(**ssh_config) as transport:
+        sftp = paramiko.SFTPClient.from_transport(transport)
+        try:
+            yield sftp
+        finally:
+            sftp.close()
@@ -1,5 +1,9 @@
 import os
+import selectors
+import signal
 import subprocess
+import threading
+import time
 
 import paramiko
 
@@ -56,3 +60,147 @@ def run_command(cmd: str | list):
         return e.output
 
 
+
+
+class CommandCancelledError(Exception):
+    """
+    Raised, if a running command was cancelled.
+    """
+    pass
+
+
+class OutputBuffer:
+    """
+    Keeps the last `max_bytes` of a command output stream
+    and passes each complete line to a callback.
+    """
+
+    def __init__(self, stream: str, max_bytes: int, on_line=None):
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.on_line = on_line
+        self.truncated = False
+        self._tail = bytearray()
+        self._partial = bytearray()
+
+    def feed(self, data: bytes) -> None:
+        self._tail += data
+        if len(self._tail) > self.max_bytes:
+            del self._tail[:len(self._tail) - self.max_bytes]
+            self.truncated = True
+
+        if self.on_line is None:
+            return
+        self._partial += data
+        *lines, rest = self._partial.split(b"\n")
+        for line in lines:
+            self.on_line(self.stream, bytes(line))
+        self._partial = bytearray(rest[-self.max_bytes:])
+
+    def close(self) -> bytes:
+        if self.on_line is not None and len(self._partial) > 0:
+            self.on_line(self.stream, bytes(self._partial))
+            self._partial = bytearray()
+        return bytes(self._tail)
+
+
+def kill_process_group(proc: subprocess.Popen, grace_period=5.0) -> None:
+    """
+    Terminate the process group of a process started with `start_new_session=True`.
+    The group is killed, if it did not exit within the grace period.
+
+    :param proc: process
+    :param grace_period: seconds to wait after SIGTERM
+    """
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    try:
+        proc.wait(timeout=grace_period)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        proc.wait()
+
+
+def run_command_streaming(cmd: list, cwd=None, env=None, on_line=None, max_output=None,
+                          timeout=None, cancel_event: threading.Event = None) -> tuple[bytes, bytes, int]:
+    """
+    Run a command and read stdout and stderr line by line while it runs.
+
+    The command runs in its own process group. The whole group is terminated,
+    if the command is cancelled, times out, or the calling process receives SIGTERM
+    (e.g. a celery task revoked with terminate=True). On SIGTERM, the previous
+    signal handler is invoked after the process group was terminated.
+
+    :param cmd: command and arguments
+    :param cwd: working directory
+    :param env: environment variables
+    :param on_line: Callable(stream, line), which receives each output line. Stream is 'stdout' or 'stderr'.
+    :param max_output: Max. number of bytes kept per stream.
+    :param timeout: Max. seconds until the command must have exited.
+    :param cancel_event: Event, which cancels the command when set
+    :return: Tuple of (stdout, stderr, exit_code).
+    :raises CommandCancelledError: if the command was cancelled
+    :raises TimeoutError: if the timeout expired
+    """
+    if max_output is None:
+        max_output = 1024 * 1024
+
+    buffers = {
+        "stdout": OutputBuffer("stdout", max_output, on_line),
+        "stderr": OutputBuffer("stderr", max_output, on_line),
+    }
+
+    proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdin=subprocess.DEVNULL,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+
+    # Signal handlers can only be installed in the main thread
+    handle_sigterm = threading.current_thread() is threading.main_thread()
+    previous_handler = signal.SIG_DFL
+    if handle_sigterm:
+        def _on_sigterm(signum, frame):
+            kill_process_group(proc)
+            signal.signal(signal.SIGTERM, previous_handler)
+            if callable(previous_handler):
+                previous_handler(signum, frame)
+            elif previous_handler == signal.SIG_DFL:
+                os.kill(os.getpid(), signum)
+            raise CommandCancelledError(f"Command cancelled by signal {signum}")
+
+        # None, if the previous handler was not installed from python
+        previous_handler = signal.signal(signal.SIGTERM, _on_sigterm) or signal.SIG_DFL
+
+    selector = selectors.DefaultSelector()
+    selector.register(proc.stdout, selectors.EVENT_READ, "stdout")
+    selector.register(proc.stderr, selectors.EVENT_READ, "stderr")
+    start = time.monotonic()
+    try:
+        while len(selector.get_map()) > 0:
+            for key, _ in selector.select(timeout=0.5):
+                data = os.read(key.fileobj.fileno(), 32768)
+                if not data:
+                    selector.unregister(key.fileobj)
+                    continue
+                buffers[key.data].feed(data)
+
+            if cancel_event is not None and cancel_event.is_set():
+                raise CommandCancelledError("Command cancelled")
+            if timeout is not None and time.monotonic() - start > timeout:
+                raise TimeoutError(f"Command timed out after {timeout} seconds")
+
+        exit_code = proc.wait()
+    except BaseException:
+        kill_process_group(proc)
+        raise
+    finally:
+        selector.close()
+        proc.stdout.close()
+        proc.stderr.close()
+        if handle_sigterm:
+            signal.signal(signal.SIGTERM, previous_handler)
+
+    return buffers["stdout"].close(), buffers["stderr"].close(), exit_code
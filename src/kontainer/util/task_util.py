@@ -0,0 +1,44 @@
+import collections
+import time
+
+from celery import current_task
+
+from kontainer import settings
+
+
+def task_progress_callback(task=None, max_lines=None, interval=1.0):
+    """
+    Create an output line callback, which reports the last output lines as
+    PROGRESS state of a celery task.
+
+    State updates are throttled to one per `interval` seconds.
+
+    :param task: celery task. Defaults to the task currently executed by this worker.
+    :param max_lines: number of lines reported in the progress meta
+    :param interval: min. seconds between state updates
+    :return: Callable(stream, line) or None, if not called from within a celery task
+    """
+    if task is None:
+        task = current_task
+    if not task or task.request.id is None:
+        return None
+
+    if max_lines is None:
+        max_lines = settings.KONTAINER_TASK_PROGRESS_LINES
+
+    lines = collections.deque(maxlen=max_lines)
+    state = {"updated": 0.0, "count": 0}
+
+    def on_line(stream: str, line: bytes) -> None:
+        lines.append(line.decode("utf-8", errors="replace"))
+        state["count"] += 1
+        now = time.monotonic()
+        if now - state["updated"] < interval:
+            return
+        state["updated"] = now
+        try:
+            task.update_state(state='PROGRESS', meta={'lines': list(lines), 'total_lines': state["count"]})
+        except Exception as e:
+            print(f"Failed to update task progress: {e}")
+
+    return on_line
@@ -0,0 +1,32 @@
+def compose_container(container_id, project="app", service=None, state="running", name=None, depends_on=None,
+                      config_hash=None, working_dir=None, oneoff=False, **attrs) -> dict:
+    """
+    Create the attrs of a container with docker compose labels, as listed by the docker API.
+
+    :param container_id: container id
+    :param project: compose project. No compose labels are set, if None.
+    :param service: compose service
+    :param state: container state
+    :param name: container name. Defaults to the container id.
+    :param depends_on: value of the compose depends_on label, e.g. 'db:service_healthy:false'
+    :param config_hash: value of the compose config-hash label
+    :param working_dir: value of the compose project working_dir label
+    :param oneoff: If True, label the container as one-off container (compose run)
+    :param attrs: additional container attrs
+    :return: container attrs
+    """
+    labels = {}
+    if project:
+        labels['com.docker.compose.project'] = project
+        if working_dir:
+            labels['com.docker.compose.project.working_dir'] = working_dir
+        if service:
+            labels['com.docker.compose.service'] = service
+        if depends_on:
+            labels['com.docker.compose.depends_on'] = depends_on
+        if config_hash:
+            labels['com.docker.compose.config-hash'] = config_hash
+        if oneoff:
+            labels['com.docker.compose.oneoff'] = 'True'
+    return {'Id': container_id, 'Names': [f'/{name or container_id}'], 'State': state, 'Status': state,
+            'Labels': labels, **attrs}
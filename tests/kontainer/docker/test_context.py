@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from kontainer import settings
+from kontainer.docker.context import get_context_ssh_config
+
+
+class TestGetContextSshConfig(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.home = self.tmp_dir.name
+        os.makedirs(os.path.join(self.home, ".ssh"))
+        self.config_file = os.path.join(self.home, ".ssh", "config")
+        self.env = mock.patch.dict(os.environ, {"HOME": self.home}, clear=False)
+        self.env.start()
+        os.environ.pop("SSH_AUTH_SOCK", None)
+        self.setting = mock.patch.object(settings, "KONTAINER_SSH_CONFIG_FILE", self.config_file)
+        self.setting.start()
+
+    def tearDown(self):
+        self.setting.stop()
+        self.env.stop()
+        self.tmp_dir.cleanup()
+
+    def test_not_ssh(self):
+        self.assertIsNone(get_context_ssh_config({"id": "local", "host": "unix:///var/run/docker.sock"}))
+
+    def test_ssh_config_file(self):
+        key_file = os.path.join(self.home, "deploy_key")
+        open(key_file, "w").close()
+        with open(self.config_file, "w") as f:
+            f.write(f"Host docker1\n  HostName 10.0.0.1\n  User deploy\n  Port 2222\n  IdentityFile {key_file}\n")
+
+        self.assertEqual({"hostname": "10.0.0.1", "port": 2222, "username": "deploy", "private_key_file": key_file},
+                         get_context_ssh_config({"id": "prod", "host": "ssh://docker1"}))
+
+    def test_default_key(self):
+        key_file = os.path.join(self.home, ".ssh", "id_ed25519")
+        open(key_file, "w").close()
+        ssh_config = get_context_ssh_config({"id": "prod", "host": "ssh://root@docker1:2200"})
+        self.assertEqual({"hostname": "docker1", "port": 2200, "username": "root", "private_key_file": key_file},
+                         ssh_config)
+
+    def test_agent(self):
+        with mock.patch.dict(os.environ, {"SSH_AUTH_SOCK": "/tmp/agent.sock"}):
+            ssh_config = get_context_ssh_config({"id": "prod", "host": "ssh://root@docker1"})
+        self.assertNotIn("private_key_file", ssh_config)
+
+    def test_no_credentials(self):
+        with self.assertRaisesRegex(ValueError, "Configure 'ssh_config' for context prod"):
+            get_context_ssh_config({"id": "prod", "host": "ssh://root@docker1"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,24 @@
+import time
+import unittest
+
+from kontainer.docker.events import DockerEventsBuffer
+
+
+class TestDockerEventsBuffer(unittest.TestCase):
+
+    def test_stopped_buffer_is_closed(self):
+        events_buffer = DockerEventsBuffer("missing", capacity=10)
+        events_buffer.stop()
+
+        start = time.monotonic()
+        events, cursor, gap = events_buffer.read(None, timeout=5)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual([], events)
+        self.assertTrue(events_buffer.closed)
+
+        events_buffer.ensure_started()
+        self.assertIsNone(events_buffer._thread)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+from unittest import TestCase
+
+from kontainer.docker.filters import match_container, match_volume, match_labels
+from kontainer.server.listing import paginate, project_fields
+
+
+class TestDockerFilters(TestCase):
+
+    summary = {
+        "Id": "abc123",
+        "Names": ["/web-1"],
+        "Image": "nginx:latest",
+        "ImageID": "sha256:deadbeef",
+        "State": "running",
+        "Labels": {"com.docker.compose.project": "demo"},
+    }
+
+    def test_match_labels(self):
+        labels = {"a": "1", "b": "2"}
+        self.assertTrue(match_labels(labels, ["a"]))
+        self.assertTrue(match_labels(labels, ["a=1", "b=2"]))
+        self.assertFalse(match_labels(labels, ["a=2"]))
+        self.assertFalse(match_labels(None, ["a"]))
+
+    def test_match_container(self):
+        self.assertTrue(match_container(self.summary, {}))
+        self.assertTrue(match_container(self.summary, {"label": ["com.docker.compose.project=demo"]}))
+        self.assertTrue(match_container(self.summary, {"status": ["exited", "running"]}))
+        self.assertFalse(match_container(self.summary, {"status": ["exited"]}))
+        self.assertTrue(match_container(self.summary, {"name": ["^web"]}))
+        self.assertTrue(match_container(self.summary, {"ancestor": ["nginx"]}))
+        self.assertTrue(match_container(self.summary, {"ancestor": ["deadbeef"]}))
+        self.assertFalse(match_container(self.summary, {"ancestor": ["redis"]}))
+
+    def test_match_container_inspect_format(self):
+        attrs = {
+            "Id": "abc123",
+            "Name": "/web-1",
+            "State": {"Status": "exited"},
+            "Config": {"Image": "nginx:latest", "Labels": {"tier": "frontend"}},
+            "Image": "sha256:deadbeef",
+        }
+        self.assertTrue(match_container(attrs, {"status": ["exited"], "label": ["tier"], "name": ["web"]}))
+        self.assertTrue(match_container(attrs, {"ancestor": ["nginx"]}))
+
+    def test_match_volume_dangling(self):
+        volume = {"Name": "data", "Labels": None}
+        self.assertTrue(match_volume(volume, {"dangling": ["true"]}, used_volumes=set()))
+        self.assertFalse(match_volume(volume, {"dangling": ["true"]}, used_volumes={"data"}))
+
+
+class TestListing(TestCase):
+
+    def test_paginate(self):
+        items = [{"Id": i} for i in ["c", "a", "d", "b"]]
+        page, cursor = paginate(items, "Id", limit=2)
+        self.assertEqual(["a", "b"], [i["Id"] for i in page])
+        self.assertEqual("b", cursor)
+
+        page, cursor = paginate(items, "Id", cursor=cursor, limit=2)
+        self.assertEqual(["c", "d"], [i["Id"] for i in page])
+        self.assertIsNone(cursor)
+
+    def test_project_fields(self):
+        item = {
+            "Id": "abc",
+            "State": {"Status": "running", "Pid": 1},
+            "Labels": {"com.docker.compose.project": "demo", "other": "x"},
+        }
+        projected = project_fields(item, ["Id", "State.Status", "Labels.com.docker.compose.project", "Missing"])
+        self.assertEqual({
+            "Id": "abc",
+            "State": {"Status": "running"},
+            "Labels": {"com.docker.compose.project": "demo"},
+        }, projected)
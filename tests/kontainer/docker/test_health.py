@@ -0,0 +1,35 @@
+import time
+import unittest
+
+from kontainer.docker.health import CircuitBreaker
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        self.assertFalse(breaker.before_request())
+        breaker.record_failure("down")
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure("down")
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertIsNone(breaker.before_request())
+        self.assertGreater(breaker.retry_after(), 0)
+
+    def test_half_open_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure("down")
+        time.sleep(0.1)
+        self.assertTrue(breaker.before_request())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        # Only a single probe passes
+        self.assertIsNone(breaker.before_request())
+
+        breaker.record_failure("still down")
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        time.sleep(0.1)
+        self.assertTrue(breaker.before_request())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertFalse(breaker.before_request())
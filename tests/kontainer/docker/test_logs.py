@@ -0,0 +1,42 @@
+import unittest
+
+from kontainer.docker.logs import iter_log_lines, split_log_timestamp, MergedLogReader
+
+
+class _Stream(list):
+
+    def close(self):
+        pass
+
+
+class TestIterLogLines(unittest.TestCase):
+
+    def test_split_chunks(self):
+        chunks = [b"line 1\nli", b"ne 2\r\n", b"line 3"]
+        self.assertEqual(list(iter_log_lines(chunks)), [b"line 1", b"line 2", b"line 3"])
+
+    def test_max_line_length(self):
+        chunks = [b"a" * 10, b"a" * 5 + b"\nb"]
+        self.assertEqual(list(iter_log_lines(chunks, max_line_length=8)),
+                         [b"a" * 8, b"a" * 7, b"b"])
+
+
+class TestMergedLogReader(unittest.TestCase):
+
+    def test_split_log_timestamp(self):
+        key, message = split_log_timestamp(b"2024-01-01T00:00:00.1Z hello")
+        self.assertEqual(key, "2024-01-01T00:00:00.100000000Z")
+        self.assertEqual(message, b"hello")
+        self.assertEqual(split_log_timestamp(b"hello"), (None, b"hello"))
+
+    def test_merge_by_timestamp(self):
+        reader = MergedLogReader({
+            "web": _Stream([b"2024-01-01T00:00:01.5Z a\n2024-01-01T00:00:03Z b\n"]),
+            "db": _Stream([b"2024-01-01T00:00:01.25Z c\n2024-01-01T00:00:02Z d\n"]),
+        }, timestamps=False)
+        lines = list(reader.iter_lines())
+        self.assertEqual(lines, [b"db  | c", b"web | a", b"db  | d", b"web | b"])
+
+
+if __name__ == '__main__':
+    unittest.main()
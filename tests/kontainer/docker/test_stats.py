@@ -0,0 +1,25 @@
+import unittest
+
+from kontainer.docker.stats import RingBuffer, aggregate_series
+
+
+class TestRingBuffer(unittest.TestCase):
+
+    def test_wraparound(self):
+        buffer = RingBuffer(3, ("a", "b"))
+        self.assertEqual(buffer.nbytes, 3 * 3 * 8)
+        for i in range(5):
+            buffer.append(float(i), (i, i * 10))
+
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(buffer.items(), [(2.0, (2.0, 20.0)), (3.0, (3.0, 30.0)), (4.0, (4.0, 40.0))])
+        self.assertEqual(buffer.items(since=3.0), [(4.0, (4.0, 40.0))])
+        self.assertEqual(buffer.last(), (4.0, (4.0, 40.0)))
+
+    def test_aggregate_series(self):
+        result = aggregate_series([[(1.0, (1.0, 2.0)), (2.0, (1.0, 1.0))], [(2.0, (3.0, 4.0))]])
+        self.assertEqual(result, [(1.0, (1.0, 2.0)), (2.0, (4.0, 5.0))])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+from kontainer.docker.util import index_volume_mounts, order_containers_by_dependencies, \
+    count_containers_by_state, get_compose_project_states
+
+from tests.kontainer.compose_containers import compose_container
+
+
+class TestIndexVolumeMounts(unittest.TestCase):
+
+    def test_index(self):
+        containers = [
+            {'Id': 'a', 'Names': ['/web'], 'Mounts': [{'Type': 'volume', 'Name': 'data'},
+                                                     {'Type': 'bind', 'Source': '/tmp'}]},
+            {'Id': 'b', 'Name': '/db', 'Mounts': [{'Type': 'volume', 'Name': 'data'},
+                                                 {'Type': 'volume', 'Name': 'db'}]},
+            {'Id': 'c', 'Names': ['/idle'], 'Mounts': None},
+        ]
+        index = index_volume_mounts(containers)
+        self.assertEqual(index, {'data': ['web', 'db'], 'db': ['db']})
+
+
+class TestOrderContainersByDependencies(unittest.TestCase):
+
+    def test_batches(self):
+        containers = [
+            compose_container('1', service='web', depends_on='api:service_healthy:false'),
+            compose_container('2', service='api', depends_on='db:service_started:false,cache:service_started:false'),
+            compose_container('3', service='db'),
+            {'Id': '4', 'Labels': {}},
+        ]
+        batches = order_containers_by_dependencies(containers)
+        self.assertEqual([[c['Id'] for c in b] for b in batches], [['4', '3'], ['2'], ['1']])
+
+    def test_circular_dependencies(self):
+        containers = [
+            compose_container('1', service='a', depends_on='b:service_started:false'),
+            compose_container('2', service='b', depends_on='a:service_started:false'),
+        ]
+        batches = order_containers_by_dependencies(containers)
+        self.assertEqual([[c['Id'] for c in b] for b in batches], [['1', '2']])
+
+
+class TestContainerSummaries(unittest.TestCase):
+
+    containers = [
+        {'Id': 'a', 'State': 'running', 'Labels': {'com.docker.compose.project': 'app'}},
+        {'Id': 'b', 'State': 'exited', 'Labels': {'com.docker.compose.project': 'app'}},
+        {'Id': 'c', 'State': {'Status': 'exited'}, 'Config': {'Labels': {'com.docker.compose.project': 'db'}}},
+        {'Id': 'd', 'State': 'paused', 'Labels': None},
+    ]
+
+    def test_count_containers_by_state(self):
+        self.assertEqual(count_containers_by_state(self.containers), {'running': 1, 'exited': 2, 'paused': 1})
+
+    def test_get_compose_project_states(self):
+        self.assertEqual(get_compose_project_states(self.containers), {'app': True, 'db': False})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+import os
+import tempfile
+import unittest
+
+from kontainer.docker.volumesize import scan_directory_size
+
+
+class TestScanDirectorySize(unittest.TestCase):
+
+    def test_hardlinks_counted_once(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.makedirs(os.path.join(tmpdir, "sub"))
+            with open(os.path.join(tmpdir, "sub", "data"), "wb") as f:
+                f.write(os.urandom(64 * 1024))
+            size = scan_directory_size(tmpdir)
+            self.assertGreaterEqual(size, 64)
+
+            os.link(os.path.join(tmpdir, "sub", "data"), os.path.join(tmpdir, "link"))
+            self.assertEqual(scan_directory_size(tmpdir), size)
+
+    def test_missing_directory(self):
+        with self.assertRaises(OSError):
+            scan_directory_size("/nonexistent/volume")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import socket
+import threading
+import unittest
+from contextlib import contextmanager
+from unittest import mock
+
+from kontainer.environments.fanout import run_fanout, _run_on_context
+
+CONTEXTS = [
+    {"id": "ok", "host": "ssh://ok", "ssh_config": {"hostname": "ok", "username": "deploy"}},
+    {"id": "failed", "host": "ssh://failed", "ssh_config": {"hostname": "failed", "username": "deploy"}},
+    {"id": "slow", "host": "ssh://slow", "ssh_config": {"hostname": "slow", "username": "deploy"}},
+    {"id": "local", "host": "unix:///var/run/docker.sock"},
+]
+
+
+@contextmanager
+def _ssh_session(ssh_config):
+    yield ssh_config["hostname"]
+
+
+def _exec(session, command, on_line=None, **kwargs):
+    if session == "slow":
+        raise socket.timeout("Command timed out after 1 seconds")
+    on_line("stdout", session.encode())
+    return session.encode() + b"\n", b"", 0 if session == "ok" else 2
+
+
+class TestFanout(unittest.TestCase):
+
+    def setUp(self):
+        self.patches = [mock.patch("kontainer.environments.fanout.ssh_session", _ssh_session),
+                        mock.patch("kontainer.environments.fanout.exec_ssh_channel_command", side_effect=_exec)]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def test_run_fanout(self):
+        lines = []
+        results = []
+        summary = run_fanout(CONTEXTS, "hostname", max_workers=2,
+                             on_output=lambda ctx_id, stream, line: lines.append((ctx_id, line)),
+                             on_result=results.append)
+
+        self.assertEqual(4, summary["total"])
+        self.assertEqual(1, summary["succeeded"])
+        self.assertEqual(3, summary["failed"])
+        self.assertEqual(["ok", "failed", "slow", "local"], [r["id"] for r in summary["results"]])
+        self.assertEqual({"ok", "failed", "slow", "local"}, {r["id"] for r in results})
+        self.assertIn(("ok", b"ok"), lines)
+
+        by_id = {r["id"]: r for r in summary["results"]}
+        self.assertEqual(("ok", 0, "ok\n"), (by_id["ok"]["status"], by_id["ok"]["exit_code"], by_id["ok"]["stdout"]))
+        self.assertEqual(("failed", 2), (by_id["failed"]["status"], by_id["failed"]["exit_code"]))
+
+    def test_timeout(self):
+        result = _run_on_context(CONTEXTS[2], "sleep 10", timeout=1)
+        self.assertEqual("timeout", result["status"])
+        self.assertIn("timed out", result["error"])
+
+    def test_context_without_ssh(self):
+        result = _run_on_context(CONTEXTS[3], "hostname")
+        self.assertEqual("error", result["status"])
+        self.assertEqual("Context is not reachable via SSH", result["error"])
+
+    def test_cancelled(self):
+        cancel_event = threading.Event()
+        cancel_event.set()
+        result = _run_on_context(CONTEXTS[0], "hostname", cancel_event=cancel_event)
+        self.assertEqual("cancelled", result["status"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+
+from flask import Flask
+
+from kontainer.server.streaming import log_stream_response
+
+
+class _Reader:
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.error = None
+        self.closed = False
+
+    def iter_lines(self, idle_timeout=None):
+        yield from self.lines
+
+    def close(self):
+        self.closed = True
+
+
+class TestLogStreamResponse(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+
+    def _body(self, reader, fmt, **kwargs):
+        with self.app.test_request_context():
+            return b"".join(log_stream_response(reader, fmt, **kwargs).response)
+
+    def test_text(self):
+        reader = _Reader([b"one", None, b"", b"two"])
+        self.assertEqual(b"one\n\ntwo\n", self._body(reader, "text"))
+        self.assertTrue(reader.closed)
+
+    def test_text_keepalive(self):
+        self.assertEqual(b"one\n\n\ntwo\n", self._body(_Reader([b"one", None, b"", b"two"]), "text",
+                                                     text_keepalive=True))
+
+    def test_sse(self):
+        body = self._body(_Reader([b"one", None]), "sse")
+        self.assertEqual(b"data: one\n\n: keep-alive\n\nevent: end\ndata: \n\n", body)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+
+from kontainer.stacks.drift import parse_config_hashes, plan_stack, compute_build_hashes, hash_build_context, \
+    read_dockerignore, is_dockerignored
+
+from tests.kontainer.compose_containers import compose_container
+
+
+class TestPlanStack(unittest.TestCase):
+
+    def test_parse_config_hashes(self):
+        self.assertEqual(parse_config_hashes(b"web abc\ndb def\n\n"), {'web': 'abc', 'db': 'def'})
+
+    def test_plan(self):
+        config_hashes = {'web': 'h1', 'db': 'h2', 'cache': 'h3', 'worker': 'h4'}
+        containers = [
+            compose_container('app-web-1', service='web', config_hash='old'),
+            compose_container('app-db-1', service='db', config_hash='h2'),
+            compose_container('app-worker-1', service='worker', config_hash='h4', state='exited'),
+            compose_container('app-legacy-1', service='legacy', config_hash='h5'),
+        ]
+        plan = plan_stack(config_hashes, containers)
+        actions = {s['service']: s['action'] for s in plan['services']}
+        self.assertEqual(actions, {'web': 'recreate', 'db': 'noop', 'cache': 'create', 'worker': 'start'})
+        self.assertEqual(plan['orphans'], ['app-legacy-1'])
+        self.assertTrue(plan['changed'])
+
+    def test_up_to_date(self):
+        plan = plan_stack({'db': 'h2'}, [compose_container('app-db-1', service='db', config_hash='h2')])
+        self.assertFalse(plan['changed'])
+
+    def test_build_inputs(self):
+        with tempfile.TemporaryDirectory() as working_dir:
+            os.makedirs(os.path.join(working_dir, 'web'))
+            with open(os.path.join(working_dir, 'web', 'Dockerfile'), 'w') as f:
+                f.write("FROM nginx\n")
+            compose = {'services': {'web': {'build': './web'}, 'db': {'image': 'postgres'}}}
+
+            build_hashes = compute_build_hashes(compose, working_dir)
+            self.assertEqual(list(build_hashes.keys()), ['web'])
+            containers = [compose_container('app-web-1', service='web', config_hash='h1')]
+
+            plan = plan_stack({'web': 'h1'}, containers, build_hashes, dict(build_hashes))
+            self.assertFalse(plan['changed'])
+
+            with open(os.path.join(working_dir, 'web', 'index.html'), 'w') as f:
+                f.write("hello")
+            plan = plan_stack({'web': 'h1'}, containers, compute_build_hashes(compose, working_dir), build_hashes)
+            self.assertEqual(plan['build'], ['web'])
+            self.assertEqual(plan['services'][0]['action'], 'recreate')
+
+    def test_dockerignore(self):
+        with tempfile.TemporaryDirectory() as context_dir:
+            with open(os.path.join(context_dir, '.dockerignore'), 'w') as f:
+                f.write("# runtime data\ndata\n**/*.log\n!keep.log\n")
+            rules = read_dockerignore(context_dir)
+            self.assertTrue(is_dockerignored('data', rules))
+            self.assertTrue(is_dockerignored('data/db/file', rules))
+            self.assertTrue(is_dockerignored('logs/app.log', rules))
+            self.assertTrue(is_dockerignored('app.log', rules))
+            self.assertFalse(is_dockerignored('keep.log', rules))
+            self.assertFalse(is_dockerignored('database.txt', rules))
+
+            with open(os.path.join(context_dir, 'Dockerfile'), 'w') as f:
+                f.write("FROM nginx\n")
+            build_hash = hash_build_context(context_dir)
+
+            os.makedirs(os.path.join(context_dir, 'data'))
+            with open(os.path.join(context_dir, 'data', 'db'), 'w') as f:
+                f.write("runtime")
+            self.assertEqual(build_hash, hash_build_context(context_dir))
+
+            with open(os.path.join(context_dir, 'keep.log'), 'w') as f:
+                f.write("keep")
+            self.assertNotEqual(build_hash, hash_build_context(context_dir))
@@ -0,0 +1,100 @@
+import unittest
+
+from kontainer.stacks.engine import NativeComposeEngine
+
+from tests.kontainer.compose_containers import compose_container
+
+
+def _container(cid, service, state, **kwargs):
+    return compose_container(cid, 'web', service, state, name=f'web-{cid}', Image='nginx', **kwargs)
+
+
+class _API:
+
+    def __init__(self, containers):
+        self._containers = containers
+        self.calls = []
+
+    def containers(self, all=False, filters=None):
+        return list(self._containers)
+
+    def networks(self, filters=None):
+        return [{'Id': 'n1', 'Name': 'web_default'}]
+
+    def __getattr__(self, name):
+        def _call(key, **kwargs):
+            self.calls.append((name, key))
+        return _call
+
+
+class _Client:
+
+    def __init__(self, containers):
+        self.api = _API(containers)
+
+
+class _DockerManager:
+
+    def __init__(self, containers, health=None):
+        self.client = _Client(containers)
+        self.health = health or {}
+
+    def wait_containers_healthy(self, container_ids, timeout):
+        self.client.api.calls.append(('wait_healthy', tuple(container_ids)))
+        return {container_id: self.health.get(container_id, 'starting') for container_id in container_ids}
+
+
+class TestNativeComposeEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.dkr = _DockerManager([
+            _container('app', 'app', 'running', depends_on='db:service_healthy:false'),
+            _container('db', 'db', 'running'),
+            _container('cache', 'cache', 'exited'),
+            _container('run', 'app', 'exited', oneoff=True),
+        ])
+        self.client = self.dkr.client
+        self.engine = NativeComposeEngine(self.dkr, 'web', max_workers=1)
+
+    def test_start_in_dependency_order(self):
+        self.engine.start()
+        self.assertEqual([('start', 'cache')], self.client.api.calls)
+
+    def test_start_waits_for_healthy_dependencies(self):
+        dkr = _DockerManager([
+            _container('app', 'app', 'exited', depends_on='db:service_healthy:false'),
+            _container('db', 'db', 'exited'),
+        ], health={'db': 'healthy'})
+        NativeComposeEngine(dkr, 'web', max_workers=1).start()
+        self.assertEqual([('start', 'db'), ('wait_healthy', ('db',)), ('start', 'app')], dkr.client.api.calls)
+
+    def test_start_fails_on_unhealthy_dependency(self):
+        dkr = _DockerManager([
+            _container('app', 'app', 'exited', depends_on='db:service_healthy:false'),
+            _container('db', 'db', 'exited'),
+        ], health={'db': 'unhealthy'})
+        with self.assertRaises(Exception):
+            NativeComposeEngine(dkr, 'web', max_workers=1).start()
+        self.assertNotIn(('start', 'app'), dkr.client.api.calls)
+
+    def test_stop_in_reverse_dependency_order(self):
+        out = self.engine.stop(timeout=3)
+        self.assertEqual([('stop', 'app'), ('stop', 'db')], self.client.api.calls)
+        self.assertIn(b" Container web-app  Stopped\n", out)
+
+    def test_down(self):
+        self.engine.down()
+        calls = self.client.api.calls
+        self.assertEqual({('remove_container', cid) for cid in ('app', 'db', 'cache', 'run')},
+                         set(c for c in calls if c[0] == 'remove_container'))
+        self.assertLess(calls.index(('remove_container', 'app')), calls.index(('stop', 'db')))
+        self.assertEqual(('remove_network', 'n1'), calls[-1])
+
+    def test_ps(self):
+        lines = self.engine.ps().decode().splitlines()
+        self.assertEqual(["NAME", "IMAGE", "SERVICE", "STATUS"], lines[0].split())
+        self.assertEqual(["web-app", "web-db"], [line.split()[0] for line in lines[1:]])
+
+
+if __name__ == '__main__':
+    unittest.main()
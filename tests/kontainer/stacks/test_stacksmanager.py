@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from kontainer.stacks.stacksmanager import StacksManager
+
+
+class TestStacksManagerEnumerate(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.stacks_dir = os.path.join(self.tmp_dir.name, "stacks", "local")
+        os.makedirs(self.stacks_dir)
+        self.patches = [mock.patch("kontainer.stacks.stacksmanager.KONTAINER_DATA_DIR", self.tmp_dir.name),
+                        mock.patch("kontainer.settings.KONTAINER_DATA_DIR", self.tmp_dir.name),
+                        mock.patch("kontainer.stacks.stacksmanager.use_metastore", return_value=False),
+                        mock.patch("kontainer.stacks.use_metastore", return_value=False),
+                        mock.patch("kontainer.stacks.dockerstacks.get_docker_manager_cached")]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.tmp_dir.cleanup()
+
+    def _write(self, name, config):
+        with open(os.path.join(self.stacks_dir, f"{name}.stack.json"), "w") as f:
+            json.dump(config, f)
+
+    def test_add_in_same_tick(self):
+        manager = StacksManager("local")
+        self._write("web", {"name": "web"})
+        # The directory mtime did not change since the last listing
+        manager._stacks_dir_mtime = os.stat(self.stacks_dir).st_mtime_ns
+
+        manager.enumerate()
+        self.assertEqual(["web"], [s.name for s in manager.list_all()])
+
+    def test_add_remove(self):
+        self._write("web", {"name": "web"})
+        manager = StacksManager("local")
+        self.assertEqual(["web"], [s.name for s in manager.list_all()])
+
+        self._write("db", {"name": "db"})
+        os.remove(os.path.join(self.stacks_dir, "web.stack.json"))
+        manager.enumerate()
+        self.assertEqual(["db"], [s.name for s in manager.list_all()])
+
+    def test_modify(self):
+        self._write("web", {"name": "web"})
+        manager = StacksManager("local")
+        stack = manager.get("web")
+        self.assertEqual({"name": "web"}, stack.config)
+
+        self._write("web", {"name": "web", "modified": True})
+        # Listing is not needed to detect modified stack files
+        manager._stacks_dir_listed_at = os.stat(self.stacks_dir).st_mtime_ns + 10_000_000_000
+        manager.enumerate()
+        self.assertIs(stack, manager.get("web"))
+        self.assertEqual({"name": "web", "modified": True}, stack.config)
+
+    def test_prune_unmanaged(self):
+        self._write("web", {"name": "web"})
+        manager = StacksManager("local")
+        legacy = manager.get_or_unmanaged("legacy")
+        self.assertFalse(legacy.managed)
+        self.assertIs(legacy, manager.get("legacy"))
+
+        manager.enumerate()
+        self.assertIsNone(manager.get("legacy"))
+        self.assertIsNotNone(manager.get("web"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+
+from kontainer.stacks.status import build_stack_list
+
+from tests.kontainer.compose_containers import compose_container
+
+
+class _Stack:
+
+    def __init__(self, name):
+        self.name = name
+
+    def serialize(self):
+        return {"ctx_id": "local", "name": self.name, "project_dir": f"stacks/local/{self.name}",
+                "managed": True, "config": {}}
+
+
+class TestBuildStackList(unittest.TestCase):
+
+    def test_build_stack_list(self):
+        containers = [
+            compose_container('web-1', 'web', working_dir='/srv/web'),
+            compose_container('web-2', 'web', state='exited', working_dir='/srv/web'),
+            compose_container('legacy-1', 'legacy', state='exited', working_dir='/srv/legacy'),
+            compose_container('solo', None),
+        ]
+        stacks = build_stack_list("local", [_Stack("web"), _Stack("new")], containers)
+        by_name = {s['name']: s for s in stacks}
+
+        self.assertEqual(list(by_name.keys()), ['web', 'new', 'legacy'])
+        self.assertEqual(by_name['web']['status'], 'running')
+        self.assertEqual(by_name['web']['counts'], {'total': 2, 'running': 1, 'exited': 1})
+        self.assertEqual(by_name['new']['status'], 'created')
+        self.assertEqual(by_name['legacy']['status'], 'idle')
+        self.assertFalse(by_name['legacy']['managed'])
+        self.assertEqual(by_name['legacy']['project_dir'], '/srv/legacy')
@@ -0,0 +1,91 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+from kontainer.util.metastore import MetaStore
+
+
+def _add_contexts(db_file, prefix, n):
+    store = MetaStore(db_file)
+    for i in range(n):
+        store.update_contexts(lambda contexts: contexts + [{"id": f"{prefix}-{i}", "host": "ssh://docker"}])
+
+
+class TestMetaStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = self.tmp_dir.name
+        self.db_file = os.path.join(self.data_dir, "kontainer.db")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_stacks(self):
+        store = MetaStore(self.db_file)
+        self.assertIsNone(store.get_stack("local", "web"))
+
+        store.put_stack("local", "web", {"name": "web"})
+        store.put_stack("local", "web", {"name": "web", "type": "docker-compose"})
+        store.put_stack("remote", "db", {"name": "db"})
+        self.assertEqual({"name": "web", "type": "docker-compose"}, store.get_stack("local", "web"))
+        self.assertEqual({"web": 2}, store.list_stack_versions("local"))
+
+        self.assertTrue(store.delete_stack("local", "web"))
+        self.assertFalse(store.delete_stack("local", "web"))
+        self.assertEqual({}, store.list_stack_versions("local"))
+
+    def test_registries(self):
+        store = MetaStore(self.db_file)
+        default = [{"name": "dockerhub", "host": "docker.io"}]
+        self.assertIsNone(store.list_registries())
+
+        store.update_registries(lambda registries: registries + [{"name": "ghcr", "host": "ghcr.io"}], default)
+        self.assertEqual(["dockerhub", "ghcr"], [r["name"] for r in store.list_registries()])
+        self.assertEqual("docker.io", default[0]["host"])
+
+        store.replace_registries([])
+        self.assertEqual([], store.list_registries())
+
+    def test_import_files(self):
+        os.makedirs(os.path.join(self.data_dir, "stacks", "local"))
+        os.makedirs(os.path.join(self.data_dir, "config"))
+        with open(os.path.join(self.data_dir, "stacks", "local", "web.stack.json"), "w") as f:
+            json.dump({"name": "web"}, f)
+        with open(os.path.join(self.data_dir, "contexts.json"), "w") as f:
+            json.dump([{"id": "local", "host": "unix:///var/run/docker.sock"}], f)
+        with open(os.path.join(self.data_dir, "config", "registries.json"), "w") as f:
+            json.dump([{"name": "ghcr", "host": "ghcr.io"}], f)
+
+        store = MetaStore(self.db_file)
+        self.assertEqual({"stacks": 1, "contexts": 1, "registries": 1}, store.import_files(self.data_dir))
+        self.assertIsNone(store.import_files(self.data_dir))
+
+        self.assertEqual({"name": "web"}, store.get_stack("local", "web"))
+        self.assertEqual("local", store.list_contexts()[0]["id"])
+        self.assertEqual("ghcr", store.list_registries()[0]["name"])
+
+    def test_concurrent_updates(self):
+        ctx = multiprocessing.get_context("spawn")
+        processes = [ctx.Process(target=_add_contexts, args=(self.db_file, f"p{n}", 25)) for n in range(4)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+
+        self.assertEqual(100, len(MetaStore(self.db_file).list_contexts()))
+
+    def test_update_contexts(self):
+        store = MetaStore(self.db_file)
+        default = [{"id": "local", "host": "unix:///var/run/docker.sock"}]
+        contexts = store.update_contexts(lambda contexts: contexts + [{"id": "remote", "host": "ssh://docker"}],
+                                         default)
+        self.assertEqual(["local", "remote"], [c["id"] for c in contexts])
+        store.update_contexts(lambda contexts: [c for c in contexts if c["id"] != "local"], default)
+        self.assertEqual(["remote"], [c["id"] for c in store.list_contexts()])
+
+
+if __name__ == '__main__':
+    unittest.main()
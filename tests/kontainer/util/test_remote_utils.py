@@ -0,0 +1,58 @@
+import unittest
+
+from kontainer.util.remote_utils import drain_ssh_channel
+
+
+class _Channel:
+    """
+    Fake channel, whose exit status and last output arrive after the first readiness checks.
+    """
+
+    def __init__(self):
+        self.stdout = [b"first\n"]
+        self.stderr = []
+        self.checks = 0
+
+    def recv_ready(self):
+        return len(self.stdout) > 0
+
+    def recv(self, n):
+        return self.stdout.pop(0)
+
+    def recv_stderr_ready(self):
+        return len(self.stderr) > 0
+
+    def recv_stderr(self, n):
+        return self.stderr.pop(0)
+
+    def exit_status_ready(self):
+        self.checks += 1
+        if self.checks == 1:
+            # Output and exit status arrive at the same time, after the readiness checks of the loop
+            self.stdout.append(b"last\n")
+            self.stderr.append(b"error\n")
+        return True
+
+    def recv_exit_status(self):
+        return 1
+
+    def fileno(self):
+        raise AssertionError("select must not be called")
+
+
+class TestDrainSSHChannel(unittest.TestCase):
+
+    def test_output_received_with_exit_status(self):
+        # The first loop receives 'first', the second loop sees no output, but the exit status
+        channel = _Channel()
+        lines = []
+        stdout, stderr, exit_code = drain_ssh_channel(channel, on_line=lambda stream, line: lines.append(line))
+
+        self.assertEqual(b"first\nlast\n", stdout)
+        self.assertEqual(b"error\n", stderr)
+        self.assertEqual(1, exit_code)
+        self.assertEqual([b"first", b"last", b"error"], lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
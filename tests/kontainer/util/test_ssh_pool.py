@@ -0,0 +1,92 @@
+import unittest
+from unittest import mock
+
+from kontainer.util.ssh_pool import SSHTransportPool
+
+SSH_CONFIG = {"hostname": "docker1", "username": "deploy"}
+
+
+class _Channel:
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class _Transport:
+
+    def __init__(self):
+        self.active = True
+        self.channels = []
+
+    def is_active(self):
+        return self.active
+
+    def set_keepalive(self, interval):
+        pass
+
+    def open_session(self):
+        channel = _Channel()
+        self.channels.append(channel)
+        return channel
+
+    def close(self):
+        self.active = False
+
+
+class TestSSHTransportPool(unittest.TestCase):
+
+    def setUp(self):
+        self.connect = mock.patch("kontainer.util.ssh_pool.ssh_connect_sock",
+                                  side_effect=lambda **kwargs: _Transport())
+        self.connect.start()
+        self.monotonic = mock.patch("kontainer.util.ssh_pool.time.monotonic", return_value=1000.0)
+        self.clock = self.monotonic.start()
+        self.pool = SSHTransportPool(idle_timeout=300, keepalive_interval=0)
+
+    def tearDown(self):
+        self.monotonic.stop()
+        self.connect.stop()
+
+    def test_reuse(self):
+        transport = self.pool.get_transport(**SSH_CONFIG)
+        self.assertIs(transport, self.pool.get_transport(**SSH_CONFIG))
+        self.assertIsNot(transport, self.pool.get_transport(hostname="docker2", username="deploy"))
+
+    def test_evict_idle(self):
+        transport = self.pool.get_transport(**SSH_CONFIG)
+        self.clock.return_value += 301
+        self.assertIsNot(transport, self.pool.get_transport(**SSH_CONFIG))
+        self.assertFalse(transport.active)
+
+    def test_evict_dead(self):
+        transport = self.pool.get_transport(**SSH_CONFIG)
+        transport.active = False
+        self.assertIsNot(transport, self.pool.get_transport(**SSH_CONFIG))
+
+    def test_session_in_use_is_not_evicted(self):
+        with self.pool.open_session(**SSH_CONFIG) as channel:
+            transport = self.pool.get_transport(**SSH_CONFIG)
+            self.clock.return_value += 600
+            self.pool.get_transport(hostname="docker2", username="deploy")
+            self.assertTrue(transport.active)
+            self.assertEqual(1, self.pool.stats()[0]["in_use"])
+        self.assertTrue(channel.closed)
+        self.assertEqual(0, self.pool.stats()[0]["in_use"])
+
+        # Idle again after the session was closed
+        self.clock.return_value += 301
+        self.pool.get_transport(hostname="docker2", username="deploy")
+        self.assertFalse(transport.active)
+
+    def test_lease_is_not_evicted(self):
+        with self.pool.lease(**SSH_CONFIG) as transport:
+            self.clock.return_value += 600
+            self.assertIs(transport, self.pool.get_transport(**SSH_CONFIG))
+        self.assertEqual(0, self.pool.stats()[0]["in_use"])
+
+
+if __name__ == '__main__':
+    unittest.main()
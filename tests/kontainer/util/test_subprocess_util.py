@@ -0,0 +1,75 @@
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from kontainer.util.subprocess_util import run_command_streaming, CommandCancelledError
+
+# Runs a command, which spawns a sleeping child process, and prints the pid of the child
+RUNNER_SCRIPT = """
+import sys
+from kontainer.util.subprocess_util import run_command_streaming
+run_command_streaming(["sh", "-c", "sleep 60 & echo $!; wait"],
+                      on_line=lambda stream, line: print(line.decode(), flush=True))
+"""
+
+
+def _pid_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # A zombie is not reaped, if its parent was killed before
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+class TestRunCommandStreaming(unittest.TestCase):
+
+    def test_output(self):
+        lines = []
+        stdout, stderr, exit_code = run_command_streaming(
+            ["sh", "-c", "for i in 1 2 3 4 5; do echo line$i; done; echo err >&2; exit 3"],
+            on_line=lambda stream, line: lines.append((stream, line)), max_output=12)
+
+        self.assertEqual(3, exit_code)
+        self.assertEqual(b"line4\nline5\n", stdout)
+        self.assertEqual(b"err\n", stderr)
+        self.assertEqual(5, len([line for stream, line in lines if stream == "stdout"]))
+        self.assertIn(("stderr", b"err"), lines)
+
+    def test_cancel(self):
+        cancel_event = threading.Event()
+        threading.Timer(0.2, cancel_event.set).start()
+        start = time.monotonic()
+        with self.assertRaises(CommandCancelledError):
+            run_command_streaming(["sleep", "30"], cancel_event=cancel_event)
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_timeout(self):
+        with self.assertRaises(TimeoutError):
+            run_command_streaming(["sleep", "30"], timeout=0.2)
+
+    def test_sigterm_kills_process_group(self):
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            proc = subprocess.Popen([sys.executable, "-c", RUNNER_SCRIPT], cwd=tmp_dir, env=env,
+                                    stdout=subprocess.PIPE)
+            child_pid = int(proc.stdout.readline())
+            self.assertTrue(_pid_exists(child_pid))
+
+            proc.send_signal(signal.SIGTERM)
+            self.assertEqual(-signal.SIGTERM, proc.wait(timeout=10))
+            proc.stdout.close()
+            self.assertFalse(_pid_exists(child_pid))
+
+
+if __name__ == '__main__':
+    unittest.main()